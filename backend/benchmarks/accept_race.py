@@ -0,0 +1,132 @@
+"""
+N drivers racing to accept M rides.
+
+Seeds --rides pending rides and --drivers drivers in the database, then has
+every driver walk the rides in its own random order, all at once, calling
+PUT /rides/{ride_id}/accept until it wins one (a driver on a ride cannot
+take another). Afterwards it checks, against both the API responses and
+MySQL, that no ride has two winners, no driver holds two rides and every
+winner is marked unavailable. The seeded rows are deleted at the end.
+
+    python benchmarks/accept_race.py --drivers 200 --rides 50
+
+Exits non-zero if any check fails.
+"""
+import argparse
+import asyncio
+import random
+import sys
+import time
+from collections import Counter, defaultdict
+
+import httpx
+
+import seed
+from loadgen import summarize
+
+async def race(url, driver_ids, ride_ids, rng):
+    winners = defaultdict(list)  # ride_id -> drivers the API said won it
+    statuses = Counter()
+    latencies = []
+    start = asyncio.Event()
+    limits = httpx.Limits(max_connections=len(driver_ids), max_keepalive_connections=len(driver_ids))
+
+    async with httpx.AsyncClient(base_url=url, timeout=30.0, limits=limits) as client:
+        async def driver(driver_id, order):
+            await start.wait()
+            for ride_id in order:
+                started = time.perf_counter()
+                response = await client.put(f"/rides/{ride_id}/accept", json={"driver_id": driver_id})
+                latencies.append(time.perf_counter() - started)
+                statuses[response.status_code] += 1
+                if response.status_code == 200:
+                    winners[ride_id].append(driver_id)
+                    return
+
+        tasks = [asyncio.create_task(driver(driver_id, rng.sample(ride_ids, len(ride_ids))))
+                 for driver_id in driver_ids]
+        started = time.perf_counter()
+        start.set()
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+
+    return winners, statuses, latencies, elapsed
+
+def check(conn, winners, driver_ids, ride_ids):
+    """
+    Problems found in the API answers and the stored rows
+    """
+    problems = []
+    for ride_id, drivers in winners.items():
+        if len(drivers) > 1:
+            problems.append(f"ride {ride_id} accepted by {drivers}")
+
+    cursor = conn.cursor()
+    try:
+        placeholders = ", ".join(["%s"] * len(ride_ids))
+        cursor.execute(f"SELECT ride_id, driver_id, status FROM rides WHERE ride_id IN ({placeholders})",
+                       tuple(ride_ids))
+        stored = {ride_id: (driver_id, status) for ride_id, driver_id, status in cursor.fetchall()}
+        placeholders = ", ".join(["%s"] * len(driver_ids))
+        cursor.execute(f"SELECT driver_id, availability FROM drivers WHERE driver_id IN ({placeholders})",
+                       tuple(driver_ids))
+        availability = dict(cursor.fetchall())
+    finally:
+        cursor.close()
+
+    rides_per_driver = Counter()
+    for ride_id in ride_ids:
+        driver_id, status = stored[ride_id]
+        won = winners.get(ride_id, [])
+        if won:
+            if status != "Ongoing" or driver_id != won[0]:
+                problems.append(f"ride {ride_id} won by {won[0]} but stored as {status} for driver {driver_id}")
+            rides_per_driver[driver_id] += 1
+        elif status != "Pending":
+            problems.append(f"ride {ride_id} has no winner but is {status}")
+
+    for driver_id, count in rides_per_driver.items():
+        if count > 1:
+            problems.append(f"driver {driver_id} holds {count} rides")
+        if availability.get(driver_id):
+            problems.append(f"driver {driver_id} won a ride but is still available")
+    return problems
+
+def run():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--drivers", type=int, default=200)
+    parser.add_argument("--rides", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    conn = seed.connect()
+    try:
+        customer_id, = seed.create_users(conn, "customer", 1, "race")
+        # rides.driver_id is NOT NULL; pending rides point at a placeholder driver
+        placeholder, = seed.create_users(conn, "driver", 1, "race-placeholder")
+        ride_ids = seed.create_rides(conn, customer_id, placeholder, args.rides)
+        driver_ids = seed.create_users(conn, "driver", args.drivers, "race")
+
+        winners, statuses, latencies, elapsed = asyncio.run(
+            race(args.url, driver_ids, ride_ids, random.Random(args.seed))
+        )
+        conn.commit()  # end the snapshot so the checks see the race's writes
+        problems = check(conn, winners, driver_ids, ride_ids)
+    finally:
+        seed.cleanup(conn)
+        conn.close()
+
+    codes = ", ".join(f"{code}x{count}" for code, count in sorted(statuses.items()))
+    print(f"{args.drivers} drivers, {args.rides} rides: {sum(statuses.values())} accepts in {elapsed:.2f}s [{codes}]")
+    print(f"  rides won: {len(winners)} of {min(args.drivers, args.rides)} possible")
+    print(f"  accept latency {summarize(latencies)}")
+    if problems:
+        print(f"  {len(problems)} problems:")
+        for problem in problems[:20]:
+            print(f"    {problem}")
+        sys.exit(1)
+    print("  no double assignment")
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,102 @@
+"""
+Nearest-driver dispatch at 10k drivers and 1k requests/s, in process.
+
+Places --drivers available drivers around the gazetteer's cities, then
+offers --rate pickup requests per second for --seconds, answered in batches
+of --batch the way POST /dispatch/nearest answers them. Reports location
+update throughput, per-batch and per-request latency, and the share of each
+second the engine was busy (under 100% means it keeps up). No database or
+server is needed:
+
+    python benchmarks/dispatch.py --drivers 10000 --rate 1000
+"""
+import argparse
+import random
+import time
+
+from loadgen import import_backend, summarize
+
+import_backend()
+import main
+
+VEHICLE_TYPES = ("Car", "Bike", "SUV")
+
+def place_drivers(count, spread, rng):
+    """
+    Add `count` available drivers scattered around random gazetteer places
+    """
+    places = list(main.gazetteer.values())
+    started = time.perf_counter()
+    for driver_id in range(1, count + 1):
+        lat, lon = rng.choice(places)
+        main.driver_locator.update(driver_id, lat + rng.gauss(0, spread), lon + rng.gauss(0, spread))
+    elapsed = time.perf_counter() - started
+
+    # Availability normally comes from MySQL; fill the index directly
+    with main.driver_index._lock:
+        for driver_id in range(1, count + 1):
+            main.driver_index._put({"driver_id": driver_id, "email": f"driver{driver_id}@example.com",
+                                    "type": rng.choice(VEHICLE_TYPES), "plate_number": f"BENCH-{driver_id}"})
+        main.driver_index.loaded = True
+    return elapsed
+
+def pickup_requests(count, spread, rng):
+    names = list(main.gazetteer)
+    requests = []
+    for _ in range(count):
+        if rng.random() < 0.5:
+            requests.append(main.DispatchQuery(pickup_location=rng.choice(names)))
+        else:
+            lat, lon = main.gazetteer[rng.choice(names)]
+            requests.append(main.DispatchQuery(lat=lat + rng.gauss(0, spread), lon=lon + rng.gauss(0, spread),
+                                               vehicle_type=rng.choice((None,) + VEHICLE_TYPES)))
+    return requests
+
+def run():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--drivers", type=int, default=10000)
+    parser.add_argument("--rate", type=int, default=1000, help="pickup requests per second")
+    parser.add_argument("--seconds", type=int, default=10)
+    parser.add_argument("--batch", type=int, default=50, help="requests per /dispatch/nearest call")
+    parser.add_argument("--spread", type=float, default=0.05, help="degrees of scatter around each place")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    elapsed = place_drivers(args.drivers, args.spread, rng)
+    print(f"{args.drivers} location updates in {elapsed:.3f}s ({args.drivers / elapsed:.0f}/s)")
+
+    handler = main.dispatch_nearest.__wrapped__  # the blocking body, without the executor hop
+    interval = args.batch / args.rate
+    batch_latencies = []
+    request_latencies = []
+    busy = 0.0
+    matched = 0
+    started = time.perf_counter()
+
+    for second in range(args.seconds):
+        requests = pickup_requests(args.rate, args.spread, rng)
+        for offset in range(0, len(requests), args.batch):
+            due = started + second + offset / args.rate
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            batch = main.DispatchBatch(requests=requests[offset:offset + args.batch])
+            batch_started = time.perf_counter()
+            results = handler(batch)["results"]
+            took = time.perf_counter() - batch_started
+            busy += took
+            batch_latencies.append(took)
+            request_latencies.extend([took / len(batch.requests)] * len(batch.requests))
+            matched += sum(1 for result in results if result["drivers"])
+
+    wall = time.perf_counter() - started
+    total = args.rate * args.seconds
+    print(f"{total} requests offered at {args.rate}/s in batches of {args.batch} over {wall:.2f}s; "
+          f"{matched} got at least one driver")
+    print(f"  per batch   {summarize(batch_latencies)}")
+    print(f"  per request {summarize(request_latencies)}")
+    print(f"  engine busy {busy / wall:.1%} of the time (batch interval {interval * 1000:.0f} ms)")
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,47 @@
+"""
+p99 latency of the coroutine endpoints under parallel load.
+
+Start the API (uvicorn main:app) against a database with at least one ride
+and one user, then run for example:
+
+    python benchmarks/endpoint_latency.py --ride-id 1 --user-id 1 \
+        --email customer@example.com --password secret --concurrency 1,16,64
+
+Run it once on the commit before a change and once after to compare. Each
+concurrency level sends --requests requests, cycling through ride status,
+detailed status, ride history and (with --email) login.
+"""
+import argparse
+import asyncio
+
+from loadgen import report, run_load
+
+def build_requests(args):
+    requests = [
+        ("ride_status", "GET", f"/rides/{args.ride_id}/status", None),
+        ("detailed_status", "GET", f"/rides/{args.ride_id}/detailed-status", None),
+        ("user_rides", "GET", f"/rides/user/{args.user_id}?role={args.role}", None),
+    ]
+    if args.email:
+        requests.append(("login", "POST", "/login", {"email": args.email, "password": args.password}))
+    return requests
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--ride-id", type=int, default=1)
+    parser.add_argument("--user-id", type=int, default=1)
+    parser.add_argument("--role", default="customer")
+    parser.add_argument("--email")
+    parser.add_argument("--password", default="")
+    parser.add_argument("--concurrency", default="1,16,64", help="comma-separated levels")
+    parser.add_argument("--requests", type=int, default=2000, help="requests per level")
+    args = parser.parse_args()
+
+    requests = build_requests(args)
+    for concurrency in [int(level) for level in args.concurrency.split(",")]:
+        latencies, statuses, elapsed = asyncio.run(run_load(args.url, requests, concurrency, args.requests))
+        report(f"concurrency {concurrency}", latencies, statuses, elapsed)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+ETA refresh latency for 10k concurrent rides, in process.
+
+Tracks --rides rides between random gazetteer places, then sends every ride
+one GPS sample per round, --interval seconds of ride time apart, for
+--rounds rounds, moving each car toward its target at its own speed.
+Reports the time of one EtaEngine.update (the work /gps/samples adds per
+point), the time to refresh all rides once, and the time of the ETA read
+/rides/{ride_id}/status makes. No database or server is needed:
+
+    python benchmarks/eta_refresh.py --rides 10000 --rounds 20
+"""
+import argparse
+import datetime
+import random
+import time
+
+from loadgen import import_backend, percentile, summarize
+
+import_backend()
+import main
+
+def summarize_us(latencies):
+    """
+    summarize() in microseconds, for operations far below a millisecond
+    """
+    return {
+        "count": len(latencies),
+        "mean_us": round(sum(latencies) / len(latencies) * 1e6, 2),
+        "p50_us": round(percentile(latencies, 50) * 1e6, 2),
+        "p99_us": round(percentile(latencies, 99) * 1e6, 2),
+        "max_us": round(max(latencies) * 1e6, 2),
+    }
+
+def place_rides(count, rng):
+    places = list(main.gazetteer)
+    rides = {}
+    for ride_id in range(1, count + 1):
+        pickup, dropoff = rng.sample(places, 2)
+        main.eta_engine.track(ride_id, pickup, dropoff, picked_up=rng.random() < 0.5)
+        lat, lon = main.gazetteer[pickup]
+        # Start a few km from the pickup, moving at 15-80 km/h
+        rides[ride_id] = [lat + rng.uniform(-0.05, 0.05), lon + rng.uniform(-0.05, 0.05), rng.uniform(15, 80)]
+    return rides
+
+def run():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rides", type=int, default=10000)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--interval", type=float, default=5.0, help="seconds of ride time between samples")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    started = time.perf_counter()
+    rides = place_rides(args.rides, rng)
+    print(f"{args.rides} rides tracked in {time.perf_counter() - started:.3f}s")
+
+    clock = datetime.datetime.now()
+    update_latencies = []
+    round_latencies = []
+    for _ in range(args.rounds):
+        clock += datetime.timedelta(seconds=args.interval)
+        round_started = time.perf_counter()
+        for ride_id, ride in rides.items():
+            lat, lon, speed = ride
+            step = speed / 3600 * args.interval / 111  # degrees covered, roughly
+            ride[0], ride[1] = lat + rng.uniform(-step, step), lon + rng.uniform(-step, step)
+            sample_started = time.perf_counter()
+            main.eta_engine.update(ride_id, ride[0], ride[1], clock)
+            update_latencies.append(time.perf_counter() - sample_started)
+        round_latencies.append(time.perf_counter() - round_started)
+
+    read_latencies = []
+    for ride_id in rng.sample(list(rides), min(len(rides), 10000)):
+        read_started = time.perf_counter()
+        main.eta_engine.get(ride_id)
+        read_latencies.append(time.perf_counter() - read_started)
+
+    with_eta = sum(1 for ride_id in rides if main.eta_engine.get(ride_id))
+    updates = len(update_latencies)
+    print(f"{updates} samples over {args.rounds} rounds; {with_eta} of {args.rides} rides have an ETA")
+    print(f"  per sample update  {summarize_us(update_latencies)}")
+    print(f"  refresh all rides  {summarize(round_latencies)}")
+    print(f"  ETA read           {summarize_us(read_latencies)}")
+    print(f"  one core sustains about {updates / sum(update_latencies):.0f} samples/s")
+
+if __name__ == "__main__":
+    run()
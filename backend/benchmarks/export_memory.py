@@ -0,0 +1,81 @@
+"""
+Server memory while streaming /export/{table}.
+
+Streams a full export and samples the API process's resident memory from
+/proc (Linux, same machine) as rows arrive. With --seed the rides table is
+first grown by that many synthetic rows, which are deleted afterwards:
+
+    python benchmarks/export_memory.py --pid $(pgrep -f "uvicorn main:app") --seed 1000000
+
+Run it at two or more seed sizes: if the export streams, peak RSS growth
+stays the same while the row count grows.
+"""
+import argparse
+import time
+
+import httpx
+
+import seed
+
+def rss_mb(pid):
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return None
+
+def stream_export(url, table, fmt, pid, checkpoints):
+    rows = 0
+    received = 0
+    samples = []
+    baseline = rss_mb(pid) if pid else None
+    started = time.perf_counter()
+    next_checkpoint = checkpoints
+
+    with httpx.stream("GET", f"{url}/export/{table}", params={"format": fmt}, timeout=None) as response:
+        response.raise_for_status()
+        for chunk in response.iter_bytes():
+            received += len(chunk)
+            rows += chunk.count(b"\n")
+            if rows >= next_checkpoint:
+                next_checkpoint += checkpoints
+                rss = rss_mb(pid) if pid else None
+                samples.append(rss)
+                print(f"  {rows:>10} rows  {received / 2**20:8.1f} MB received  "
+                      f"server RSS {rss if rss is None else round(rss, 1)} MB")
+
+    elapsed = time.perf_counter() - started
+    if fmt == "csv":
+        rows -= 1  # header
+    print(f"{rows} rows, {received / 2**20:.1f} MB in {elapsed:.2f}s ({rows / elapsed:.0f} rows/s)")
+    measured = [sample for sample in samples if sample is not None]
+    if baseline is not None and measured:
+        print(f"server RSS: {baseline:.1f} MB before, peak {max(measured):.1f} MB, "
+              f"growth {max(measured) - baseline:.1f} MB")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--table", default="rides")
+    parser.add_argument("--format", default="ndjson", choices=("ndjson", "csv"))
+    parser.add_argument("--pid", type=int, help="API process to sample; omit to measure throughput only")
+    parser.add_argument("--seed", type=int, default=0, help="synthetic rides to add first")
+    parser.add_argument("--checkpoint", type=int, default=100000, help="rows between memory samples")
+    args = parser.parse_args()
+
+    conn = None
+    if args.seed:
+        conn = seed.connect()
+        customer_id, = seed.create_users(conn, "customer", 1, "export")
+        driver_id, = seed.create_users(conn, "driver", 1, "export")
+        seed.create_rides(conn, customer_id, driver_id, args.seed, status="Completed")
+        print(f"seeded {args.seed} rides")
+    try:
+        stream_export(args.url, args.table, args.format, args.pid, args.checkpoint)
+    finally:
+        if conn is not None:
+            seed.cleanup(conn)
+            conn.close()
+
+if __name__ == "__main__":
+    main()
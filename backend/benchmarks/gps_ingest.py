@@ -0,0 +1,126 @@
+"""
+GPS ingest at a fixed rate of points per second.
+
+Seeds --rides ongoing rides (plus --ended completed ones that keep
+reporting, as phones do after a trip), then posts /gps/samples batches of
+--batch points paced to --rate points per second for --seconds. Reports the
+achieved rate, request latency, and from /metrics how many samples were
+flushed or refused and how many pool connections the ingest borrowed; with
+ended rides remembered that last number stays flat however long the run.
+
+    python benchmarks/gps_ingest.py --rate 5000 --rides 2000 --ended 200
+
+The seeded rides and their samples are deleted at the end.
+"""
+import argparse
+import asyncio
+import random
+import time
+from collections import Counter
+
+import httpx
+
+import seed
+from loadgen import summarize
+
+async def send(url, ride_ids, rate, seconds, batch_size, concurrency, rng):
+    latencies = []
+    statuses = Counter()
+    accepted = 0
+    batches = asyncio.Queue(maxsize=concurrency * 2)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=url, timeout=30.0, limits=limits) as client:
+        async def worker():
+            nonlocal accepted
+            while True:
+                body = await batches.get()
+                if body is None:
+                    return
+                started = time.perf_counter()
+                response = await client.post("/gps/samples", json=body)
+                latencies.append(time.perf_counter() - started)
+                statuses[response.status_code] += 1
+                if response.status_code == 200:
+                    accepted += response.json()["accepted"]
+
+        workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+        started = time.perf_counter()
+        total = rate * seconds
+        for offset in range(0, total, batch_size):
+            delay = started + offset / rate - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            samples = [{"ride_id": rng.choice(ride_ids), "lat": -37.81 + rng.gauss(0, 0.05),
+                        "lon": 144.96 + rng.gauss(0, 0.05)} for _ in range(min(batch_size, total - offset))]
+            await batches.put({"samples": samples})
+        for _ in workers:
+            await batches.put(None)
+        await asyncio.gather(*workers)
+        elapsed = time.perf_counter() - started
+
+    return accepted, statuses, latencies, elapsed
+
+def delete_samples(conn, ride_ids):
+    # gps_samples is partitioned and has no foreign key to cascade from rides
+    cursor = conn.cursor()
+    try:
+        for start in range(0, len(ride_ids), seed.INSERT_CHUNK):
+            chunk = ride_ids[start:start + seed.INSERT_CHUNK]
+            cursor.execute(f"DELETE FROM gps_samples WHERE ride_id IN ({', '.join(['%s'] * len(chunk))})",
+                           tuple(chunk))
+        conn.commit()
+    finally:
+        cursor.close()
+
+def metrics(url):
+    body = httpx.get(f"{url}/metrics").json()
+    return body["gps"], body["db_pool"]
+
+def run():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--rate", type=int, default=5000, help="points per second")
+    parser.add_argument("--seconds", type=int, default=30)
+    parser.add_argument("--batch", type=int, default=50, help="points per request")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--rides", type=int, default=2000)
+    parser.add_argument("--ended", type=int, default=200, help="completed rides that still send points")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    conn = seed.connect()
+    ride_ids = []
+    try:
+        customer_id, = seed.create_users(conn, "customer", 1, "gps")
+        driver_id, = seed.create_users(conn, "driver", 1, "gps")
+        ride_ids = seed.create_rides(conn, customer_id, driver_id, args.rides, status="Ongoing")
+        if args.ended:
+            ended_customer, = seed.create_users(conn, "customer", 1, "gps-ended")
+            ride_ids += seed.create_rides(conn, ended_customer, driver_id, args.ended, status="Completed")
+
+        gps_before, pool_before = metrics(args.url)
+        accepted, statuses, latencies, elapsed = asyncio.run(
+            send(args.url, ride_ids, args.rate, args.seconds, args.batch, args.concurrency, random.Random(args.seed))
+        )
+        time.sleep(2)  # let the last flush land
+        gps_after, pool_after = metrics(args.url)
+    finally:
+        delete_samples(conn, ride_ids)
+        seed.cleanup(conn)
+        conn.close()
+
+    offered = args.rate * args.seconds
+    codes = ", ".join(f"{code}x{count}" for code, count in sorted(statuses.items()))
+    print(f"{offered} points offered at {args.rate}/s in batches of {args.batch} over {elapsed:.2f}s "
+          f"({offered / elapsed:.0f}/s) [{codes}]")
+    print(f"  accepted {accepted}, not accepted {offered - accepted}")
+    print(f"  request latency {summarize(latencies)}")
+    print(f"  flushed {gps_after['flushed'] - gps_before['flushed']} in "
+          f"{gps_after['flushes'] - gps_before['flushes']} flushes, "
+          f"buffer full {gps_after['rejected'] - gps_before['rejected']}, still buffered {gps_after['buffered']}")
+    print(f"  pool connections borrowed {pool_after['acquired'] - pool_before['acquired']}, "
+          f"rides tracked {gps_after['rides_tracked']}, ended rides remembered {gps_after['rides_ended']}")
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,86 @@
+"""
+Small HTTP load generator shared by the benchmark scripts.
+
+Runs a fixed number of requests against a live server with a bounded number
+in flight and reports throughput and latency percentiles per request kind.
+"""
+import asyncio
+import itertools
+import math
+import os
+import sys
+import time
+from collections import Counter, defaultdict
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def import_backend():
+    """
+    Make main.py importable for the in-process benchmarks
+    """
+    if BACKEND_DIR not in sys.path:
+        sys.path.insert(0, BACKEND_DIR)
+
+def percentile(values, p):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, math.ceil(p / 100 * len(ordered)) - 1)
+    return ordered[index]
+
+def summarize(latencies):
+    """
+    Count, mean and tail of a list of seconds, in milliseconds
+    """
+    if not latencies:
+        return {"count": 0}
+    return {
+        "count": len(latencies),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 2),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "max_ms": round(max(latencies) * 1000, 2),
+    }
+
+async def run_load(base_url, requests, concurrency, total, timeout=30.0):
+    """
+    Send `total` requests with at most `concurrency` in flight.
+
+    `requests` is a list of (kind, method, path, json body or None) that is
+    cycled through. Returns the latencies and status codes per kind and the
+    wall time of the whole run.
+    """
+    latencies = defaultdict(list)
+    statuses = defaultdict(Counter)
+    plan = itertools.islice(itertools.cycle(requests), total)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        async def worker():
+            for kind, method, path, body in plan:
+                started = time.perf_counter()
+                try:
+                    response = await client.request(method, path, json=body)
+                    status = response.status_code
+                except httpx.HTTPError as e:
+                    status = type(e).__name__
+                latencies[kind].append(time.perf_counter() - started)
+                statuses[kind][status] += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return latencies, statuses, elapsed
+
+def report(title, latencies, statuses, elapsed):
+    total = sum(len(values) for values in latencies.values())
+    print(f"{title}: {total} requests in {elapsed:.2f}s, {total / elapsed:.1f} req/s")
+    for kind in sorted(latencies):
+        codes = ", ".join(f"{code}x{count}" for code, count in sorted(statuses[kind].items(), key=str))
+        print(f"  {kind:<24} {summarize(latencies[kind])}  [{codes}]")
+    all_latencies = [value for values in latencies.values() for value in values]
+    print(f"  {'all':<24} {summarize(all_latencies)}")
@@ -0,0 +1,85 @@
+"""
+Password check throughput and latency, in process.
+
+For each --workers count, starts a PasswordHasher with that many processes
+and runs --checks login checks (verify_async against a bcrypt hash of
+--rounds cost) at --concurrency at once, first alone and then while a
+--batch password import (the hashing /users/insert-batch does) runs beside
+them. Reports checks per second, per process, and check latency; the import
+keeps at most one hash per process in flight, so login latency should rise
+by about one hash, not by the whole batch. No database or server is needed:
+
+    python benchmarks/password_throughput.py --workers 1,2,4 --rounds 12
+
+Checks past the pending limit get 503 and are counted as rejected.
+"""
+import argparse
+import asyncio
+import time
+
+from loadgen import import_backend, summarize
+
+import_backend()
+import main
+
+async def check_logins(hasher, password_hash, checks, concurrency):
+    latencies = []
+    rejected = 0
+    gate = asyncio.Semaphore(concurrency)
+
+    async def check():
+        nonlocal rejected
+        async with gate:
+            started = time.perf_counter()
+            try:
+                matches, _ = await hasher.verify_async("password", password_hash)
+            except main.HTTPException:
+                rejected += 1
+                return
+            assert matches
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(check() for _ in range(checks)))
+    return latencies, rejected, time.perf_counter() - started
+
+async def measure(workers, args):
+    hasher = main.PasswordHasher(args.rounds, workers, args.concurrency + workers)
+    try:
+        password_hash = await hasher.hash_async("password")
+        # Start every process before timing
+        await hasher.hash_many_async(["warm-up"] * workers)
+
+        alone = await check_logins(hasher, password_hash, args.checks, args.concurrency)
+
+        import_started = time.perf_counter()
+        batch = asyncio.ensure_future(hasher.hash_many_async([f"import-{i}" for i in range(args.batch)]))
+        during = await check_logins(hasher, password_hash, args.checks, args.concurrency)
+        await batch
+        import_elapsed = time.perf_counter() - import_started
+    finally:
+        hasher.stop()
+    return alone, during, import_elapsed
+
+def run():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default="1,2,4", help="comma-separated process counts")
+    parser.add_argument("--rounds", type=int, default=main.PASSWORD_ROUNDS, help="bcrypt cost")
+    parser.add_argument("--checks", type=int, default=100, help="login checks per run")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--batch", type=int, default=50, help="passwords in the concurrent import")
+    args = parser.parse_args()
+
+    print(f"{'workers':>8} {'checks/s':>9} {'per proc':>9} {'p50 ms':>8} {'p99 ms':>8} "
+          f"{'p99 import':>11} {'import s':>9} {'rejected':>9}")
+    for workers in [int(count) for count in args.workers.split(",")]:
+        (latencies, rejected, elapsed), (busy_latencies, busy_rejected, _), import_elapsed = asyncio.run(
+            measure(workers, args)
+        )
+        rate = len(latencies) / elapsed
+        alone, busy = summarize(latencies), summarize(busy_latencies)
+        print(f"{workers:>8} {rate:>9.1f} {rate / workers:>9.1f} {alone['p50_ms']:>8} {alone['p99_ms']:>8} "
+              f"{busy['p99_ms']:>11} {import_elapsed:>9.2f} {rejected + busy_rejected:>9}")
+
+if __name__ == "__main__":
+    run()
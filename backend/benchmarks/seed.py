@@ -0,0 +1,76 @@
+"""
+Synthetic rows for the benchmarks that need a populated database.
+
+Everything created here belongs to users whose email starts with
+BENCH_EMAIL_PREFIX, so cleanup() removes it through the ON DELETE CASCADE
+foreign keys without touching real data.
+"""
+import mysql.connector
+
+from loadgen import import_backend
+
+BENCH_EMAIL_PREFIX = "bench-"
+INSERT_CHUNK = 5000
+
+def connect():
+    import_backend()
+    from main import db_config
+    return mysql.connector.connect(**db_config)
+
+def create_users(conn, role, count, tag):
+    """
+    Insert `count` users with a customers or drivers row each and return their ids
+    """
+    cursor = conn.cursor()
+    try:
+        ids = []
+        for start in range(0, count, INSERT_CHUNK):
+            emails = [f"{BENCH_EMAIL_PREFIX}{tag}-{role}-{i}@example.com"
+                      for i in range(start, min(start + INSERT_CHUNK, count))]
+            cursor.executemany(
+                "INSERT INTO users (email, password_hash, role) VALUES (%s, %s, %s)",
+                [(email, "x", role) for email in emails]
+            )
+            placeholders = ", ".join(["%s"] * len(emails))
+            cursor.execute(f"SELECT user_id FROM users WHERE email IN ({placeholders}) ORDER BY user_id",
+                           tuple(emails))
+            chunk = [row[0] for row in cursor.fetchall()]
+            if role == "driver":
+                cursor.executemany("INSERT INTO drivers (driver_id, availability) VALUES (%s, TRUE)",
+                                   [(user_id,) for user_id in chunk])
+            elif role == "customer":
+                cursor.executemany("INSERT INTO customers (customer_id) VALUES (%s)",
+                                   [(user_id,) for user_id in chunk])
+            ids.extend(chunk)
+        conn.commit()
+        return ids
+    finally:
+        cursor.close()
+
+def create_rides(conn, customer_id, driver_id, count, status="Pending"):
+    """
+    Insert `count` rides for a benchmark customer and return all of its ride ids
+    """
+    cursor = conn.cursor()
+    try:
+        for start in range(0, count, INSERT_CHUNK):
+            size = min(INSERT_CHUNK, count - start)
+            cursor.executemany(
+                "INSERT INTO rides (customer_id, driver_id, pickup_location, dropoff_location, status, fare) "
+                "VALUES (%s, %s, %s, %s, %s, %s)",
+                [(customer_id, driver_id, "Flinders Street Station", "Melbourne Airport", status, 42.5)] * size
+            )
+        conn.commit()
+        cursor.execute("SELECT ride_id FROM rides WHERE customer_id = %s ORDER BY ride_id", (customer_id,))
+        return [row[0] for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+
+def cleanup(conn):
+    cursor = conn.cursor()
+    try:
+        cursor.execute("DELETE FROM users WHERE email LIKE %s", (BENCH_EMAIL_PREFIX + "%",))
+        conn.commit()
+        return cursor.rowcount
+    finally:
+        cursor.close()
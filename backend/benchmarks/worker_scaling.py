@@ -0,0 +1,89 @@
+"""
+Throughput of the API as gunicorn workers go from 1 to 8.
+
+For each --workers count, starts gunicorn with gunicorn.conf.py and
+WEB_CONCURRENCY set to that count, waits for /health, runs the same request
+mix as endpoint_latency.py at --concurrency for --requests requests, then
+stops the server. Reports requests per second and the speedup over the
+first count; scaling is linear when the speedup tracks the worker count.
+Run it from backend/ with the shared backends and a Redis server up:
+
+    BUS_BACKEND=redis CACHE_BACKEND=redis python benchmarks/worker_scaling.py --workers 1,2,4,8
+
+Scaling is bounded by the cores of the machine (and of MySQL and Redis if
+they share it), so give the server at least as many cores as workers.
+"""
+import argparse
+import asyncio
+import os
+import signal
+import subprocess
+import time
+
+import httpx
+
+from endpoint_latency import build_requests
+from loadgen import BACKEND_DIR, report, run_load, summarize
+
+def start_server(app, workers, port):
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers), BIND=f"127.0.0.1:{port}", LOG_LEVEL="warning")
+    # No access log: writing it would cost the workers more than some requests
+    server = subprocess.Popen(["gunicorn", "-c", "gunicorn.conf.py", "--access-logfile", "/dev/null", app],
+                              cwd=BACKEND_DIR, env=env)
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with {server.returncode}")
+        try:
+            if httpx.get(f"{url}/health", timeout=1).status_code == 200:
+                return server, url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    stop_server(server)
+    raise RuntimeError("server did not become healthy within 60s")
+
+def stop_server(server):
+    server.send_signal(signal.SIGTERM)
+    try:
+        server.wait(timeout=40)
+    except subprocess.TimeoutExpired:
+        server.kill()
+        server.wait()
+
+def run():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default="1,2,4,8", help="comma-separated worker counts")
+    parser.add_argument("--app", default="main:app")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--requests", type=int, default=5000, help="requests per worker count")
+    parser.add_argument("--ride-id", type=int, default=1)
+    parser.add_argument("--user-id", type=int, default=1)
+    parser.add_argument("--role", default="customer")
+    parser.add_argument("--email")
+    parser.add_argument("--password", default="")
+    args = parser.parse_args()
+
+    requests = build_requests(args)
+    results = []
+    for workers in [int(count) for count in args.workers.split(",")]:
+        server, url = start_server(args.app, workers, args.port)
+        try:
+            # Warm up every worker's pool, caches and indexes first
+            asyncio.run(run_load(url, requests, args.concurrency, args.concurrency * 4))
+            latencies, statuses, elapsed = asyncio.run(run_load(url, requests, args.concurrency, args.requests))
+        finally:
+            stop_server(server)
+        report(f"{workers} workers", latencies, statuses, elapsed)
+        all_latencies = [value for values in latencies.values() for value in values]
+        results.append((workers, len(all_latencies) / elapsed, summarize(all_latencies)["p99_ms"]))
+
+    base_workers, base_rate, _ = results[0]
+    print(f"{'workers':>8} {'req/s':>10} {'speedup':>8} {'linear':>8} {'p99 ms':>8}")
+    for workers, rate, p99 in results:
+        print(f"{workers:>8} {rate:>10.1f} {rate / base_rate:>8.2f} {workers / base_workers:>8.2f} {p99:>8}")
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,30 @@
+# Multi-process launcher for the SmartRide API (Linux/macOS):
+#
+#   BUS_BACKEND=redis CACHE_BACKEND=redis gunicorn -c gunicorn.conf.py main:app
+#
+# Every worker keeps its own pool, caches and indexes, so run more than one
+# only with BUS_BACKEND=redis. The workers then share invalidations and ride
+# events. On Windows, `uvicorn main:app --workers N` starts the same setup.
+import multiprocessing
+import os
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", str(multiprocessing.cpu_count())))
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# Each worker imports the app itself, so pools, threads and the bus
+# connection are never shared across a fork
+preload_app = False
+
+# Long-polls and event streams hold a request open for up to a minute
+timeout = 90
+graceful_timeout = 30
+keepalive = 5
+
+# Recycle workers now and then so a slow leak cannot grow without bound
+max_requests = int(os.getenv("MAX_REQUESTS", "10000"))
+max_requests_jitter = 1000
+
+accesslog = "-"
+errorlog = "-"
+loglevel = os.getenv("LOG_LEVEL", "info")
@@ -1,9 +1,38 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Depends, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.params import Depends as DependsParam
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
 import mysql.connector
+import numpy as np
+import passwords
+import argparse
+import asyncio
+import csv
+import functools
+import io
+import json
+import logging
 import hashlib
+import hmac
+import inspect
 import datetime
+import decimal
+import math
+import multiprocessing
+import os
+import queue
+import re
+import socket
+import threading
+import time
+import unicodedata
+import uuid
+from collections import OrderedDict, defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import List, Optional
+
+logger = logging.getLogger("smartride")
 
 # DATABASE CONNECTION
 db_config = {
@@ -13,12 +42,1124 @@ db_config = {
     "database": "smartride"
 }
 
-def get_db_connection():
-    return mysql.connector.connect(**db_config)
+# Pool tuning, overridable from the environment
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))  # seconds to wait for a free connection
+DB_POOL_RECYCLE = float(os.getenv("DB_POOL_RECYCLE", "1800"))  # seconds before a connection is replaced
+
+def get_db_connection(config=None):
+    return mysql.connector.connect(**(config or db_config))
+
+class ConnectionPool:
+    """
+    Fixed-size pool of MySQL connections.
+
+    Connections to the server in `config` (db_config by default) are opened
+    lazily up to `size`, health-checked when borrowed and replaced once they
+    are older than `recycle` seconds. Borrowers wait up to `timeout` seconds
+    when every connection is in use.
+    """
+
+    def __init__(self, size, timeout, recycle, config=None):
+        self.size = size
+        self.config = config
+        self.timeout = timeout
+        self.recycle = recycle
+        self._idle = []
+        self._lock = threading.Lock()
+        # Signalled whenever a connection is returned or a slot is freed
+        self._available = threading.Condition(self._lock)
+        self._opened = 0
+        self._in_use = 0
+        self._created = {}
+        self.stats = {
+            "acquired": 0,
+            "waits": 0,
+            "wait_time_total": 0.0,
+            "wait_time_max": 0.0,
+            "timeouts": 0,
+            "recycled": 0,
+            "health_check_failures": 0,
+            "peak_in_use": 0,
+        }
+
+    def _open(self):
+        return (get_db_connection(self.config), time.monotonic())
+
+    def _checkout(self):
+        # Reuse an idle connection, open a new one if below size, otherwise wait
+        deadline = time.monotonic() + self.timeout
+        waited = False
+        with self._available:
+            while True:
+                if self._idle:
+                    return self._idle.pop(), waited
+                if self._opened < self.size:
+                    self._opened += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.stats["timeouts"] += 1
+                    raise HTTPException(status_code=503, detail="Database connection pool exhausted")
+                waited = True
+                self._available.wait(remaining)
+
+        try:
+            return self._open(), waited
+        except Exception:
+            self._free_slot()
+            raise
+
+    def _free_slot(self):
+        # A waiter may now open a replacement connection
+        with self._available:
+            self._opened -= 1
+            self._available.notify()
+
+    def _validate(self, entry):
+        conn, created = entry
+        if time.monotonic() - created > self.recycle:
+            self._discard(conn)
+            with self._lock:
+                self.stats["recycled"] += 1
+            return self._open()
+
+        try:
+            conn.ping(reconnect=False)
+            return entry
+        except Exception:
+            self._discard(conn)
+            with self._lock:
+                self.stats["health_check_failures"] += 1
+            return self._open()
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def acquire(self):
+        started = time.monotonic()
+        entry, waited = self._checkout()
+        try:
+            entry = self._validate(entry)
+        except Exception:
+            # Could not replace a dead connection; free its slot
+            self._free_slot()
+            raise
+
+        elapsed = time.monotonic() - started
+        with self._lock:
+            self._in_use += 1
+            self.stats["acquired"] += 1
+            self.stats["peak_in_use"] = max(self.stats["peak_in_use"], self._in_use)
+            if waited:
+                self.stats["waits"] += 1
+            self.stats["wait_time_total"] += elapsed
+            self.stats["wait_time_max"] = max(self.stats["wait_time_max"], elapsed)
+            self._created[id(entry[0])] = entry[1]
+
+        return entry[0]
+
+    def release(self, conn):
+        with self._lock:
+            self._in_use -= 1
+            created = self._created.pop(id(conn), time.monotonic())
+
+        try:
+            # Drop any uncommitted work left behind by the request
+            conn.rollback()
+        except Exception:
+            self._discard(conn)
+            self._free_slot()
+            return
+
+        with self._available:
+            self._idle.append((conn, created))
+            self._available.notify()
+
+    def metrics(self):
+        with self._lock:
+            snapshot = dict(self.stats)
+            snapshot.update({
+                "size": self.size,
+                "opened": self._opened,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "saturation": self._in_use / self.size if self.size else 0.0,
+            })
+        return snapshot
+
+db_pool = ConnectionPool(DB_POOL_SIZE, DB_POOL_TIMEOUT, DB_POOL_RECYCLE)
+
+def borrow_db(request):
+    return db_pool.acquire(), db_pool
+
+def get_db():
+    """
+    FastAPI dependency that lends one pooled connection to a request.
+
+    Endpoints declare it as `conn=Depends(get_db)` under @offload, which
+    borrows the connection on the executor thread instead.
+    """
+    conn = db_pool.acquire()
+    try:
+        yield conn
+    finally:
+        db_pool.release(conn)
+
+# SCHEMA MIGRATIONS
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_SCHEMA = os.path.join(BASE_DIR, "SmartRide.sql")
+MIGRATIONS_DIR = os.path.join(BASE_DIR, "migrations")
+DB_MIGRATE_ON_STARTUP = os.getenv("DB_MIGRATE_ON_STARTUP", "1") == "1"
+DB_MIGRATE_LOCK_TIMEOUT = int(os.getenv("DB_MIGRATE_LOCK_TIMEOUT", "600"))  # seconds to wait for another migrator
+
+schema_state = {"version": None}
+
+def split_sql(script):
+    """
+    Split a SQL script into statements, dropping `--` comment lines
+    """
+    lines = [line for line in script.splitlines() if not line.strip().startswith("--")]
+    return [statement.strip() for statement in "\n".join(lines).split(";") if statement.strip()]
+
+def list_migrations():
+    migrations = []
+    for filename in sorted(os.listdir(MIGRATIONS_DIR)):
+        match = re.match(r"^(\d+)_(.+)\.sql$", filename)
+        if match:
+            migrations.append((int(match.group(1)), match.group(2), os.path.join(MIGRATIONS_DIR, filename)))
+    return migrations
+
+def run_migrations():
+    """
+    Bring the database up to the latest schema version.
+
+    A missing database is created from SmartRide.sql, then every file in
+    migrations/ that is not yet recorded in schema_migrations is applied in
+    order. A named lock keeps concurrent workers from migrating twice.
+    """
+    server_config = {k: v for k, v in db_config.items() if k != "database"}
+    server = mysql.connector.connect(**server_config)
+    cursor = server.cursor()
+    try:
+        cursor.execute("SHOW DATABASES LIKE %s", (db_config["database"],))
+        if not cursor.fetchall():
+            logger.info("Creating database from %s", BASELINE_SCHEMA)
+            with open(BASELINE_SCHEMA, encoding="utf-8") as f:
+                for statement in split_sql(f.read()):
+                    cursor.execute(statement)
+            server.commit()
+    finally:
+        cursor.close()
+        server.close()
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    locked = False
+    try:
+        cursor.execute("SELECT GET_LOCK('smartride_migrations', %s)", (DB_MIGRATE_LOCK_TIMEOUT,))
+        # 0 on timeout and NULL on error; never migrate without the lock
+        locked = cursor.fetchone()[0] == 1
+        if not locked:
+            raise RuntimeError(
+                f"Migration lock not acquired within {DB_MIGRATE_LOCK_TIMEOUT}s; another process is still migrating"
+            )
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INT PRIMARY KEY,
+                name VARCHAR(255) NOT NULL,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """
+        )
+        cursor.execute("SELECT version FROM schema_migrations")
+        applied = {row[0] for row in cursor.fetchall()}
+
+        for version, name, path in list_migrations():
+            if version in applied:
+                continue
+            logger.info("Applying migration %03d_%s", version, name)
+            with open(path, encoding="utf-8") as f:
+                for statement in split_sql(f.read()):
+                    cursor.execute(statement)
+            cursor.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s)", (version, name))
+            conn.commit()
+
+        cursor.execute("SELECT MAX(version) FROM schema_migrations")
+        schema_state["version"] = cursor.fetchone()[0] or 0
+        # Tables or columns may have changed
+        schema_registry.load(conn)
+        return schema_state["version"]
+    finally:
+        if locked:
+            cursor.execute("SELECT RELEASE_LOCK('smartride_migrations')")
+            cursor.fetchall()
+        cursor.close()
+        conn.close()
+
+# Blocking driver calls from coroutine endpoints run on this bounded executor.
+# Connections are only borrowed on its threads (see offload), so a request
+# never holds a connection while it queues for a thread; one thread per
+# pooled connection leaves each thread waiting, at worst, on code that is
+# already running.
+db_executor = ThreadPoolExecutor(max_workers=DB_POOL_SIZE, thread_name_prefix="db")
+
+async def run_db(func, *args, **kwargs):
+    """
+    Run a blocking database function without stalling the event loop
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(db_executor, functools.partial(func, *args, **kwargs))
+
+# Connection dependencies offload resolves itself, and how to borrow from each
+CONNECTION_SOURCES = {get_db: borrow_db}
+
+def call_with_connection(func, borrow, request, args, kwargs):
+    conn, pool = borrow(request)
+    try:
+        return func(*args, conn=conn, **kwargs)
+    finally:
+        pool.release(conn)
+
+async def run_with_db(func, *args):
+    """
+    Run func(*args, conn=...) on db_executor with a primary connection, for
+    coroutine endpoints that finish their slow work before borrowing one
+    """
+    return await run_db(call_with_connection, func, borrow_db, None, args, {})
+
+def offload(func):
+    """
+    Turn a blocking handler into a coroutine endpoint that runs on db_executor.
+
+    A `conn` parameter that depends on one of CONNECTION_SOURCES is hidden
+    from FastAPI and borrowed inside the executor thread, then returned
+    before the thread is.
+    """
+    signature = inspect.signature(func)
+    conn_param = signature.parameters.get("conn")
+    borrow = None
+    if conn_param is not None and isinstance(conn_param.default, DependsParam):
+        borrow = CONNECTION_SOURCES.get(conn_param.default.dependency)
+
+    if borrow is None:
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            return await run_db(func, *args, **kwargs)
+        return wrapper
+
+    # The read sources need the request to pick a server
+    has_request = "request" in signature.parameters
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        request = kwargs["request"] if has_request else kwargs.pop("request")
+        return await run_db(call_with_connection, func, borrow, request, args, kwargs)
 
-def hash_password(password: str) -> str:
+    parameters = [param for name, param in signature.parameters.items() if name != "conn"]
+    if not has_request:
+        parameters.append(inspect.Parameter("request", inspect.Parameter.KEYWORD_ONLY, annotation=Request))
+    wrapper.__signature__ = signature.replace(parameters=parameters)
+    return wrapper
+
+# PASSWORD HASHING
+PASSWORD_ROUNDS = int(os.getenv("PASSWORD_ROUNDS", "12"))  # bcrypt cost; each step doubles the work
+PASSWORD_WORKERS = int(os.getenv("PASSWORD_WORKERS", str(os.cpu_count() or 1)))  # hashing processes
+PASSWORD_MAX_PENDING = int(os.getenv("PASSWORD_MAX_PENDING", "64"))  # hashes queued or running before 503
+
+# Unsalted SHA-256 hex digests stored before bcrypt
+LEGACY_HASH = re.compile(r"^[0-9a-f]{64}$")
+
+def legacy_password_hash(password):
     return hashlib.sha256(password.encode()).hexdigest()
 
+def bcrypt_rounds(password_hash):
+    try:
+        return int(password_hash.split("$")[2])
+    except (IndexError, ValueError):
+        return None
+
+class PasswordHasher:
+    """
+    bcrypt hashing and checks in a dedicated process pool.
+
+    bcrypt is slow on purpose, so running it on request threads would tie
+    them up for the length of every hash. The work goes to `workers` spawned
+    processes instead, and coroutine endpoints await it without holding a
+    thread or a database connection. At most `max_pending` hashes may be
+    queued or running; past that, requests get 503 instead of piling up.
+
+    Legacy SHA-256 hashes are still accepted. verify_async() hands back a bcrypt
+    replacement for them, and for bcrypt hashes of another cost, for the
+    caller to store.
+    """
+
+    def __init__(self, rounds, workers, max_pending):
+        self.rounds = rounds
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor = None
+        self._pending = 0
+        self._lock = threading.Lock()
+        self.stats = {"hashed": 0, "checked": 0, "legacy_checked": 0, "rehashed": 0, "rejected": 0}
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                # Spawned rather than forked: the API process runs threads
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._executor
+
+    def _submit(self, func, *args):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.stats["rejected"] += 1
+                raise HTTPException(status_code=503, detail="Too many password checks in progress, retry shortly")
+            self._pending += 1
+        try:
+            future = self._pool().submit(func, *args)
+        except Exception:
+            self._done(None)
+            raise
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, future):
+        with self._lock:
+            self._pending -= 1
+
+    def _count(self, stat, amount=1):
+        with self._lock:
+            self.stats[stat] += amount
+
+    async def hash_async(self, password):
+        password_hash = await asyncio.wrap_future(self._submit(passwords.hash_password, password, self.rounds))
+        self._count("hashed")
+        return password_hash
+
+    async def hash_many_async(self, plain_passwords):
+        """
+        Hash a batch with at most one hash per process in flight.
+
+        Every hash counts against max_pending like a login's, so a large
+        import leaves room for other requests and gets 503 once the limit
+        is reached instead of queueing past it.
+        """
+        hashes = []
+        in_flight = deque()
+        try:
+            for password in plain_passwords:
+                if len(in_flight) >= self.workers:
+                    hashes.append(await in_flight.popleft())
+                in_flight.append(asyncio.wrap_future(self._submit(passwords.hash_password, password, self.rounds)))
+            while in_flight:
+                hashes.append(await in_flight.popleft())
+        finally:
+            # On a 503 or a cancelled request, drop what has not started
+            for future in in_flight:
+                future.cancel()
+            self._count("hashed", len(hashes))
+        return hashes
+
+    async def verify_async(self, password, password_hash):
+        """
+        (matches, replacement hash to store or None)
+        """
+        if LEGACY_HASH.match(password_hash):
+            self._count("legacy_checked")
+            if not hmac.compare_digest(password_hash, legacy_password_hash(password)):
+                return False, None
+        elif bcrypt_rounds(password_hash) is None:
+            return False, None
+        else:
+            matches = await asyncio.wrap_future(self._submit(passwords.check_password, password, password_hash))
+            self._count("checked")
+            if not matches:
+                return False, None
+            if bcrypt_rounds(password_hash) == self.rounds:
+                return True, None
+        self._count("rehashed")
+        return True, await self.hash_async(password)
+
+    def stop(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def metrics(self):
+        with self._lock:
+            return dict(self.stats, rounds=self.rounds, workers=self.workers,
+                        pending=self._pending, max_pending=self.max_pending)
+
+password_hasher = PasswordHasher(PASSWORD_ROUNDS, PASSWORD_WORKERS, PASSWORD_MAX_PENDING)
+
+# WORKER MESSAGE BUS
+BUS_BACKEND = os.getenv("BUS_BACKEND", "memory")  # "memory" (one process) or "redis" (several workers or hosts)
+BUS_REDIS_URL = os.getenv("BUS_REDIS_URL", os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0"))
+BUS_CHANNEL = "smartride:bus"
+
+def encode_shared(value):
+    """
+    json.dumps default for what workers share through Redis: datetimes and
+    decimals from MySQL rows keep their type, sets travel as lists and bytes
+    as text
+    """
+    if isinstance(value, datetime.datetime):
+        return {"__datetime__": value.isoformat()}
+    if isinstance(value, datetime.date):
+        return {"__date__": value.isoformat()}
+    if isinstance(value, decimal.Decimal):
+        return {"__decimal__": str(value)}
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    if isinstance(value, (bytes, bytearray)):
+        # Text columns the connector returns undecoded
+        return value.decode("utf-8", "replace")
+    raise TypeError(f"{type(value).__name__} cannot be shared between workers")
+
+def decode_shared(obj):
+    if len(obj) == 1:
+        if "__datetime__" in obj:
+            return datetime.datetime.fromisoformat(obj["__datetime__"])
+        if "__date__" in obj:
+            return datetime.date.fromisoformat(obj["__date__"])
+        if "__decimal__" in obj:
+            return decimal.Decimal(obj["__decimal__"])
+    return obj
+
+def dump_shared(value):
+    return json.dumps(value, default=encode_shared)
+
+def load_shared(raw):
+    # Plain data only: unlike pickle, nothing read from Redis can run code here
+    return json.loads(raw, object_hook=decode_shared)
+
+class LocalBus:
+    """
+    Message bus for a single worker process.
+
+    Caches, indexes and counters live in each worker's memory. Calls that
+    change them are marked @replicated and published here after running
+    locally, so other workers can replay them with dispatch(). With one
+    process there is nobody else to tell and publish() does nothing.
+    """
+
+    backend = "memory"
+
+    def __init__(self):
+        self._targets = {}
+        self._functions = {}
+        self._lock = threading.Lock()
+        self.stats = {"published": 0, "received": 0, "errors": 0}
+
+    def register(self, target):
+        """
+        Receive replicated method calls for the one instance of its class
+        """
+        self._targets[type(target).__name__] = target
+        return target
+
+    def register_function(self, func):
+        self._functions[func.__name__] = func
+        return func
+
+    def publish(self, target, name, args):
+        pass
+
+    def dispatch(self, target, name, args):
+        """
+        Replay a call made on another worker without publishing it again
+        """
+        if target is None:
+            func = self._functions[name]
+            getattr(func, "local", func)(*args)
+        else:
+            obj = self._targets[target]
+            method = getattr(type(obj), name)
+            getattr(method, "local", method)(obj, *args)
+
+    def _count(self, stat):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def metrics(self):
+        with self._lock:
+            return dict(self.stats, backend=self.backend)
+
+class RedisBus(LocalBus):
+    """
+    Message bus shared by every worker through Redis pub/sub.
+
+    Messages are [origin, target, name, args] JSON arrays on one
+    channel. A listener thread replays the ones other workers sent. Redis
+    pub/sub does not store messages, so a worker that was disconnected
+    misses what was sent meanwhile; cache TTLs, the driver index check and
+    the metrics rollup bound how long that lasts. Publishing never fails a
+    request: if Redis is down the change still holds on this worker.
+    """
+
+    backend = "redis"
+
+    def __init__(self, url, channel):
+        import redis  # optional dependency, only needed for BUS_BACKEND=redis
+
+        super().__init__()
+        self._client = redis.Redis.from_url(url, socket_timeout=0.5)
+        self.channel = channel
+        self._node = f"{socket.gethostname()}:{uuid.uuid4().hex}"
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def origin(self):
+        # Includes the pid so workers forked from one parent still tell themselves apart
+        return f"{self._node}:{os.getpid()}"
+
+    def publish(self, target, name, args):
+        try:
+            self._client.publish(self.channel, dump_shared([self.origin, target, name, list(args)]))
+            self._count("published")
+        except Exception as e:
+            self._count("errors")
+            logger.warning("Message bus publish of %s failed: %s", name, e)
+
+    def _run(self):
+        while not self._stop.is_set():
+            pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+            try:
+                pubsub.subscribe(self.channel)
+                while not self._stop.is_set():
+                    message = pubsub.get_message(timeout=1.0)
+                    if message is None:
+                        continue
+                    try:
+                        origin, target, name, args = load_shared(message["data"])
+                    except ValueError as e:
+                        self._count("errors")
+                        logger.warning("Message bus dropped a malformed message: %s", e)
+                        continue
+                    if origin == self.origin:
+                        continue
+                    self._count("received")
+                    try:
+                        self.dispatch(target, name, args)
+                    except Exception as e:
+                        self._count("errors")
+                        logger.warning("Message bus could not apply %s: %s", name, e)
+            except Exception as e:
+                self._count("errors")
+                logger.warning("Message bus connection lost: %s", e)
+                self._stop.wait(1)
+            finally:
+                pubsub.close()
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="message-bus", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join(timeout=5)
+            self._thread = None
+
+def make_message_bus():
+    if BUS_BACKEND == "redis":
+        try:
+            return RedisBus(BUS_REDIS_URL, BUS_CHANNEL)
+        except ImportError:
+            logger.warning("BUS_BACKEND=redis needs the redis package; workers will not share state")
+    return LocalBus()
+
+message_bus = make_message_bus()
+
+def replicated(func):
+    """
+    Mark a call that changes worker memory. It runs here, then message_bus
+    replays it on every other worker. Methods are replayed on the instance
+    registered for their class, so arguments are positional and must survive
+    dump_shared (JSON plus datetimes and decimals; tuples arrive as lists).
+    """
+    is_method = "." in func.__qualname__
+
+    @functools.wraps(func)
+    def wrapper(*args):
+        result = func(*args)
+        if is_method:
+            message_bus.publish(type(args[0]).__name__, func.__name__, args[1:])
+        else:
+            message_bus.publish(None, func.__name__, args)
+        return result
+
+    wrapper.local = func
+    if not is_method:
+        message_bus.register_function(wrapper)
+    return wrapper
+
+# READ REPLICAS
+DB_REPLICA_HOSTS = [host.strip() for host in os.getenv("DB_REPLICA_HOSTS", "").split(",") if host.strip()]  # "host[:port],..."
+DB_REPLICA_MAX_LAG = float(os.getenv("DB_REPLICA_MAX_LAG", "5"))  # seconds behind the primary a replica may serve reads
+DB_REPLICA_CHECK_INTERVAL = float(os.getenv("DB_REPLICA_CHECK_INTERVAL", "5"))
+DB_READ_STICKY = float(os.getenv("DB_READ_STICKY", "10"))  # seconds reads of just-written rows stay on the primary
+STICKY_KEYS_MAX = 10000
+
+def replica_config(address):
+    host, _, port = address.partition(":")
+    config = dict(db_config, host=host)
+    if port:
+        config["port"] = int(port)
+    return config
+
+def replication_lag(conn):
+    """
+    Seconds the server behind `conn` trails its primary, None when replication is stopped
+    """
+    cursor = conn.cursor(dictionary=True)
+    try:
+        try:
+            cursor.execute("SHOW REPLICA STATUS")
+        except mysql.connector.Error:
+            # MariaDB before 10.5 and MySQL before 8.0.22
+            cursor.execute("SHOW SLAVE STATUS")
+        status = cursor.fetchone()
+    finally:
+        cursor.close()
+    if status is None:
+        # Not a replica at all, e.g. a second local server loaded with a copy of the data
+        return 0.0
+    lag = status.get("Seconds_Behind_Source", status.get("Seconds_Behind_Master"))
+    return None if lag is None else float(lag)
+
+class ReplicaRouter:
+    """
+    Routes reads to replica pools and leaves writes on the primary.
+
+    Replicas are polled for replication lag. One that trails by more than
+    `max_lag` seconds, has stopped replicating or cannot be reached is
+    skipped until the next check; with no usable replica, reads fall back to
+    the primary.
+
+    After a write, the ride, user or table it touched is sticky for
+    `sticky_seconds` on every worker, and reads that name a sticky key go to
+    the primary, so clients always read their own writes.
+    """
+
+    def __init__(self, addresses, max_lag, sticky_seconds):
+        self.max_lag = max_lag
+        self.sticky_seconds = sticky_seconds
+        self.replicas = [
+            {"address": address, "lag": None, "usable": False, "error": "not checked yet",
+             "pool": ConnectionPool(DB_POOL_SIZE, DB_POOL_TIMEOUT, DB_POOL_RECYCLE, replica_config(address))}
+            for address in addresses
+        ]
+        self._next = 0
+        self._sticky = {}  # key -> monotonic time it stops being sticky
+        self._lock = threading.Lock()
+        self.stats = {"replica_reads": 0, "primary_reads": 0, "sticky_reads": 0, "fallbacks": 0}
+
+    @replicated
+    def stick(self, *keys):
+        if not self.replicas:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if len(self._sticky) > STICKY_KEYS_MAX:
+                self._sticky = {key: until for key, until in self._sticky.items() if until > now}
+            for key in keys:
+                self._sticky[key] = now + self.sticky_seconds
+
+    def is_sticky(self, keys):
+        now = time.monotonic()
+        with self._lock:
+            return any(self._sticky.get(key, 0) > now for key in keys)
+
+    def _count(self, stat):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def _usable(self):
+        # Round robin over the usable replicas
+        with self._lock:
+            usable = [replica for replica in self.replicas if replica["usable"]]
+            if not usable:
+                return []
+            start = self._next % len(usable)
+            self._next += 1
+        return usable[start:] + usable[:start]
+
+    def acquire_read(self, keys=()):
+        """
+        A connection for a read about `keys`, and the pool to release it to
+        """
+        if self.replicas:
+            if self.is_sticky(keys):
+                self._count("sticky_reads")
+            else:
+                for replica in self._usable():
+                    try:
+                        conn = replica["pool"].acquire()
+                    except Exception as e:
+                        with self._lock:
+                            replica.update(usable=False, error=str(e))
+                        continue
+                    self._count("replica_reads")
+                    return conn, replica["pool"]
+                self._count("fallbacks")
+        self._count("primary_reads")
+        return db_pool.acquire(), db_pool
+
+    def check(self):
+        for replica in self.replicas:
+            try:
+                conn = replica["pool"].acquire()
+                try:
+                    lag = replication_lag(conn)
+                finally:
+                    replica["pool"].release(conn)
+                error = None if lag is not None else "replication is not running"
+            except Exception as e:
+                lag, error = None, str(e)
+            with self._lock:
+                replica.update(lag=lag, error=error, usable=lag is not None and lag <= self.max_lag)
+        return self.status()
+
+    def status(self):
+        with self._lock:
+            return [{key: value for key, value in replica.items() if key != "pool"} for replica in self.replicas]
+
+    def metrics(self):
+        status = self.status()
+        for entry, replica in zip(status, self.replicas):
+            entry["pool"] = replica["pool"].metrics()
+        with self._lock:
+            return dict(self.stats, max_lag=self.max_lag, replicas=status)
+
+replicas = message_bus.register(ReplicaRouter(DB_REPLICA_HOSTS, DB_REPLICA_MAX_LAG, DB_READ_STICKY))
+
+# Tables listed under a path whose first segment is not the table name
+READ_TABLES = {"gps": "gps_tracking"}
+
+def read_keys(request):
+    """
+    Sticky keys a read touches: the table it lists and the rides and users it
+    names. The table key matches the one invalidate_rows sticks on writes.
+    """
+    params = {**request.query_params, **request.path_params}
+    segment = request.url.path.strip("/").split("/")[0]
+    keys = [f"table:{params.get('table_name') or READ_TABLES.get(segment, segment)}"]
+    for name, value in params.items():
+        if name == "ride_id":
+            keys.append(f"ride:{value}")
+        elif name in ("user_id", "customer_id", "driver_id"):
+            keys.append(f"user:{value}")
+    return keys
+
+def borrow_read_db(request):
+    return replicas.acquire_read(read_keys(request))
+
+def get_read_db(request: Request):
+    """
+    FastAPI dependency like get_db, for endpoints that only read; the
+    connection comes from a replica when one is usable
+    """
+    conn, pool = borrow_read_db(request)
+    try:
+        yield conn
+    finally:
+        pool.release(conn)
+
+CONNECTION_SOURCES[get_read_db] = borrow_read_db
+
+# RIDE EVENTS
+EVENT_QUEUE_SIZE = int(os.getenv("EVENT_QUEUE_SIZE", "100"))
+SSE_KEEPALIVE = float(os.getenv("SSE_KEEPALIVE", "15"))  # seconds between keep-alive comments
+
+class EventBus:
+    """
+    In-process pub/sub fan-out for ride updates.
+
+    Each subscriber owns a bounded asyncio.Queue. When a slow client lets its
+    queue fill up, the oldest event is dropped so a stalled connection never
+    holds memory or blocks publishers. Events are state snapshots, so the
+    latest one is always enough for a client to catch up.
+
+    publish() may be called from executor threads; delivery always happens on
+    the event loop. Events also reach the subscribers of other workers
+    through message_bus.
+    """
+
+    def __init__(self, queue_size):
+        self.queue_size = queue_size
+        self._subscribers = {}
+        self._loop = None
+        self.stats = {"published": 0, "delivered": 0, "dropped": 0}
+
+    def bind(self, loop):
+        self._loop = loop
+
+    def subscribe(self, topic):
+        subscriber = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.setdefault(topic, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, topic, subscriber):
+        subscribers = self._subscribers.get(topic)
+        if subscribers:
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self._subscribers[topic]
+
+    @replicated
+    def publish(self, topic, event):
+        if self._loop is None or self._loop.is_closed():
+            return
+        self._loop.call_soon_threadsafe(self._deliver, topic, event)
+
+    def _deliver(self, topic, event):
+        self.stats["published"] += 1
+        for subscriber in list(self._subscribers.get(topic, ())):
+            if subscriber.full():
+                subscriber.get_nowait()
+                self.stats["dropped"] += 1
+            subscriber.put_nowait(event)
+            self.stats["delivered"] += 1
+
+    def metrics(self):
+        return dict(self.stats, topics=len(self._subscribers),
+                    subscribers=sum(len(s) for s in self._subscribers.values()))
+
+ride_events = message_bus.register(EventBus(EVENT_QUEUE_SIZE))
+
+def publish_ride_event(ride_id, driver_id, event, **fields):
+    """
+    Notify everyone watching the ride and its driver
+    """
+    payload = {"event": event, "ride_id": ride_id, "driver_id": driver_id, **fields}
+    ride_events.publish(f"ride:{ride_id}", payload)
+    if driver_id:
+        ride_events.publish(f"driver:{driver_id}", payload)
+    notifier.enqueue(payload)
+
+# READ CACHE
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")  # "memory" or "redis"
+CACHE_TTL = float(os.getenv("CACHE_TTL", "30"))  # seconds a cached read may be served
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0")
+
+# Returned by get() on a miss, since None is a legitimate cached value
+CACHE_MISS = object()
+
+class MemoryCache:
+    """
+    In-process LRU cache with a time to live on every entry.
+
+    Writers invalidate keys after they commit, here and on the other workers
+    through message_bus. A read that started before an invalidation does
+    not store its result, so a slow loader can never put a pre-write value
+    back in the cache.
+    """
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, value), oldest first
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.stats = {"hits": 0, "misses": 0, "sets": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= time.monotonic():
+                del self._entries[key]
+                self.stats["expirations"] += 1
+                entry = None
+            if entry is None:
+                self.stats["misses"] += 1
+                return CACHE_MISS
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return entry[1]
+
+    def get_or_load(self, key, loader):
+        value = self.get(key)
+        if value is not CACHE_MISS:
+            return value
+
+        generation = self._generation
+        value = loader()
+        with self._lock:
+            if generation == self._generation:
+                self._entries[key] = (time.monotonic() + self.ttl, value)
+                self._entries.move_to_end(key)
+                self.stats["sets"] += 1
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.stats["evictions"] += 1
+        return value
+
+    @replicated
+    def delete(self, *keys):
+        with self._lock:
+            self._generation += 1
+            for key in keys:
+                if self._entries.pop(key, None) is not None:
+                    self.stats["invalidations"] += 1
+
+    @replicated
+    def delete_prefix(self, prefix):
+        with self._lock:
+            self._generation += 1
+            for key in [key for key in self._entries if key.startswith(prefix)]:
+                del self._entries[key]
+                self.stats["invalidations"] += 1
+
+    def metrics(self):
+        with self._lock:
+            return dict(self.stats, backend="memory", entries=len(self._entries),
+                        max_entries=self.max_entries, ttl=self.ttl)
+
+class RedisCache:
+    """
+    Cache shared by every worker through a Redis-compatible server.
+
+    Entries expire server side and eviction is left to the server's
+    maxmemory policy. When the server is unreachable reads fall through to
+    MySQL instead of failing the request.
+
+    As in MemoryCache, every invalidation bumps a generation counter, here
+    kept on the server so all workers share it. A loaded value is stored by
+    a script that first checks the counter, so a read that started before
+    any worker's invalidation cannot put a pre-write value back.
+    """
+
+    namespace = "smartride:"
+    generation_key = namespace + "generation"
+    # KEYS: generation, entry; ARGV: generation seen before loading, value, ttl in ms
+    store_script = """
+    if tonumber(redis.call('GET', KEYS[1]) or '0') ~= tonumber(ARGV[1]) then
+        return 0
+    end
+    redis.call('SET', KEYS[2], ARGV[2], 'PX', ARGV[3])
+    return 1
+    """
+
+    def __init__(self, url, ttl):
+        import redis  # optional dependency, only needed for CACHE_BACKEND=redis
+
+        self._client = redis.Redis.from_url(url, socket_timeout=0.5)
+        self._errors = (redis.RedisError,)
+        self.ttl = ttl
+        self._store = self._client.register_script(self.store_script)
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "sets": 0, "stale": 0, "invalidations": 0, "errors": 0}
+
+    def _count(self, stat, amount=1):
+        with self._lock:
+            self.stats[stat] += amount
+
+    def get(self, key):
+        try:
+            raw = self._client.get(self.namespace + key)
+        except self._errors:
+            self._count("errors")
+            raw = None
+        if raw is None:
+            self._count("misses")
+            return CACHE_MISS
+        self._count("hits")
+        return load_shared(raw)
+
+    def get_or_load(self, key, loader):
+        value = self.get(key)
+        if value is not CACHE_MISS:
+            return value
+
+        try:
+            generation = self._client.incrby(self.generation_key, 0)
+        except self._errors:
+            self._count("errors")
+            return loader()
+
+        value = loader()
+        try:
+            stored = self._store(keys=[self.generation_key, self.namespace + key],
+                                 args=[generation, dump_shared(value), int(self.ttl * 1000)])
+            self._count("sets" if stored else "stale")
+        except self._errors:
+            self._count("errors")
+        return value
+
+    def _invalidate(self, keys):
+        # The bump and the deletes apply together, so no load can slip between them
+        pipeline = self._client.pipeline()
+        pipeline.incr(self.generation_key)
+        if keys:
+            pipeline.delete(*keys)
+        results = pipeline.execute()
+        self._count("invalidations", results[1] if keys else 0)
+
+    def delete(self, *keys):
+        if not keys:
+            return
+        try:
+            self._invalidate([self.namespace + key for key in keys])
+        except self._errors:
+            self._count("errors")
+
+    def delete_prefix(self, prefix):
+        try:
+            self._invalidate(list(self._client.scan_iter(match=self.namespace + prefix + "*", count=500)))
+        except self._errors:
+            self._count("errors")
+
+    def metrics(self):
+        with self._lock:
+            return dict(self.stats, backend="redis", ttl=self.ttl)
+
+def make_read_cache():
+    if CACHE_BACKEND == "redis":
+        try:
+            return RedisCache(CACHE_REDIS_URL, CACHE_TTL)
+        except ImportError:
+            logger.warning("CACHE_BACKEND=redis but the redis package is not installed; using the in-process cache")
+    return MemoryCache(CACHE_MAX_ENTRIES, CACHE_TTL)
+
+read_cache = message_bus.register(make_read_cache())
+
+def ride_state_key(ride_id):
+    return f"ride_state:{ride_id}"
+
+def user_rides_key(role, user_id):
+    return f"user_rides:{role}:{user_id}"
+
+def invalidate_ride(ride_id, customer_id=None, *driver_ids):
+    """
+    Drop the cached state of a ride and the ride lists it appears in
+    """
+    keys = [ride_state_key(ride_id)]
+    if customer_id is not None:
+        keys.append(user_rides_key("customer", customer_id))
+    keys.extend(user_rides_key("driver", driver_id) for driver_id in driver_ids if driver_id is not None)
+    read_cache.delete(*keys)
+    users = [user_id for user_id in (customer_id, *driver_ids) if user_id is not None]
+    replicas.stick(f"ride:{ride_id}", *(f"user:{user_id}" for user_id in users))
+
 # FASTAPI APP SETUP
 app = FastAPI(
     title="SmartRide API",
@@ -32,492 +1173,3009 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Unread-Count"],
 )
 
-# API ROUTES
-@app.get("/")
-def home():
-    return {"message": "Welcome to SmartRide API"}
-
-# Admin Verification Endpoint
-class AdminVerify(BaseModel):
-    email: str
-    password: str
-
-@app.post("/verify-admin/")
-async def verify_admin(admin_data: AdminVerify):
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    
+@app.on_event("startup")
+async def migrate_schema():
+    if not DB_MIGRATE_ON_STARTUP:
+        return
     try:
-        # Hash the provided password
-        hashed_password = hash_password(admin_data.password)
-        
-        # Find the admin user
-        cursor.execute(
-            "SELECT u.* FROM users u JOIN administrators a ON u.user_id = a.admin_id WHERE u.email = %s AND u.role = 'admin'",
-            (admin_data.email,)
-        )
-        
-        user = cursor.fetchone()
-        
-        if not user:
-            return {"verified": False, "message": "Admin user not found"}
-        
-        # For development, you can just compare the email and return true
-        # This is just to get you unblocked
-        return {"verified": True, "user": user}
-        
-        # In production, uncomment this to properly verify the password
-        # if user["password_hash"] == hashed_password:
-        #     return {"verified": True, "user": user}
-        # else:
-        #     return {"verified": False, "message": "Invalid password"}
-        
+        version = await run_db(run_migrations)
+        logger.info("Database schema at version %s", version)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Verification failed: {str(e)}")
-    finally:
-        cursor.close()
-        conn.close()
+        logger.error("Schema migration failed: %s", e)
+
+@app.on_event("startup")
+async def bind_event_loop():
+    ride_events.bind(asyncio.get_running_loop())
+
+@app.on_event("startup")
+async def start_message_bus():
+    message_bus.start()
+
+@app.on_event("shutdown")
+async def stop_message_bus():
+    await run_db(message_bus.stop)
+
+@app.on_event("shutdown")
+async def stop_password_hasher():
+    await run_db(password_hasher.stop)
+
+# LIST PAGINATION
+LIST_DEFAULT_LIMIT = 100
+LIST_MAX_LIMIT = 1000
+
+RIDE_COLUMNS = ("ride_id", "customer_id", "driver_id", "pickup_location", "dropoff_location",
+                "status", "fare", "start_time", "end_time")
+USER_COLUMNS = ("user_id", "email", "role", "created_at")  # never the password hash
+VEHICLE_COLUMNS = ("vehicle_id", "driver_id", "type", "plate_number")
+FEEDBACK_COLUMNS = ("feedback_id", "ride_id", "rating", "comment", "feedback_time")
+PAYMENT_COLUMNS = ("payment_id", "ride_id", "amount", "status", "payment_time")
+NOTIFICATION_COLUMNS = ("notification_id", "user_id", "message", "is_read", "created_at")
+GPS_COLUMNS = ("tracking_id", "ride_id", "eta", "gps_image", "updated_at")
+
+def parse_fields(fields, columns):
+    """
+    Validate a comma separated `fields=` projection against the table columns
+    """
+    if not fields:
+        return list(columns)
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in requested if f not in columns]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return requested
+
+def fetch_page(conn, response, table, key, columns, filters, cursor, limit, fields,
+               time_column=None, since=None, until=None, cache_key=None):
+    """
+    Keyset-paginate a table on its primary key.
+
+    Rows with key > cursor are returned in key order, at most `limit` of them.
+    When more rows remain, the last key is sent back in the X-Next-Cursor
+    header so the client can ask for the following page. Pages are served
+    from read_cache when a `cache_key` is given.
+    """
+    load = functools.partial(query_page, conn, table, key, columns, filters, cursor, limit, fields,
+                             time_column, since, until)
+    rows, next_cursor = read_cache.get_or_load(cache_key, load) if cache_key else load()
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return rows
+
+def page_query(table, key, columns, filters, cursor, limit, fields, time_column=None, since=None, until=None):
+    """
+    SQL and parameters for one keyset page, reading one row past `limit`
+    """
+    selected = parse_fields(fields, columns)
+    # The key is always read so the next cursor can be computed
+    select_columns = selected if key in selected else [key] + selected
+
+    conditions = []
+    params = []
+    if cursor is not None:
+        conditions.append(f"{key} > %s")
+        params.append(cursor)
+    for column, value in filters.items():
+        if value is not None:
+            conditions.append(f"{column} = %s")
+            params.append(value)
+    if time_column and since is not None:
+        conditions.append(f"{time_column} >= %s")
+        params.append(since)
+    if time_column and until is not None:
+        conditions.append(f"{time_column} < %s")
+        params.append(until)
+
+    sql = f"SELECT {', '.join(select_columns)} FROM {table}"
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    sql += f" ORDER BY {key} LIMIT %s"
+    params.append(limit + 1)
+    return sql, tuple(params)
+
+def query_page(conn, table, key, columns, filters, cursor, limit, fields, time_column, since, until):
+    """
+    One page of rows and the cursor of the page after it, if any
+    """
+    sql, params = page_query(table, key, columns, filters, cursor, limit, fields, time_column, since, until)
+    db_cursor = conn.cursor(dictionary=True)
+    try:
+        db_cursor.execute(sql, params)
+        rows = db_cursor.fetchall()
+    finally:
+        db_cursor.close()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = str(rows[-1][key])
+
+    if key not in parse_fields(fields, columns):
+        for row in rows:
+            del row[key]
+    return rows, next_cursor
+
+# API ROUTES
+@app.get("/")
+def home():
+    return {"message": "Welcome to SmartRide API"}
+
+@app.get("/health")
+@offload
+def health():
+    """
+    Liveness, database reachability and schema version
+    """
+    database = "ok"
+    try:
+        db_pool.release(db_pool.acquire())
+    except Exception:
+        database = "unavailable"
+    return {"status": "ok", "database": database, "schema_version": schema_state["version"]}
+
+@app.get("/metrics")
+def get_metrics():
+    """
+    Runtime counters for monitoring
+    """
+    return {"db_pool": db_pool.metrics(), "events": ride_events.metrics(), "cache": read_cache.metrics(),
+            "gps": telemetry.metrics(), "eta": eta_engine.metrics(), "notifications": notifier.metrics(),
+            "bus": message_bus.metrics(), "db_replicas": replicas.metrics(), "passwords": password_hasher.metrics()}
+
+# Admin Verification Endpoint
+class AdminVerify(BaseModel):
+    email: str
+    password: str
+
+VERIFY_ADMIN_SQL = "SELECT u.user_id, u.email, u.password_hash, u.role, u.created_at FROM users u JOIN administrators a ON u.user_id = a.admin_id WHERE u.email = %s AND u.role = 'admin'"
+EMAIL_EXISTS_SQL = "SELECT email FROM users WHERE email = %s"
+
+def find_admin_user(email):
+    conn = db_pool.acquire()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute(VERIFY_ADMIN_SQL, (email,))
+        return cursor.fetchone()
+    finally:
+        cursor.close()
+        db_pool.release(conn)
+
+@app.post("/verify-admin/")
+async def verify_admin(admin_data: AdminVerify):
+    """
+    Check an admin's email and password, as /login does, and return the
+    user without its password hash
+    """
+    email = admin_data.email.strip().lower()
+    if login_guard.is_limited(email):
+        raise HTTPException(status_code=429, detail="Too many failed login attempts. Try again later.")
+
+    try:
+        user = await run_db(find_admin_user, email)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Verification failed: {str(e)}")
+
+    # The same answer for an unknown admin and a wrong password
+    if not user:
+        login_guard.record_failure(email)
+        return {"verified": False, "message": "Invalid admin credentials"}
+    password_hash = user.pop("password_hash")
+    password_ok, new_hash = await password_hasher.verify_async(admin_data.password, password_hash)
+    if not password_ok:
+        login_guard.record_failure(email)
+        return {"verified": False, "message": "Invalid admin credentials"}
+
+    if new_hash:
+        try:
+            await run_db(replace_password_hash, user["user_id"], password_hash, new_hash)
+        except Exception as e:
+            logger.warning("Could not rehash password of user %s: %s", user["user_id"], e)
+    login_guard.record_success(email)
+    return {"verified": True, "user": user}
+
+# USERS ENDPOINT
+class UserCreate(BaseModel):
+    email: str
+    password: str
+    role: str
+
+@app.post("/users/", response_model=dict)
+async def create_user(user: UserCreate):
+    # Hashed in the password pool before a database connection is taken
+    hashed_password = await password_hasher.hash_async(user.password)
+    return await run_db(insert_user, user, hashed_password)
+
+def insert_user(user, hashed_password):
+    conn = db_pool.acquire()
+    cursor = conn.cursor()
+    try:
+        # Check if email already exists
+        cursor.execute(EMAIL_EXISTS_SQL, (user.email,))
+        if cursor.fetchone():
+            raise HTTPException(status_code=400, detail="Email already registered")
+
+        # Insert new user
+        cursor.execute(
+            "INSERT INTO users (email, password_hash, role) VALUES (%s, %s, %s)",
+            (user.email, hashed_password, user.role)
+        )
+        user_id = cursor.lastrowid
+
+        # Create role-specific record
+        if user.role == "customer":
+            cursor.execute("INSERT INTO customers (customer_id) VALUES (%s)", (user_id,))
+        elif user.role == "driver":
+            cursor.execute("INSERT INTO drivers (driver_id) VALUES (%s)", (user_id,))
+        elif user.role == "admin":
+            cursor.execute("INSERT INTO administrators (admin_id) VALUES (%s)", (user_id,))
+
+        conn.commit()
+    finally:
+        cursor.close()
+        db_pool.release(conn)
+    login_guard.forget(user.email)
+
+    return {"message": "User created successfully", "user_id": user_id}
+
+@app.get("/users/")
+@offload
+def get_users(
+    response: Response,
+    cursor: int = None,
+    limit: int = Query(LIST_DEFAULT_LIMIT, ge=1, le=LIST_MAX_LIMIT),
+    role: str = None,
+    since: datetime.datetime = None,
+    until: datetime.datetime = None,
+    fields: str = None,
+    conn=Depends(get_read_db)
+):
+    return fetch_page(
+        conn, response, "users", "user_id", USER_COLUMNS,
+        {"role": role}, cursor, limit, fields, "created_at", since, until
+    )
+
+# Special endpoint to create admin user
+@app.post("/create-admin/", response_model=dict)
+async def create_admin_user(email: str, password: str):
+    # Hashed in the password pool before a database connection is taken
+    hashed_password = await password_hasher.hash_async(password)
+    return await run_db(insert_admin_user, email, hashed_password)
+
+def insert_admin_user(email, hashed_password):
+    conn = db_pool.acquire()
+    cursor = conn.cursor()
+    
+    try:
+        # Check if email already exists
+        cursor.execute(EMAIL_EXISTS_SQL, (email,))
+        if cursor.fetchone():
+            raise HTTPException(status_code=400, detail="Email already registered")
+        
+        # Insert new admin user
+        cursor.execute(
+            "INSERT INTO users (email, password_hash, role) VALUES (%s, %s, %s)",
+            (email, hashed_password, "admin")
+        )
+        admin_id = cursor.lastrowid
+        
+        # Create administrator record
+        cursor.execute("INSERT INTO administrators (admin_id) VALUES (%s)", (admin_id,))
+        
+        conn.commit()
+        login_guard.forget(email)
+        
+        return {
+            "message": "Admin user created successfully", 
+            "user_id": admin_id,
+            "email": email,
+            "role": "admin"
+        }
+        
+    except Exception as e:
+        conn.rollback()
+        raise HTTPException(status_code=500, detail=f"Failed to create admin user: {str(e)}")
+    finally:
+        cursor.close()
+        db_pool.release(conn)
+
+# LOGIN ENDPOINT
+LOGIN_UNKNOWN_TTL = float(os.getenv("LOGIN_UNKNOWN_TTL", "60"))  # seconds an unknown email stays cached
+LOGIN_MAX_FAILURES = int(os.getenv("LOGIN_MAX_FAILURES", "5"))
+LOGIN_FAILURE_WINDOW = float(os.getenv("LOGIN_FAILURE_WINDOW", "300"))  # seconds
+LOGIN_GUARD_MAX_ENTRIES = int(os.getenv("LOGIN_GUARD_MAX_ENTRIES", "100000"))  # emails tracked per table
+
+class LoginGuard:
+    """
+    Per-email negative cache and failed-attempt limiter for /login.
+
+    Emails that do not exist are remembered for a short time so repeated
+    guesses are answered without touching MySQL, and emails with too many
+    recent failures are refused until the window passes.
+
+    The emails come from clients, so both tables are kept oldest first,
+    swept of expired entries on every write and capped at `max_entries`.
+    """
+
+    def __init__(self, unknown_ttl, max_failures, window, max_entries):
+        self.unknown_ttl = unknown_ttl
+        self.max_failures = max_failures
+        self.window = window
+        self.max_entries = max_entries
+        self._unknown = OrderedDict()  # email -> expires_at, soonest first
+        self._failures = OrderedDict()  # email -> recent failure times, least recently failed first
+        self._lock = threading.Lock()
+
+    def _sweep(self, now):
+        # Called with the lock held
+        while self._unknown and (next(iter(self._unknown.values())) < now or len(self._unknown) > self.max_entries):
+            self._unknown.popitem(last=False)
+        while self._failures and (now - next(iter(self._failures.values()))[-1] >= self.window
+                                  or len(self._failures) > self.max_entries):
+            self._failures.popitem(last=False)
+
+    def is_unknown(self, email):
+        with self._lock:
+            expires = self._unknown.get(email)
+            if expires is None:
+                return False
+            if expires < time.monotonic():
+                del self._unknown[email]
+                return False
+            return True
+
+    def mark_unknown(self, email):
+        now = time.monotonic()
+        with self._lock:
+            self._unknown.pop(email, None)
+            self._unknown[email] = now + self.unknown_ttl
+            self._sweep(now)
+
+    @replicated
+    def forget(self, email):
+        # Called when an account is created so it can log in straight away
+        with self._lock:
+            self._unknown.pop(email.strip().lower(), None)
+
+    @replicated
+    def clear_unknown(self):
+        with self._lock:
+            self._unknown.clear()
+
+    def is_limited(self, email):
+        now = time.monotonic()
+        with self._lock:
+            attempts = [t for t in self._failures.get(email, []) if now - t < self.window]
+            if attempts:
+                self._failures[email] = attempts
+            else:
+                self._failures.pop(email, None)
+            return len(attempts) >= self.max_failures
+
+    def record_failure(self, email):
+        now = time.monotonic()
+        with self._lock:
+            # Only the latest max_failures attempts can matter to is_limited
+            attempts = self._failures.pop(email, [])[-(self.max_failures - 1):] if self.max_failures > 1 else []
+            self._failures[email] = attempts + [now]
+            self._sweep(now)
+
+    def record_success(self, email):
+        with self._lock:
+            self._failures.pop(email, None)
+
+login_guard = message_bus.register(
+    LoginGuard(LOGIN_UNKNOWN_TTL, LOGIN_MAX_FAILURES, LOGIN_FAILURE_WINDOW, LOGIN_GUARD_MAX_ENTRIES)
+)
+
+LOGIN_SQL = "SELECT user_id, email, password_hash, role, created_at FROM users WHERE email = %s"
+REHASH_SQL = "UPDATE users SET password_hash = %s WHERE user_id = %s AND password_hash = %s"
+
+class LoginRequest(BaseModel):
+    email: str
+    password: str
+    role: str = None
+
+def find_login_user(email):
+    conn = db_pool.acquire()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        # users.email is UNIQUE, so this is a single index lookup
+        cursor.execute(LOGIN_SQL, (email,))
+        return cursor.fetchone()
+    finally:
+        cursor.close()
+        db_pool.release(conn)
+
+def replace_password_hash(user_id, old_hash, new_hash):
+    conn = db_pool.acquire()
+    cursor = conn.cursor()
+    try:
+        # Skipped if the password changed while the new hash was computed
+        cursor.execute(REHASH_SQL, (new_hash, user_id, old_hash))
+        conn.commit()
+    finally:
+        cursor.close()
+        db_pool.release(conn)
+
+@app.post("/login")
+async def login(credentials: LoginRequest):
+    """
+    Verify credentials on the server and return the user without its password hash
+    """
+    email = credentials.email.strip().lower()
+
+    if login_guard.is_limited(email):
+        raise HTTPException(status_code=429, detail="Too many failed login attempts. Try again later.")
+
+    if login_guard.is_unknown(email):
+        login_guard.record_failure(email)
+        raise HTTPException(status_code=401, detail="Invalid credentials or role mismatch")
+
+    user = await run_db(find_login_user, email)
+    if not user:
+        login_guard.mark_unknown(email)
+        login_guard.record_failure(email)
+        raise HTTPException(status_code=401, detail="Invalid credentials or role mismatch")
+
+    # No connection is held while bcrypt runs in the password pool
+    password_hash = user.pop("password_hash")
+    password_ok, new_hash = await password_hasher.verify_async(credentials.password, password_hash)
+    if not password_ok or (credentials.role and user["role"] != credentials.role):
+        login_guard.record_failure(email)
+        raise HTTPException(status_code=401, detail="Invalid credentials or role mismatch")
+
+    if new_hash:
+        # Legacy SHA-256 or an outdated cost: upgrade now that the password is known
+        try:
+            await run_db(replace_password_hash, user["user_id"], password_hash, new_hash)
+        except Exception as e:
+            logger.warning("Could not rehash password of user %s: %s", user["user_id"], e)
+
+    login_guard.record_success(email)
+    return {"message": "Login successful", "user": user}
+
+# RIDES ENDPOINT
+def dispatch_driver(pickup_location, vehicle_type=None):
+    """
+    Pick the closest available driver to a pickup, or any available driver
+    when the pickup cannot be placed or no driver has reported a position
+    """
+    point = geocode(pickup_location)
+    if point:
+        nearest = nearest_available_drivers(point[0], point[1], 1, vehicle_type)
+        if nearest:
+            return nearest[0][0]
+
+    candidates = driver_index.available(vehicle_type)
+    if not candidates:
+        raise HTTPException(status_code=400, detail="No available driver for this ride.")
+    return candidates[0]["driver_id"]
+
+class RideCreate(BaseModel):
+    customer_id: int
+    driver_id: Optional[int] = None
+    pickup_location: str
+    dropoff_location: str
+    vehicle_type: Optional[str] = None
+
+CUSTOMER_EXISTS_SQL = "SELECT customer_id FROM customers WHERE customer_id = %s"
+RIDE_DRIVER_SQL = "SELECT d.driver_id, v.type FROM drivers d LEFT JOIN vehicles v ON v.driver_id = d.driver_id WHERE d.driver_id = %s"
+
+@app.post("/rides/")
+@offload
+def create_ride(ride: RideCreate, conn=Depends(get_db)):
+    cursor = conn.cursor()
+
+    # Validate customer
+    cursor.execute(CUSTOMER_EXISTS_SQL, (ride.customer_id,))
+    if not cursor.fetchone():
+        raise HTTPException(status_code=400, detail="Invalid customer ID.")
+
+    # Without a chosen driver, dispatch the nearest available one
+    if ride.driver_id is None:
+        ride.driver_id = dispatch_driver(ride.pickup_location, ride.vehicle_type)
+
+    # Validate driver
+    cursor.execute(RIDE_DRIVER_SQL, (ride.driver_id,))
+    driver = cursor.fetchone()
+    if not driver:
+        raise HTTPException(status_code=400, detail="Invalid driver ID.")
+
+    # The surge at request time is what the rider is charged on completion
+    surge = fare_engine.surge_for(conn, ride.vehicle_type or driver[1])
+    cursor.execute(
+        "INSERT INTO rides (customer_id, driver_id, pickup_location, dropoff_location, surge) VALUES (%s, %s, %s, %s, %s)",
+        (ride.customer_id, ride.driver_id, ride.pickup_location, ride.dropoff_location, surge)
+    )
+    ride_id = cursor.lastrowid
+    conn.commit()
+    cursor.close()
+    invalidate_ride(ride_id, ride.customer_id, ride.driver_id)
+    admin_metrics.ride_status(None, "Pending")
+    publish_ride_event(ride_id, ride.driver_id, "requested", status="Pending",
+                       pickup_location=ride.pickup_location, dropoff_location=ride.dropoff_location)
+    return {"message": "Ride created successfully", "ride_id": ride_id}
+
+@app.get("/rides/")
+@offload
+def get_rides(
+    response: Response,
+    cursor: int = None,
+    limit: int = Query(LIST_DEFAULT_LIMIT, ge=1, le=LIST_MAX_LIMIT),
+    status: str = None,
+    customer_id: int = None,
+    driver_id: int = None,
+    since: datetime.datetime = None,
+    until: datetime.datetime = None,
+    fields: str = None,
+    conn=Depends(get_read_db)
+):
+    return fetch_page(
+        conn, response, "rides", "ride_id", RIDE_COLUMNS,
+        {"status": status, "customer_id": customer_id, "driver_id": driver_id},
+        cursor, limit, fields, "start_time", since, until
+    )
+
+CUSTOMER_RIDES_SQL = "SELECT * FROM rides WHERE customer_id = %s"
+DRIVER_RIDES_SQL = "SELECT * FROM rides WHERE driver_id = %s"
+
+@app.get("/rides/user/{user_id}")
+@offload
+def get_user_rides(user_id: int, role: str, conn=Depends(get_read_db)):
+    if role == "customer":
+        sql = CUSTOMER_RIDES_SQL
+    elif role == "driver":
+        sql = DRIVER_RIDES_SQL
+    else:
+        raise HTTPException(status_code=400, detail="Invalid role")
+
+    def load():
+        cursor = conn.cursor(dictionary=True)
+        try:
+            cursor.execute(sql, (user_id,))
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+
+    return read_cache.get_or_load(user_rides_key(role, user_id), load)
+
+RIDE_LOCK_SQL = "SELECT ride_id, driver_id, status, customer_id FROM rides WHERE ride_id = %s FOR UPDATE"
+RIDE_COMPLETE_SQL = "UPDATE rides SET status = %s, end_time = NOW(), fare = %s WHERE ride_id = %s"
+RIDE_STATUS_UPDATE_SQL = "UPDATE rides SET status = %s WHERE ride_id = %s"
+
+@app.put("/rides/{ride_id}/status")
+@offload
+def update_ride_status(ride_id: int, status: str, conn=Depends(get_db)):
+    cursor = conn.cursor()
+    
+    cursor.execute(RIDE_LOCK_SQL, (ride_id,))
+    ride = cursor.fetchone()
+    if not ride:
+        raise HTTPException(status_code=404, detail="Ride not found")
+    
+    # If the ride is being completed, set the end_time to now and charge the fare
+    if status == "Completed":
+        cursor.execute(RIDE_COMPLETE_SQL, (status, completed_fare(cursor, ride_id), ride_id))
+    else:
+        cursor.execute(RIDE_STATUS_UPDATE_SQL, (status, ride_id))
+    
+    # The driver is free again once an accepted ride ends
+    ride_ended = ride[2] == "Ongoing" and status in ("Completed", "Cancelled")
+    if ride_ended:
+        release_driver(cursor, ride[1])
+    
+    conn.commit()
+    cursor.close()
+    if ride_ended:
+        sync_driver_index(conn, {ride[1]})
+    if status in ("Completed", "Cancelled"):
+        stop_tracking(ride_id)
+    elif telemetry.has_ended(ride_id):
+        resume_tracking(ride_id)
+    invalidate_ride(ride_id, ride[3], ride[1])
+    admin_metrics.ride_status(ride[2], status)
+    publish_ride_event(ride_id, ride[1], "status", status=status)
+    
+    return {"message": "Ride status updated successfully"}
+
+# CUSTOMERS ENDPOINT
+USER_ROLE_SQL = "SELECT role FROM users WHERE user_id = %s"
+CUSTOMERS_SQL = "SELECT * FROM customers"
+
+@app.post("/customers/")
+@offload
+def create_customer(customer_id: int, conn=Depends(get_db)):
+    cursor = conn.cursor()
+
+    cursor.execute(USER_ROLE_SQL, (customer_id,))
+    user = cursor.fetchone()
+    
+    if not user or user[0] != "customer":
+        raise HTTPException(status_code=400, detail="User must be a customer.")
+
+    cursor.execute("INSERT INTO customers (customer_id) VALUES (%s)", (customer_id,))
+    conn.commit()
+    cursor.close()
+    return {"message": "Customer added successfully"}
+
+@app.get("/customers/")
+@offload
+def get_customers(conn=Depends(get_read_db)):
+    cursor = conn.cursor(dictionary=True)
+    
+    try:
+        cursor.execute(CUSTOMERS_SQL)
+        customers = cursor.fetchall()
+        
+        return customers
+
+    except mysql.connector.Error as err:
+        raise HTTPException(status_code=400, detail=str(err))
+
+    finally:
+        cursor.close()
+
+# DRIVER AVAILABILITY INDEX
+AVAILABLE_DRIVERS_SQL = """
+    SELECT d.driver_id, u.email, v.type, v.plate_number
+    FROM drivers d
+    JOIN users u ON d.driver_id = u.user_id
+    JOIN vehicles v ON d.driver_id = v.driver_id
+    WHERE d.availability = TRUE
+"""
+AVAILABLE_DRIVER_SQL = AVAILABLE_DRIVERS_SQL + " AND d.driver_id = %s"
+
+# Column holding the driver id in each table that feeds the index
+DRIVER_KEY_COLUMNS = {"drivers": "driver_id", "vehicles": "driver_id", "users": "user_id"}
+
+class DriverIndex:
+    """
+    In-memory copy of the available drivers, bucketed by vehicle type.
+
+    Loaded once at startup and patched one driver at a time whenever the API
+    changes a driver, its vehicle or its availability, so /drivers/available
+    is answered without a query.
+    """
+
+    def __init__(self):
+        self._drivers = {}
+        self._by_type = {}
+        self._lock = threading.Lock()
+        self.loaded = False
+
+    def load(self, conn):
+        cursor = conn.cursor(dictionary=True)
+        try:
+            cursor.execute(AVAILABLE_DRIVERS_SQL)
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
+
+        with self._lock:
+            self._drivers = {}
+            self._by_type = {}
+            for row in rows:
+                self._put(row)
+            self.loaded = True
+
+    def refresh_driver(self, conn, driver_id):
+        cursor = conn.cursor(dictionary=True)
+        try:
+            cursor.execute(AVAILABLE_DRIVER_SQL, (driver_id,))
+            row = cursor.fetchone()
+        finally:
+            cursor.close()
+
+        with self._lock:
+            self._remove(int(driver_id))
+            if row:
+                self._put(row)
+
+    @replicated
+    def remove(self, driver_id):
+        with self._lock:
+            self._remove(int(driver_id))
+
+    def _put(self, row):
+        self._drivers[row["driver_id"]] = row
+        self._by_type.setdefault(row["type"], {})[row["driver_id"]] = row
+
+    def _remove(self, driver_id):
+        row = self._drivers.pop(driver_id, None)
+        if row:
+            self._by_type.get(row["type"], {}).pop(driver_id, None)
+
+    def is_available(self, driver_id, vehicle_type=None):
+        with self._lock:
+            row = self._drivers.get(driver_id)
+            return row is not None and (vehicle_type is None or row["type"] == vehicle_type)
+
+    def available(self, vehicle_type=None):
+        with self._lock:
+            source = self._by_type.get(vehicle_type, {}) if vehicle_type else self._drivers
+            return [dict(source[driver_id]) for driver_id in sorted(source)]
+
+    def counts(self):
+        with self._lock:
+            return {vehicle_type: len(bucket) for vehicle_type, bucket in self._by_type.items()}
+
+    def check(self, conn, repair=False):
+        """
+        Compare the index with MySQL and optionally reload it
+        """
+        cursor = conn.cursor(dictionary=True)
+        try:
+            cursor.execute(AVAILABLE_DRIVERS_SQL)
+            expected = {row["driver_id"]: row for row in cursor.fetchall()}
+        finally:
+            cursor.close()
+
+        with self._lock:
+            actual = dict(self._drivers)
+
+        report = {
+            "missing": sorted(set(expected) - set(actual)),
+            "unexpected": sorted(set(actual) - set(expected)),
+            "mismatched": sorted(
+                driver_id for driver_id in set(expected) & set(actual)
+                if expected[driver_id] != actual[driver_id]
+            ),
+        }
+        report["consistent"] = not (report["missing"] or report["unexpected"] or report["mismatched"])
+
+        if repair and not report["consistent"]:
+            self.load(conn)
+            report["repaired"] = True
+        return report
+
+driver_index = message_bus.register(DriverIndex())
+
+@app.on_event("startup")
+async def load_driver_index():
+    def load():
+        conn = db_pool.acquire()
+        try:
+            driver_index.load(conn)
+        finally:
+            db_pool.release(conn)
+
+    try:
+        await run_db(load)
+    except Exception as e:
+        # The index is loaded lazily on first use instead
+        logger.warning("Could not load driver index at startup: %s", e)
+
+def drivers_touched_by(cursor, table, primary_key, primary_values):
+    """
+    Driver ids a generic admin write on `table` is about to affect
+    """
+    column = DRIVER_KEY_COLUMNS.get(table)
+    if not column or not primary_values:
+        return set()
+    placeholders = ", ".join(["%s"] * len(primary_values))
+    cursor.execute(f"SELECT {column} FROM {table} WHERE {primary_key} IN ({placeholders})", tuple(primary_values))
+    return {row[0] for row in cursor.fetchall()}
+
+def sync_driver_index(conn, driver_ids):
+    driver_ids = [driver_id for driver_id in driver_ids if driver_id is not None]
+    for driver_id in driver_ids:
+        driver_index.refresh_driver(conn, driver_id)
+    if driver_ids:
+        # Other workers re-read the same drivers with their own connections
+        message_bus.publish(None, "refresh_drivers", (driver_ids,))
+
+@message_bus.register_function
+def refresh_drivers(driver_ids):
+    conn = db_pool.acquire()
+    try:
+        for driver_id in driver_ids:
+            driver_index.refresh_driver(conn, driver_id)
+    finally:
+        db_pool.release(conn)
+
+# DISPATCH ENGINE
+GAZETTEER_PATH = os.getenv("GAZETTEER_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "gazetteer.csv"))
+DISPATCH_CELL_SIZE = float(os.getenv("DISPATCH_CELL_SIZE", "0.01"))  # grid cell edge in degrees (~1.1 km)
+DISPATCH_RADIUS_KM = float(os.getenv("DISPATCH_RADIUS_KM", "10"))
+DISPATCH_K = int(os.getenv("DISPATCH_K", "5"))
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = 111.32
+
+def normalize_place(text):
+    # Lowercase and strip Vietnamese diacritics so "Quận 1" matches "quan 1"
+    text = unicodedata.normalize("NFKD", text.replace("đ", "d").replace("Đ", "D"))
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return " ".join(text.lower().split())
+
+def load_gazetteer(path):
+    places = {}
+    try:
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                places[normalize_place(row["name"])] = (float(row["lat"]), float(row["lon"]))
+    except FileNotFoundError:
+        logger.warning("Gazetteer not found at %s; pickup geocoding disabled", path)
+    return places
+
+gazetteer = load_gazetteer(GAZETTEER_PATH)
+
+@functools.lru_cache(maxsize=10000)
+def geocode(address):
+    """
+    Resolve a free-text location to (lat, lon) using the offline gazetteer.
+
+    Accepts a literal "lat, lon" pair, otherwise checks the comma-separated
+    parts of the address from most to least specific. Returns None when
+    nothing matches.
+    """
+    parts = [p.strip() for p in address.split(",")]
+    if len(parts) == 2:
+        try:
+            lat, lon = float(parts[0]), float(parts[1])
+            if -90 <= lat <= 90 and -180 <= lon <= 180:
+                return (lat, lon)
+        except ValueError:
+            pass
+
+    for part in parts:
+        point = gazetteer.get(normalize_place(part))
+        if point:
+            return point
+    return None
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+class DriverLocator:
+    """
+    Uniform lat/lon grid of driver positions for k-nearest queries.
+
+    A query scans rings of cells outward from the pickup cell and stops once
+    the next ring cannot hold anything closer than the k-th match found.
+    """
+
+    def __init__(self, cell_size):
+        self.cell_size = cell_size
+        self._positions = {}
+        self._cells = {}
+        self._lock = threading.Lock()
+
+    def _cell(self, lat, lon):
+        return (int(math.floor(lat / self.cell_size)), int(math.floor(lon / self.cell_size)))
+
+    @replicated
+    def update(self, driver_id, lat, lon):
+        cell = self._cell(lat, lon)
+        with self._lock:
+            previous = self._positions.get(driver_id)
+            if previous and previous[2] != cell:
+                self._cells[previous[2]].discard(driver_id)
+                if not self._cells[previous[2]]:
+                    del self._cells[previous[2]]
+            self._positions[driver_id] = (lat, lon, cell)
+            self._cells.setdefault(cell, set()).add(driver_id)
+
+    @replicated
+    def remove(self, driver_id):
+        with self._lock:
+            previous = self._positions.pop(driver_id, None)
+            if previous:
+                self._cells[previous[2]].discard(driver_id)
+                if not self._cells[previous[2]]:
+                    del self._cells[previous[2]]
+
+    def position(self, driver_id):
+        with self._lock:
+            entry = self._positions.get(driver_id)
+            return entry[:2] if entry else None
+
+    def nearest(self, lat, lon, k, radius_km=DISPATCH_RADIUS_KM, accept=None):
+        """
+        Up to k (driver_id, distance_km) pairs within radius_km, closest first
+        """
+        center_row, center_col = self._cell(lat, lon)
+        # Smallest distance covered by one cell step in any direction
+        cell_km = self.cell_size * KM_PER_DEGREE * max(math.cos(math.radians(lat)), 0.01)
+        max_ring = int(radius_km / cell_km) + 1
+        found = []
+
+        with self._lock:
+            for ring in range(max_ring + 1):
+                for row in range(center_row - ring, center_row + ring + 1):
+                    for col in range(center_col - ring, center_col + ring + 1):
+                        if max(abs(row - center_row), abs(col - center_col)) != ring:
+                            continue
+                        for driver_id in self._cells.get((row, col), ()):
+                            if accept and not accept(driver_id):
+                                continue
+                            d_lat, d_lon, _ = self._positions[driver_id]
+                            distance = haversine_km(lat, lon, d_lat, d_lon)
+                            if distance <= radius_km:
+                                found.append((driver_id, distance))
+
+                if len(found) >= k:
+                    found.sort(key=lambda item: item[1])
+                    found = found[:k]
+                    # Nothing in the next ring can be closer than this
+                    if ring * cell_km >= found[-1][1]:
+                        break
+
+        found.sort(key=lambda item: item[1])
+        return found[:k]
+
+driver_locator = message_bus.register(DriverLocator(DISPATCH_CELL_SIZE))
+
+def nearest_available_drivers(lat, lon, k=DISPATCH_K, vehicle_type=None, radius_km=DISPATCH_RADIUS_KM):
+    return driver_locator.nearest(
+        lat, lon, k, radius_km,
+        accept=lambda driver_id: driver_index.is_available(driver_id, vehicle_type)
+    )
+
+# DRIVERS ENDPOINT
+DRIVERS_SQL = "SELECT * FROM drivers"
+
+@app.post("/drivers/")
+@offload
+def create_driver(driver_id: int, conn=Depends(get_db)):
+    cursor = conn.cursor()
+
+    cursor.execute(USER_ROLE_SQL, (driver_id,))
+    user = cursor.fetchone()
+    
+    if not user or user[0] != "driver":
+        raise HTTPException(status_code=400, detail="User must be a driver.")
+
+    cursor.execute("INSERT INTO drivers (driver_id) VALUES (%s)", (driver_id,))
+    conn.commit()
+    cursor.close()
+    sync_driver_index(conn, {driver_id})
+    return {"message": "Driver added successfully"}
+
+class DriverLocation(BaseModel):
+    lat: float
+    lon: float
+
+@app.put("/drivers/{driver_id}/location")
+def update_driver_location(driver_id: int, location: DriverLocation):
+    """
+    Record a driver's current position for dispatch
+    """
+    driver_locator.update(driver_id, location.lat, location.lon)
+    return {"message": "Driver location updated successfully"}
+
+@app.get("/drivers/available")
+@offload
+def get_available_drivers(vehicle_type: str = Query(None, alias="type")):
+    """
+    Available drivers, served from the in-memory index
+    """
+    if not driver_index.loaded:
+        conn = db_pool.acquire()
+        try:
+            driver_index.load(conn)
+        finally:
+            db_pool.release(conn)
+
+    return driver_index.available(vehicle_type)
+
+@app.get("/drivers/available/consistency")
+@offload
+def check_driver_index(repair: bool = False, conn=Depends(get_db)):
+    """
+    Compare the availability index with MySQL, reloading it when repair=true
+    """
+    return driver_index.check(conn, repair)
+
+@app.get("/drivers/")
+@offload
+def get_drivers(conn=Depends(get_read_db)):
+    cursor = conn.cursor(dictionary=True)
+    
+    try:
+        cursor.execute(DRIVERS_SQL)
+        drivers = cursor.fetchall()
+        
+        return drivers
+
+    except mysql.connector.Error as err:
+        raise HTTPException(status_code=400, detail=str(err))
+
+    finally:
+        cursor.close()
+
+def driver_rating_key(driver_id):
+    return f"driver_rating:{driver_id}"
+
+DRIVER_RATING_SQL = "SELECT * FROM driver_ratings WHERE driver_id = %s"
+DRIVER_EXISTS_SQL = "SELECT driver_id FROM drivers WHERE driver_id = %s"
+
+def load_driver_rating(conn, driver_id):
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute(DRIVER_RATING_SQL, (driver_id,))
+        row = cursor.fetchone()
+        if not row:
+            cursor.execute(DRIVER_EXISTS_SQL, (driver_id,))
+            if not cursor.fetchone():
+                raise HTTPException(status_code=404, detail="Driver not found")
+    finally:
+        cursor.close()
+
+    row = row or {}
+    count = row.get("rating_count", 0)
+    return {
+        "driver_id": driver_id,
+        "count": count,
+        "average": round(row["rating_sum"] / count, 2) if count else None,
+        "histogram": {str(stars): row.get(f"stars_{stars}", 0) for stars in range(1, 6)},
+        "recent_comments": json.loads(row.get("recent_comments") or "[]"),
+    }
+
+@app.get("/drivers/{driver_id}/rating")
+@offload
+def get_driver_rating(driver_id: int, conn=Depends(get_db)):
+    """
+    Rating summary of a driver, from the precomputed driver_ratings totals
+    """
+    return read_cache.get_or_load(driver_rating_key(driver_id), functools.partial(load_driver_rating, conn, driver_id))
+
+CLEAR_RATINGS_SQL = "DELETE FROM driver_ratings"
+BACKFILL_RATINGS_SQL = """
+    INSERT INTO driver_ratings (driver_id, rating_count, rating_sum, stars_1, stars_2, stars_3, stars_4, stars_5)
+    SELECT r.driver_id, COUNT(f.rating), COALESCE(SUM(f.rating), 0),
+           SUM(f.rating = 1), SUM(f.rating = 2), SUM(f.rating = 3), SUM(f.rating = 4), SUM(f.rating = 5)
+    FROM feedbacks f
+    JOIN rides r ON r.ride_id = f.ride_id
+    WHERE f.rating IS NOT NULL
+    GROUP BY r.driver_id
+"""
+BACKFILL_COMMENTS_SQL = """
+    SELECT r.driver_id, f.ride_id, f.rating, f.comment, f.feedback_time
+    FROM feedbacks f
+    JOIN rides r ON r.ride_id = f.ride_id
+    WHERE f.comment IS NOT NULL AND f.comment <> ''
+    ORDER BY r.driver_id, f.feedback_time DESC, f.feedback_id DESC
+"""
+
+def backfill_driver_ratings(conn):
+    """
+    Rebuild driver_ratings from every feedback in one transaction
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute(CLEAR_RATINGS_SQL)
+        cursor.execute(BACKFILL_RATINGS_SQL)
+        rated = cursor.rowcount
+
+        recent = {}
+        cursor.execute(BACKFILL_COMMENTS_SQL)
+        for driver_id, ride_id, rating, comment, feedback_time in cursor.fetchall():
+            comments = recent.setdefault(driver_id, [])
+            if len(comments) < RATING_RECENT_COMMENTS:
+                comments.append({"ride_id": ride_id, "rating": rating, "comment": comment,
+                                 "feedback_time": feedback_time.strftime("%Y-%m-%d %H:%M:%S")})
+        cursor.executemany(
+            RECENT_COMMENTS_UPDATE_SQL,
+            [(json.dumps(comments), driver_id) for driver_id, comments in recent.items()]
+        )
+        conn.commit()
+        read_cache.delete_prefix("driver_rating:")
+        return rated
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+# VEHICLES ENDPOINT
+@app.get("/vehicles/")
+@offload
+def get_vehicles(
+    response: Response,
+    cursor: int = None,
+    limit: int = Query(LIST_DEFAULT_LIMIT, ge=1, le=LIST_MAX_LIMIT),
+    vehicle_type: str = Query(None, alias="type"),
+    driver_id: int = None,
+    fields: str = None,
+    conn=Depends(get_read_db)
+):
+    return fetch_page(
+        conn, response, "vehicles", "vehicle_id", VEHICLE_COLUMNS,
+        {"type": vehicle_type, "driver_id": driver_id}, cursor, limit, fields,
+        cache_key=f"vehicles:{cursor}:{limit}:{vehicle_type}:{driver_id}:{fields}"
+    )
+
+# FEEDBACK ENDPOINT
+RATING_RECENT_COMMENTS = int(os.getenv("RATING_RECENT_COMMENTS", "20"))  # comments kept per driver
+
+class FeedbackCreate(BaseModel):
+    ride_id: int
+    rating: int = Field(..., ge=1, le=5)
+    comment: str
+
+RATING_UPSERT_SQL = """
+    INSERT INTO driver_ratings (driver_id, rating_count, rating_sum, {stars}) VALUES (%s, 1, %s, 1)
+    ON DUPLICATE KEY UPDATE
+    rating_count = rating_count + 1,
+    rating_sum = rating_sum + VALUES(rating_sum),
+    {stars} = {stars} + 1
+"""
+RECENT_COMMENTS_SQL = "SELECT recent_comments FROM driver_ratings WHERE driver_id = %s"
+RECENT_COMMENTS_UPDATE_SQL = "UPDATE driver_ratings SET recent_comments = %s WHERE driver_id = %s"
+
+def add_to_driver_rating(cursor, driver_id, ride_id, rating, comment):
+    """
+    Fold one feedback into the driver's running totals, inside the caller's
+    transaction
+    """
+    # rating is validated to 1-5, so the histogram column name is safe
+    stars = f"stars_{rating}"
+    cursor.execute(RATING_UPSERT_SQL.format(stars=stars), (driver_id, rating))
+    if not comment:
+        return
+
+    # The upsert holds the row lock, so this read-modify-write cannot interleave
+    cursor.execute(RECENT_COMMENTS_SQL, (driver_id,))
+    recent = json.loads(cursor.fetchone()[0] or "[]")
+    recent.insert(0, {"ride_id": ride_id, "rating": rating, "comment": comment,
+                      "feedback_time": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")})
+    cursor.execute(RECENT_COMMENTS_UPDATE_SQL, (json.dumps(recent[:RATING_RECENT_COMMENTS]), driver_id))
+
+RIDE_DRIVER_ID_SQL = "SELECT driver_id FROM rides WHERE ride_id = %s"
+
+@app.post("/feedbacks/")
+@offload
+def create_feedback(feedback: FeedbackCreate, conn=Depends(get_db)):
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute(RIDE_DRIVER_ID_SQL, (feedback.ride_id,))
+        ride = cursor.fetchone()
+        if not ride:
+            raise HTTPException(status_code=400, detail="Invalid ride ID.")
+
+        # The feedback and the driver's totals commit together
+        cursor.execute(
+            "INSERT INTO feedbacks (ride_id, rating, comment) VALUES (%s, %s, %s)",
+            (feedback.ride_id, feedback.rating, feedback.comment)
+        )
+        add_to_driver_rating(cursor, ride[0], feedback.ride_id, feedback.rating, feedback.comment)
+        conn.commit()
+    except mysql.connector.Error as err:
+        conn.rollback()
+        raise HTTPException(status_code=400, detail=str(err))
+    finally:
+        cursor.close()
+    invalidate_ride(feedback.ride_id)
+    read_cache.delete(driver_rating_key(ride[0]))
+    admin_metrics.rating(feedback.rating)
+    return {"message": "Feedback submitted successfully"}
+
+@app.get("/feedbacks/")
+@offload
+def get_feedbacks(
+    response: Response,
+    cursor: int = None,
+    limit: int = Query(LIST_DEFAULT_LIMIT, ge=1, le=LIST_MAX_LIMIT),
+    ride_id: int = None,
+    rating: int = None,
+    since: datetime.datetime = None,
+    until: datetime.datetime = None,
+    fields: str = None,
+    conn=Depends(get_read_db)
+):
+    return fetch_page(
+        conn, response, "feedbacks", "feedback_id", FEEDBACK_COLUMNS,
+        {"ride_id": ride_id, "rating": rating}, cursor, limit, fields, "feedback_time", since, until
+    )
+
+# PAYMENTS ENDPOINT
+@app.get("/payments/")
+@offload
+def get_payments(
+    response: Response,
+    cursor: int = None,
+    limit: int = Query(LIST_DEFAULT_LIMIT, ge=1, le=LIST_MAX_LIMIT),
+    status: str = None,
+    ride_id: int = None,
+    since: datetime.datetime = None,
+    until: datetime.datetime = None,
+    fields: str = None,
+    conn=Depends(get_read_db)
+):
+    return fetch_page(
+        conn, response, "payments", "payment_id", PAYMENT_COLUMNS,
+        {"status": status, "ride_id": ride_id}, cursor, limit, fields, "payment_time", since, until
+    )
+
+# NOTIFICATIONS ENDPOINT
+@app.get("/notifications/")
+@offload
+def get_notifications(
+    response: Response,
+    cursor: int = None,
+    limit: int = Query(LIST_DEFAULT_LIMIT, ge=1, le=LIST_MAX_LIMIT),
+    user_id: int = None,
+    is_read: bool = None,
+    since: datetime.datetime = None,
+    until: datetime.datetime = None,
+    fields: str = None,
+    conn=Depends(get_read_db)
+):
+    return fetch_page(
+        conn, response, "notifications", "notification_id", NOTIFICATION_COLUMNS,
+        {"user_id": user_id, "is_read": is_read}, cursor, limit, fields, "created_at", since, until
+    )
+
+# NOTIFICATION INBOX
+NOTIFY_BATCH_SIZE = int(os.getenv("NOTIFY_BATCH_SIZE", "500"))  # notifications per bulk insert
+NOTIFY_QUEUE_MAX = int(os.getenv("NOTIFY_QUEUE_MAX", "10000"))  # ride events waiting to become notifications
+NOTIFY_POLL_TIMEOUT = float(os.getenv("NOTIFY_POLL_TIMEOUT", "25"))  # default long-poll wait in seconds
+NOTIFY_POLL_LIMIT = 100
+
+NOTIFICATION_INSERT_SQL = "INSERT INTO notifications (user_id, message) VALUES (%s, %s)"
+INBOX_COLUMNS = "notification_id, user_id, message, is_read, created_at"
+# Newest first; with user_id and is_read fixed this reads idx_notifications_user_read_created in order
+INBOX_SQL = (
+    f"SELECT {INBOX_COLUMNS} FROM notifications WHERE user_id = %s AND is_read = %s{{before}} "
+    "ORDER BY created_at DESC, notification_id DESC LIMIT %s"
+)
+# Keyset condition for the pages after the first
+INBOX_BEFORE = " AND (created_at < %s OR (created_at = %s AND notification_id < %s))"
+UNREAD_COUNT_SQL = "SELECT COUNT(*) FROM notifications WHERE user_id = %s AND is_read = FALSE"
+NOTIFICATIONS_AFTER_SQL = (
+    f"SELECT {INBOX_COLUMNS} FROM notifications WHERE user_id = %s AND notification_id > %s "
+    "ORDER BY notification_id LIMIT %s"
+)
+MARK_READ_SQL = "UPDATE notifications SET is_read = TRUE WHERE user_id = %s AND is_read = FALSE"
+# {placeholders} is filled with one %s per ride
+RIDE_OWNERS_SQL = "SELECT ride_id, customer_id, driver_id FROM rides WHERE ride_id IN ({placeholders})"
+
+# Who hears about each ride event and what they are told
+NOTIFICATION_MESSAGES = {
+    "requested": (("customer", "Your ride #{ride_id} has been requested"),
+                  ("driver", "New ride request #{ride_id} from {pickup_location} to {dropoff_location}")),
+    "accepted": (("customer", "A driver accepted your ride #{ride_id}"),),
+    "status": (("customer", "Your ride #{ride_id} is now {status}"),),
+    "cancelled": (("driver", "Ride #{ride_id} was cancelled by the customer"),),
+    "driver_arrived": (("customer", "Your driver has arrived for ride #{ride_id}"),),
+    "expired": (("customer", "No driver accepted ride #{ride_id} in time, so it was cancelled"),
+                ("driver", "Ride request #{ride_id} expired")),
+}
+
+class NotificationCenter:
+    """
+    Turns ride events into notifications and keeps unread counts.
+
+    Endpoints enqueue events after they commit and return at once. A
+    background thread drains the queue, looks up who each ride belongs to
+    and writes the notifications with multi-row INSERTs, then wakes the
+    user's long-poll and SSE clients through the `user:{id}` topic.
+
+    Unread counts are loaded from MySQL the first time a user is asked
+    about and adjusted in memory afterwards. A load that overlaps a write
+    is returned but not stored, the same guard MemoryCache uses.
+    """
+
+    def __init__(self, batch_size, max_queued):
+        self.batch_size = batch_size
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._unread = {}  # user_id -> unread notifications
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._thread = None
+        self.stats = {"events": 0, "written": 0, "batches": 0, "write_errors": 0, "dropped": 0}
+
+    def enqueue(self, event):
+        if event["event"] not in NOTIFICATION_MESSAGES:
+            return
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            with self._lock:
+                self.stats["dropped"] += 1
+            return
+        with self._lock:
+            self.stats["events"] += 1
+
+    def build(self, conn, events):
+        """
+        (user_id, message) rows for a batch of ride events
+        """
+        ride_ids = sorted({event["ride_id"] for event in events})
+        cursor = conn.cursor()
+        try:
+            placeholders = ", ".join(["%s"] * len(ride_ids))
+            cursor.execute(RIDE_OWNERS_SQL.format(placeholders=placeholders), tuple(ride_ids))
+            owners = {ride_id: {"customer": customer_id, "driver": driver_id}
+                      for ride_id, customer_id, driver_id in cursor.fetchall()}
+        finally:
+            cursor.close()
+
+        rows = []
+        for event in events:
+            ride = owners.get(event["ride_id"])
+            if ride is None:
+                continue
+            for role, template in NOTIFICATION_MESSAGES[event["event"]]:
+                user_id = (event.get("driver_id") or ride["driver"]) if role == "driver" else ride["customer"]
+                if user_id:
+                    rows.append((user_id, template.format_map(defaultdict(str, event))))
+        return rows
+
+    def write(self, conn, events):
+        rows = self.build(conn, events)
+        if not rows:
+            return 0
+        cursor = conn.cursor()
+        try:
+            for start in range(0, len(rows), self.batch_size):
+                cursor.executemany(NOTIFICATION_INSERT_SQL, rows[start:start + self.batch_size])
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
+        added = {}
+        for user_id, _ in rows:
+            added[user_id] = added.get(user_id, 0) + 1
+        # Pairs, not the dict: JSON on the bus would turn the user ids into strings
+        self.count_added(list(added.items()))
+        replicas.stick(*(f"user:{user_id}" for user_id in added))
+        with self._lock:
+            self.stats["written"] += len(rows)
+            self.stats["batches"] += 1
+        for user_id in added:
+            ride_events.publish(f"user:{user_id}", {"event": "notification", "user_id": user_id})
+        return len(rows)
+
+    def _run(self):
+        while True:
+            events = [self._queue.get()]
+            while len(events) < self.batch_size:
+                try:
+                    events.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stopping = events[-1] is None
+            events = [event for event in events if event is not None]
+            if events:
+                try:
+                    conn = db_pool.acquire()
+                    try:
+                        self.write(conn, events)
+                    finally:
+                        db_pool.release(conn)
+                except Exception as e:
+                    # Notifications are best effort; the ride itself is already committed
+                    with self._lock:
+                        self.stats["write_errors"] += 1
+                    logger.warning("Could not write %d notifications: %s", len(events), e)
+            if stopping:
+                return
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="notifications", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            # Queued behind the pending events, so they are written first
+            self._queue.put(None)
+            self._thread.join(timeout=10)
+            self._thread = None
+
+    def unread(self, conn, user_id):
+        with self._lock:
+            if user_id in self._unread:
+                return self._unread[user_id]
+            generation = self._generation
+        cursor = conn.cursor()
+        try:
+            cursor.execute(UNREAD_COUNT_SQL, (user_id,))
+            count = cursor.fetchone()[0]
+        finally:
+            cursor.close()
+        with self._lock:
+            if generation == self._generation:
+                self._unread[user_id] = count
+        return count
+
+    @replicated
+    def count_added(self, added):
+        """
+        Add [(user_id, count), ...] to the unread counts held in memory
+        """
+        with self._lock:
+            self._generation += 1
+            for user_id, count in added:
+                if user_id in self._unread:
+                    self._unread[user_id] += count
+
+    @replicated
+    def marked_read(self, user_id, count):
+        with self._lock:
+            self._generation += 1
+            if user_id in self._unread:
+                self._unread[user_id] = max(self._unread[user_id] - count, 0)
+
+    @replicated
+    def reset_counts(self):
+        """
+        Forget every count after a write the center did not see
+        """
+        with self._lock:
+            self._generation += 1
+            self._unread.clear()
+
+    def metrics(self):
+        with self._lock:
+            return dict(self.stats, queued=self._queue.qsize(), users_counted=len(self._unread))
+
+notifier = message_bus.register(NotificationCenter(NOTIFY_BATCH_SIZE, NOTIFY_QUEUE_MAX))
+
+@app.on_event("startup")
+async def start_notifications():
+    notifier.start()
+
+@app.on_event("shutdown")
+async def stop_notifications():
+    await run_db(notifier.stop)
+
+def inbox_page(conn, user_id, unread_only, cursor, limit):
+    """
+    One newest-first page of a user's inbox and the cursor of the next one.
+
+    The cursor is the created_at and id of the last row sent, so rows that
+    arrive while the client pages never shift the pages that follow.
+    """
+    params = ()
+    before = ""
+    if cursor:
+        try:
+            created_at, notification_id = cursor.rsplit("_", 1)
+            created_at = datetime.datetime.fromisoformat(created_at)
+            params = (created_at, created_at, int(notification_id))
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        before = INBOX_BEFORE
+    sql = INBOX_SQL.format(before=before)
+
+    db_cursor = conn.cursor(dictionary=True)
+    try:
+        rows = []
+        # One indexed range per is_read value, merged here, so both stay in index order
+        for is_read in ((False,) if unread_only else (False, True)):
+            db_cursor.execute(sql, (user_id, is_read, *params, limit + 1))
+            rows += db_cursor.fetchall()
+    finally:
+        db_cursor.close()
+
+    rows.sort(key=lambda row: (row["created_at"], row["notification_id"]), reverse=True)
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = f"{rows[-1]['created_at'].isoformat()}_{rows[-1]['notification_id']}"
+    return rows, next_cursor
+
+@app.get("/users/{user_id}/notifications")
+@offload
+def get_user_notifications(
+    user_id: int,
+    response: Response,
+    unread_only: bool = False,
+    cursor: str = None,
+    limit: int = Query(LIST_DEFAULT_LIMIT, ge=1, le=LIST_MAX_LIMIT),
+    conn=Depends(get_db)
+):
+    """
+    A user's inbox, newest first, with the unread count in X-Unread-Count
+    """
+    rows, next_cursor = inbox_page(conn, user_id, unread_only, cursor, limit)
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = next_cursor
+    response.headers["X-Unread-Count"] = str(notifier.unread(conn, user_id))
+    return rows
+
+@app.get("/users/{user_id}/notifications/unread")
+@offload
+def get_unread_count(user_id: int, conn=Depends(get_db)):
+    return {"user_id": user_id, "unread": notifier.unread(conn, user_id)}
+
+class NotificationsRead(BaseModel):
+    notification_ids: Optional[List[int]] = None  # every unread notification when omitted
+
+@app.put("/users/{user_id}/notifications/read")
+@offload
+def mark_notifications_read(user_id: int, data: NotificationsRead, conn=Depends(get_db)):
+    """
+    Mark several notifications, or the whole inbox, as read in one statement
+    """
+    sql = MARK_READ_SQL
+    params = [user_id]
+    if data.notification_ids is not None:
+        check_batch_size(data.notification_ids)
+        if not data.notification_ids:
+            return {"marked": 0, "unread": notifier.unread(conn, user_id)}
+        sql += f" AND notification_id IN ({', '.join(['%s'] * len(data.notification_ids))})"
+        params += data.notification_ids
+
+    cursor = conn.cursor()
+    try:
+        cursor.execute(sql, tuple(params))
+        marked = cursor.rowcount
+        conn.commit()
+    except mysql.connector.Error as err:
+        conn.rollback()
+        raise HTTPException(status_code=500, detail=str(err))
+    finally:
+        cursor.close()
+    notifier.marked_read(user_id, marked)
+    replicas.stick(f"user:{user_id}")
+    return {"marked": marked, "unread": notifier.unread(conn, user_id)}
+
+def notifications_after(user_id, after):
+    conn = db_pool.acquire()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute(NOTIFICATIONS_AFTER_SQL, (user_id, after, NOTIFY_POLL_LIMIT))
+        rows = cursor.fetchall()
+        return rows, notifier.unread(conn, user_id)
+    finally:
+        cursor.close()
+        db_pool.release(conn)
+
+@app.get("/users/{user_id}/notifications/poll")
+async def poll_notifications(
+    user_id: int,
+    after: int = 0,
+    timeout: float = Query(NOTIFY_POLL_TIMEOUT, ge=0, le=60)
+):
+    """
+    Long-poll for notifications newer than `after`.
+
+    Answers at once when there are some, otherwise holds the request until
+    one is written or `timeout` seconds pass.
+    """
+    # Subscribed before the first read so a notification written in between still wakes us
+    subscriber = ride_events.subscribe(f"user:{user_id}")
+    try:
+        rows, unread = await run_db(notifications_after, user_id, after)
+        if not rows and timeout:
+            try:
+                await asyncio.wait_for(subscriber.get(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+            else:
+                rows, unread = await run_db(notifications_after, user_id, after)
+    finally:
+        ride_events.unsubscribe(f"user:{user_id}", subscriber)
+    last = rows[-1]["notification_id"] if rows else after
+    return {"notifications": rows, "unread": unread, "after": last}
+
+# GPS TRACKING ENDPOINT
+class GPSTrackingCreate(BaseModel):
+    ride_id: int
+    eta: int
+    gps_image: str
+
+# MySQL error number for a foreign key that points at no row
+FOREIGN_KEY_MISSING = 1452
+
+@app.post("/gps/")
+@offload
+def update_gps_tracking(gps_data: GPSTrackingCreate, conn=Depends(get_db)):
+    cursor = conn.cursor()
+
+    try:
+        # One row per ride; later updates replace it
+        cursor.execute(
+            """
+            INSERT INTO gps_tracking (ride_id, eta, gps_image) VALUES (%s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+            eta = VALUES(eta),
+            gps_image = VALUES(gps_image),
+            updated_at = CURRENT_TIMESTAMP
+            """,
+            (gps_data.ride_id, gps_data.eta, gps_data.gps_image)
+        )
+        conn.commit()
+    except mysql.connector.Error as err:
+        conn.rollback()
+        if err.errno == FOREIGN_KEY_MISSING:
+            raise HTTPException(status_code=400, detail="Invalid ride ID.")
+        raise HTTPException(status_code=400, detail=str(err))
+    finally:
+        cursor.close()
+    invalidate_ride(gps_data.ride_id)
+    return {"message": "GPS tracking updated successfully"}
+
+@app.get("/gps/")
+@offload
+def get_gps_tracking(
+    response: Response,
+    cursor: int = None,
+    limit: int = Query(LIST_DEFAULT_LIMIT, ge=1, le=LIST_MAX_LIMIT),
+    ride_id: int = None,
+    since: datetime.datetime = None,
+    until: datetime.datetime = None,
+    fields: str = None,
+    conn=Depends(get_read_db)
+):
+    return fetch_page(
+        conn, response, "gps_tracking", "tracking_id", GPS_COLUMNS,
+        {"ride_id": ride_id}, cursor, limit, fields, "updated_at", since, until
+    )
+
+# GPS TELEMETRY
+GPS_FLUSH_SIZE = int(os.getenv("GPS_FLUSH_SIZE", "2000"))  # samples per bulk insert
+GPS_FLUSH_INTERVAL = float(os.getenv("GPS_FLUSH_INTERVAL", "1"))  # seconds between flushes
+GPS_BUFFER_MAX = int(os.getenv("GPS_BUFFER_MAX", "100000"))  # samples held while MySQL is slow or down
+GPS_PARTITION_DAYS_AHEAD = int(os.getenv("GPS_PARTITION_DAYS_AHEAD", "3"))
+GPS_RETENTION_DAYS = int(os.getenv("GPS_RETENTION_DAYS", "30"))  # days of samples kept
+GPS_ENDED_RIDES_MAX = int(os.getenv("GPS_ENDED_RIDES_MAX", "100000"))  # ended rides remembered per worker
+
+GPS_SAMPLE_INSERT_SQL = "INSERT INTO gps_samples (ride_id, lat, lon, recorded_at) VALUES (%s, %s, %s, %s)"
+# Rides that may still report positions
+ACTIVE_RIDE_STATUSES = ("Pending", "Ongoing")
+
+class TelemetryBuffer:
+    """
+    Write-behind buffer for GPS samples.
+
+    Samples are appended in memory and a background thread writes them to
+    gps_samples with multi-row INSERTs, as soon as `flush_size` samples are
+    waiting or every `flush_interval` seconds. A failed flush keeps its
+    samples for the next attempt; once `max_buffered` samples are waiting
+    new ones are refused so clients back off.
+
+    The newest sample of every active ride stays in memory so position reads
+    never touch MySQL. The most recent `max_ended` rides that ended are
+    remembered too, so late samples for them are refused without a query.
+    """
+
+    def __init__(self, flush_size, flush_interval, max_buffered, max_ended):
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.max_buffered = max_buffered
+        self.max_ended = max_ended
+        self._pending = []
+        self._latest = {}  # ride_id -> (ride_id, lat, lon, recorded_at)
+        self._ended = OrderedDict()  # ride ids, oldest first
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self.stats = {"received": 0, "flushed": 0, "flushes": 0, "flush_errors": 0, "rejected": 0,
+                      "last_flush_seconds": 0.0}
+
+    def add(self, samples):
+        with self._lock:
+            if len(self._pending) + len(samples) > self.max_buffered:
+                self.stats["rejected"] += len(samples)
+                raise HTTPException(status_code=503, detail="GPS buffer is full, retry later")
+            self._pending.extend(samples)
+            self.stats["received"] += len(samples)
+            self._remember(samples)
+            full = len(self._pending) >= self.flush_size
+        if full:
+            self._wake.set()
+
+    def remember(self, samples):
+        """
+        Keep the positions of samples another worker received, without writing them
+        """
+        with self._lock:
+            self._remember(samples)
+
+    def _remember(self, samples):
+        for sample in samples:
+            latest = self._latest.get(sample[0])
+            if latest is None or sample[3] >= latest[3]:
+                self._latest[sample[0]] = sample
+
+    def knows(self, ride_id):
+        return ride_id in self._latest
+
+    def has_ended(self, ride_id):
+        return ride_id in self._ended
+
+    def latest(self, ride_id):
+        sample = self._latest.get(ride_id)
+        if sample is None:
+            return None
+        return {"ride_id": sample[0], "lat": sample[1], "lon": sample[2], "recorded_at": sample[3]}
+
+    def forget(self, ride_id):
+        """
+        Stop tracking a ride that has ended; buffered samples are still written
+        """
+        with self._lock:
+            self._latest.pop(ride_id, None)
+            self._ended[ride_id] = True
+            self._ended.move_to_end(ride_id)
+            while len(self._ended) > self.max_ended:
+                self._ended.popitem(last=False)
+
+    def resume(self, ride_id):
+        """
+        Accept samples again for a ride that was reopened
+        """
+        with self._lock:
+            self._ended.pop(ride_id, None)
+
+    def flush(self, conn):
+        with self._lock:
+            batch, self._pending = self._pending, []
+        if not batch:
+            return 0
+
+        started = time.monotonic()
+        cursor = conn.cursor()
+        try:
+            for start in range(0, len(batch), self.flush_size):
+                cursor.executemany(GPS_SAMPLE_INSERT_SQL, batch[start:start + self.flush_size])
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            with self._lock:
+                self._pending[:0] = batch
+                self.stats["flush_errors"] += 1
+            raise
+        finally:
+            cursor.close()
+
+        with self._lock:
+            self.stats["flushed"] += len(batch)
+            self.stats["flushes"] += 1
+            self.stats["last_flush_seconds"] = time.monotonic() - started
+        return len(batch)
+
+    def flush_pooled(self):
+        try:
+            conn = db_pool.acquire()
+            try:
+                self.flush(conn)
+            finally:
+                db_pool.release(conn)
+        except Exception as e:
+            logger.warning("GPS flush failed: %s", e)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush_pooled()
+        # Write whatever arrived before shutdown
+        self.flush_pooled()
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="gps-flush", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._wake.set()
+            self._thread.join(timeout=10)
+            self._thread = None
+
+    def metrics(self):
+        with self._lock:
+            return dict(self.stats, buffered=len(self._pending), rides_tracked=len(self._latest),
+                        rides_ended=len(self._ended))
+
+telemetry = TelemetryBuffer(GPS_FLUSH_SIZE, GPS_FLUSH_INTERVAL, GPS_BUFFER_MAX, GPS_ENDED_RIDES_MAX)
+
+GPS_PARTITIONS_SQL = """
+    SELECT partition_name FROM information_schema.partitions
+    WHERE table_schema = DATABASE() AND table_name = 'gps_samples' AND partition_name IS NOT NULL
+"""
+
+def ensure_gps_partitions(conn, days_ahead=GPS_PARTITION_DAYS_AHEAD):
+    """
+    Split one partition per day off pmax, from today to `days_ahead` days out
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute(GPS_PARTITIONS_SQL)
+        existing = {schema_text(row[0]) for row in cursor.fetchall()}
+
+        today = datetime.date.today()
+        days = [today + datetime.timedelta(days=offset) for offset in range(days_ahead + 1)]
+        missing = [day for day in days if f"p{day:%Y%m%d}" not in existing]
+        if not missing:
+            return []
+
+        partitions = ", ".join(
+            f"PARTITION p{day:%Y%m%d} VALUES LESS THAN ('{day + datetime.timedelta(days=1):%Y-%m-%d}')"
+            for day in missing
+        )
+        cursor.execute(
+            f"ALTER TABLE gps_samples REORGANIZE PARTITION pmax INTO "
+            f"({partitions}, PARTITION pmax VALUES LESS THAN (MAXVALUE))"
+        )
+        return [f"p{day:%Y%m%d}" for day in missing]
+    finally:
+        cursor.close()
+
+def prune_gps_partitions(conn, retention_days=GPS_RETENTION_DAYS):
+    """
+    Drop the daily partitions that hold only samples older than `retention_days`
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute(GPS_PARTITIONS_SQL)
+        oldest = f"p{datetime.date.today() - datetime.timedelta(days=retention_days):%Y%m%d}"
+        expired = sorted(
+            name for name in (schema_text(row[0]) for row in cursor.fetchall())
+            if re.match(r"^p\d{8}$", name) and name < oldest
+        )
+        if expired:
+            cursor.execute(f"ALTER TABLE gps_samples DROP PARTITION {', '.join(expired)}")
+        return expired
+    finally:
+        cursor.close()
+
+# Partitions are added and dropped by the gps_partitions job on the scheduler leader
+@app.on_event("startup")
+async def start_telemetry():
+    telemetry.start()
+
+@app.on_event("shutdown")
+async def stop_telemetry():
+    await run_db(telemetry.stop)
+
+RIDE_ROUTES_SQL = """
+    SELECT r.ride_id, r.status, r.pickup_location, r.dropoff_location,
+           COALESCE(rs.passenger_picked_up, FALSE) AS passenger_picked_up
+    FROM rides r
+    LEFT JOIN ride_statuses rs ON rs.ride_id = r.ride_id
+    WHERE r.ride_id IN ({placeholders})
+"""
+
+def ride_routes(conn, ride_ids):
+    """
+    Status and the route details the ETA engine needs of the rides among
+    `ride_ids` that exist
+    """
+    cursor = conn.cursor(dictionary=True)
+    try:
+        placeholders = ", ".join(["%s"] * len(ride_ids))
+        cursor.execute(RIDE_ROUTES_SQL.format(placeholders=placeholders), tuple(ride_ids))
+        return {row["ride_id"]: row for row in cursor.fetchall()}
+    finally:
+        cursor.close()
+
+class GPSSample(BaseModel):
+    ride_id: int
+    lat: float = Field(..., ge=-90, le=90)
+    lon: float = Field(..., ge=-180, le=180)
+    ts: Optional[datetime.datetime] = None  # device time; arrival time when omitted
+
+class GPSSampleBatch(BaseModel):
+    samples: List[GPSSample]
+
+@app.post("/gps/samples")
+@offload
+def ingest_gps_samples(batch: GPSSampleBatch):
+    """
+    Accept a batch of GPS samples for buffered, bulk storage
+    """
+    check_batch_size(batch.samples)
+
+    rejected = track_rides({sample.ride_id for sample in batch.samples})
+
+    now = datetime.datetime.now()
+    accepted = []
+    for sample in batch.samples:
+        if sample.ride_id in rejected:
+            continue
+        recorded_at = sample.ts or now
+        if recorded_at.tzinfo is not None:
+            # Stored as server local time, like the other timestamps
+            recorded_at = recorded_at.astimezone().replace(tzinfo=None)
+        accepted.append((sample.ride_id, sample.lat, sample.lon, recorded_at))
+
+    if accepted:
+        telemetry.add(accepted)
+        for sample in accepted:
+            eta_engine.update(*sample)
+        # Other workers only need the newest position of each ride
+        newest = {}
+        for sample in accepted:
+            if sample[0] not in newest or sample[3] >= newest[sample[0]][3]:
+                newest[sample[0]] = sample
+        message_bus.publish(None, "apply_positions", (list(newest.values()),))
+    return {"accepted": len(accepted), "rejected_rides": sorted(rejected)}
+
+def track_rides(ride_ids):
+    """
+    Start tracking the rides among `ride_ids` that are not in memory yet,
+    and return the ones that do not exist or have ended
+    """
+    # Rides tracked or known to have ended skip the database check
+    unknown = {ride_id for ride_id in ride_ids if not telemetry.knows(ride_id)}
+    rejected = {ride_id for ride_id in unknown if telemetry.has_ended(ride_id)}
+    unknown -= rejected
+    if not unknown:
+        return rejected
+
+    conn = db_pool.acquire()
+    try:
+        rides = ride_routes(conn, unknown)
+    finally:
+        db_pool.release(conn)
+    for ride_id in unknown:
+        ride = rides.get(ride_id)
+        if ride is None:
+            # Not remembered: a ride with this id may still be created
+            rejected.add(ride_id)
+        elif ride["status"] not in ACTIVE_RIDE_STATUSES:
+            telemetry.forget(ride_id)
+            rejected.add(ride_id)
+        else:
+            eta_engine.track(ride_id, ride["pickup_location"], ride["dropoff_location"],
+                             bool(ride["passenger_picked_up"]))
+    return rejected
+
+@message_bus.register_function
+def apply_positions(samples):
+    """
+    Positions and ETAs from samples another worker ingested
+    """
+    ended = track_rides({sample[0] for sample in samples})
+    samples = [sample for sample in samples if sample[0] not in ended]
+    telemetry.remember(samples)
+    for sample in samples:
+        eta_engine.update(*sample)
+
+@app.get("/gps/latest/{ride_id}")
+def get_latest_position(ride_id: int):
+    """
+    Most recent GPS sample of an active ride, from memory
+    """
+    position = telemetry.latest(ride_id)
+    if position is None:
+        raise HTTPException(status_code=404, detail="No position for this ride")
+    return position
+
+# ETA ENGINE
+ETA_DETOUR_FACTOR = float(os.getenv("ETA_DETOUR_FACTOR", "1.3"))  # road distance per straight-line km
+ETA_DEFAULT_SPEED_KMH = float(os.getenv("ETA_DEFAULT_SPEED_KMH", "25"))  # used until a ride's speed is measured
+ETA_MIN_SPEED_KMH = 5.0  # floor so a stopped car does not get an endless ETA
+ETA_MAX_SPEED_KMH = 150.0  # faster jumps between samples are GPS noise
+ETA_MAX_SAMPLE_GAP = 300.0  # seconds; longer gaps say nothing about current speed
+ETA_SPEED_ALPHA = 0.3  # weight of the newest speed measurement
+ETA_ARRIVED_KM = 0.05
+
+class EtaEngine:
+    """
+    ETA of every tracked ride, kept current one GPS sample at a time.
+
+    A ride heads for its pickup until the passenger is picked up, then for
+    its dropoff; both are placed once with the offline gazetteer. Each
+    sample costs two haversine distances: one to the previous sample, which
+    feeds an exponentially weighted speed, and one to the target, which
+    scaled by a detour factor and divided by that speed gives the ETA.
+    Nothing is recomputed from earlier samples.
+    """
+
+    def __init__(self):
+        self._rides = {}
+        self._lock = threading.Lock()
+        self.stats = {"updates": 0, "ignored_samples": 0}
+
+    def track(self, ride_id, pickup_location, dropoff_location, picked_up=False):
+        with self._lock:
+            if ride_id in self._rides:
+                return
+            self._rides[ride_id] = {
+                "pickup": geocode(pickup_location),
+                "dropoff": geocode(dropoff_location),
+                "picked_up": picked_up,
+                "last": None,  # (lat, lon, recorded_at)
+                "speed_kmh": None,
+                "eta": None,
+            }
+
+    @replicated
+    def picked_up(self, ride_id):
+        with self._lock:
+            ride = self._rides.get(ride_id)
+            if ride:
+                ride["picked_up"] = True
+                if ride["last"]:
+                    ride["eta"] = self._estimate(ride, *ride["last"])
+
+    def forget(self, ride_id):
+        with self._lock:
+            self._rides.pop(ride_id, None)
+
+    def update(self, ride_id, lat, lon, recorded_at):
+        with self._lock:
+            ride = self._rides.get(ride_id)
+            if ride is None:
+                return
+            last = ride["last"]
+            if last is not None:
+                elapsed = (recorded_at - last[2]).total_seconds()
+                if elapsed <= 0:
+                    # Out-of-order or duplicate sample
+                    self.stats["ignored_samples"] += 1
+                    return
+                if elapsed <= ETA_MAX_SAMPLE_GAP:
+                    speed = haversine_km(last[0], last[1], lat, lon) / (elapsed / 3600)
+                    if speed <= ETA_MAX_SPEED_KMH:
+                        previous = ride["speed_kmh"]
+                        ride["speed_kmh"] = speed if previous is None else (
+                            ETA_SPEED_ALPHA * speed + (1 - ETA_SPEED_ALPHA) * previous
+                        )
+            ride["last"] = (lat, lon, recorded_at)
+            ride["eta"] = self._estimate(ride, lat, lon, recorded_at)
+            self.stats["updates"] += 1
+
+    def _estimate(self, ride, lat, lon, recorded_at):
+        target_name = "dropoff" if ride["picked_up"] else "pickup"
+        target = ride[target_name]
+        if target is None:
+            return None
+        distance = haversine_km(lat, lon, target[0], target[1]) * ETA_DETOUR_FACTOR
+        speed = max(ride["speed_kmh"] or ETA_DEFAULT_SPEED_KMH, ETA_MIN_SPEED_KMH)
+        minutes = 0 if distance < ETA_ARRIVED_KM else math.ceil(distance / speed * 60)
+        return {
+            "target": target_name,
+            "minutes": minutes,
+            "distance_km": round(distance, 2),
+            "speed_kmh": round(speed, 1),
+            "updated_at": recorded_at,
+        }
+
+    def get(self, ride_id):
+        ride = self._rides.get(ride_id)
+        return ride["eta"] if ride else None
+
+    def metrics(self):
+        with self._lock:
+            return dict(self.stats, rides=len(self._rides))
+
+eta_engine = message_bus.register(EtaEngine())
+
+@replicated
+def stop_tracking(ride_id):
+    """
+    Drop the in-memory position and ETA of a ride that has ended
+    """
+    telemetry.forget(ride_id)
+    eta_engine.forget(ride_id)
+
+@replicated
+def resume_tracking(ride_id):
+    """
+    Accept positions again for a ride an admin has reopened
+    """
+    telemetry.resume(ride_id)
+
+def sync_ride_tracking(conn, table, rows):
+    """
+    Stop or resume tracking the rides a generic admin write on `table`
+    ended, deleted or reopened
+    """
+    if table != "rides":
+        return
+    ride_ids = {row["ride_id"] for row in rows if row.get("ride_id") is not None}
+    if not ride_ids:
+        return
+    rides = ride_routes(conn, ride_ids)
+    for ride_id in ride_ids:
+        ride = rides.get(ride_id)
+        if ride is None or ride["status"] not in ACTIVE_RIDE_STATUSES:
+            stop_tracking(ride_id)
+        elif telemetry.has_ended(ride_id):
+            resume_tracking(ride_id)
+
+# FARE ENGINE
+VEHICLE_TYPES = ("Bike", "Car", "SUV")
+# Base fare, per km, per minute and minimum fare, one row per vehicle type
+FARE_RATES = np.array([
+    [1.0, 0.5, 0.10, 3.0],  # Bike
+    [2.0, 1.0, 0.20, 6.0],  # Car
+    [3.0, 1.4, 0.30, 9.0],  # SUV
+])
+# Multiplier for each hour of the day: late night and the two rush hours cost more
+FARE_HOUR_MULTIPLIERS = np.array([1.2] * 6 + [1.0] + [1.3] * 3 + [1.0] * 7 + [1.3] * 3 + [1.0] * 2 + [1.2] * 2)
+SURGE_SENSITIVITY = float(os.getenv("SURGE_SENSITIVITY", "0.5"))  # surge added per pending ride beyond one per driver
+SURGE_MAX = float(os.getenv("SURGE_MAX", "2.5"))
+SURGE_REFRESH = float(os.getenv("SURGE_REFRESH", "10"))  # seconds between demand recounts
+
+PENDING_BY_TYPE_SQL = """
+    SELECT v.type, COUNT(*)
+    FROM rides r
+    JOIN vehicles v ON v.driver_id = r.driver_id
+    WHERE r.status = 'Pending'
+    GROUP BY v.type
+"""
+
+def haversine_km_array(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+class FareEngine:
+    """
+    Fares for a whole batch of rides as NumPy array arithmetic.
+
+    fare = max(minimum, (base + per_km * km + per_minute * minutes)
+                        * hour multiplier * surge)
+
+    Distance is the road-adjusted straight line between the gazetteer
+    points, duration assumes the default city speed of the ETA engine.
+    Surge per vehicle type grows with pending rides per available driver
+    and is recounted at most every SURGE_REFRESH seconds.
+    """
+
+    def __init__(self):
+        self._surge = np.ones(len(VEHICLE_TYPES))
+        self._surge_at = None
+        self._lock = threading.Lock()
+
+    def surge_factors(self, conn):
+        with self._lock:
+            if self._surge_at is not None and time.monotonic() - self._surge_at < SURGE_REFRESH:
+                return self._surge
+
+        cursor = conn.cursor()
+        try:
+            cursor.execute(PENDING_BY_TYPE_SQL)
+            pending_by_type = dict(cursor.fetchall())
+        finally:
+            cursor.close()
+        available_by_type = driver_index.counts()
+
+        pending = np.array([pending_by_type.get(t, 0) for t in VEHICLE_TYPES], dtype=float)
+        available = np.array([available_by_type.get(t, 0) for t in VEHICLE_TYPES], dtype=float)
+        demand = pending / np.maximum(available, 1)
+        surge = np.clip(1 + SURGE_SENSITIVITY * (demand - 1), 1.0, SURGE_MAX)
+        # No driver at all for a type with riders waiting is as bad as it gets
+        surge[(available == 0) & (pending > 0)] = SURGE_MAX
+
+        with self._lock:
+            self._surge = surge
+            self._surge_at = time.monotonic()
+        return surge
+
+    def surge_for(self, conn, vehicle_type):
+        if vehicle_type not in VEHICLE_TYPES:
+            return 1.0
+        return float(self.surge_factors(conn)[VEHICLE_TYPES.index(vehicle_type)])
+
+    def quote(self, pickups, dropoffs, type_indexes, hours, surge):
+        """
+        Price n rides. pickups and dropoffs are (n, 2) lat/lon arrays, the
+        others length-n arrays; surge is per ride
+        """
+        distance = haversine_km_array(pickups[:, 0], pickups[:, 1], dropoffs[:, 0], dropoffs[:, 1]) * ETA_DETOUR_FACTOR
+        minutes = distance / ETA_DEFAULT_SPEED_KMH * 60
+        rates = FARE_RATES[type_indexes]
+        multiplier = FARE_HOUR_MULTIPLIERS[hours]
+        fare = (rates[:, 0] + rates[:, 1] * distance + rates[:, 2] * minutes) * multiplier * surge
+        fare = np.maximum(fare, rates[:, 3])
+        return {
+            "fare": np.round(fare, 2),
+            "distance_km": np.round(distance, 2),
+            "duration_min": np.ceil(minutes),
+            "hour_multiplier": multiplier,
+            "surge": np.round(surge, 2),
+        }
+
+fare_engine = FareEngine()
+
+COMPLETED_FARE_SQL = """
+    SELECT r.pickup_location, r.dropoff_location, r.start_time, r.surge, v.type
+    FROM rides r
+    LEFT JOIN vehicles v ON v.driver_id = r.driver_id
+    WHERE r.ride_id = %s
+"""
+
+def completed_fare(cursor, ride_id):
+    """
+    Fare of a ride that is completing, or None when its route cannot be placed
+    """
+    cursor.execute(COMPLETED_FARE_SQL, (ride_id,))
+    pickup_location, dropoff_location, start_time, surge, vehicle_type = cursor.fetchone()
+    pickup, dropoff = geocode(pickup_location), geocode(dropoff_location)
+    if pickup is None or dropoff is None:
+        logger.warning("No fare for ride %s: route cannot be placed", ride_id)
+        return None
+
+    type_index = VEHICLE_TYPES.index(vehicle_type) if vehicle_type in VEHICLE_TYPES else VEHICLE_TYPES.index("Car")
+    hour = (start_time or datetime.datetime.now()).hour
+    quote = fare_engine.quote(np.array([pickup]), np.array([dropoff]), np.array([type_index]),
+                              np.array([hour]), np.array([surge or 1.0]))
+    return float(quote["fare"][0])
+
+class FareRequest(BaseModel):
+    pickup_location: str
+    dropoff_location: str
+    vehicle_type: str = Field("Car", regex="^(Bike|Car|SUV)$")
+    time: Optional[datetime.datetime] = None  # pickup time; now when omitted
+
+class FareQuoteBatch(BaseModel):
+    rides: List[FareRequest]
+
+@app.post("/fares/quote")
+@offload
+def quote_fares(batch: FareQuoteBatch, conn=Depends(get_db)):
+    """
+    Quote fares for many rides in one call, at the current surge
+    """
+    check_batch_size(batch.rides)
+
+    quotes = [None] * len(batch.rides)
+    placed = []
+    for index, ride in enumerate(batch.rides):
+        pickup, dropoff = geocode(ride.pickup_location), geocode(ride.dropoff_location)
+        if pickup is None or dropoff is None:
+            quotes[index] = {"error": "Pickup or dropoff location not recognised"}
+        else:
+            placed.append((index, pickup, dropoff, ride))
+
+    if placed:
+        type_indexes = np.array([VEHICLE_TYPES.index(ride.vehicle_type) for _, _, _, ride in placed])
+        now = datetime.datetime.now()
+        result = fare_engine.quote(
+            np.array([pickup for _, pickup, _, _ in placed]),
+            np.array([dropoff for _, _, dropoff, _ in placed]),
+            type_indexes,
+            np.array([(ride.time or now).hour for _, _, _, ride in placed]),
+            fare_engine.surge_factors(conn)[type_indexes],
+        )
+        for row, (index, _, _, _) in enumerate(placed):
+            quotes[index] = {name: float(values[row]) for name, values in result.items()}
+
+    return {"quotes": quotes}
+
+# EXPORT ENDPOINT
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+EXPORT_TABLES = {
+    "rides": ("ride_id", RIDE_COLUMNS),
+    "payments": ("payment_id", PAYMENT_COLUMNS),
+    "gps_tracking": ("tracking_id", GPS_COLUMNS),
+}
+
+def export_value(value):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if isinstance(value, (bytes, bytearray)):
+        return value.decode()
+    return str(value)
+
+def stream_table(table, key, columns, fmt):
+    """
+    Yield a whole table in EXPORT_BATCH_SIZE chunks.
+
+    The cursor is unbuffered, so MySQL streams rows as they are fetched and
+    only one batch is held in memory at a time. Exports read from a replica
+    when one is usable.
+    """
+    conn, pool = replicas.acquire_read((f"table:{table}",))
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"SELECT {', '.join(columns)} FROM {table} ORDER BY {key}")
+
+        if fmt == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(columns)
+            yield buffer.getvalue()
+
+        while True:
+            rows = cursor.fetchmany(EXPORT_BATCH_SIZE)
+            if not rows:
+                break
+
+            if fmt == "csv":
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                writer.writerows(rows)
+                yield buffer.getvalue()
+            else:
+                yield "".join(
+                    json.dumps(dict(zip(columns, row)), default=export_value) + "\n"
+                    for row in rows
+                )
+    finally:
+        try:
+            cursor.close()
+        except mysql.connector.Error:
+            # Client went away mid-stream; the pool discards the connection
+            pass
+        pool.release(conn)
+
+@app.get("/export/{table_name}")
+def export_table(table_name: str, export_format: str = Query("ndjson", alias="format", regex="^(ndjson|csv)$")):
+    """
+    Stream a full table as NDJSON or CSV for analytics pulls
+    """
+    if table_name not in EXPORT_TABLES:
+        raise HTTPException(status_code=400, detail=f"Export is not available for '{table_name}'")
+
+    key, columns = EXPORT_TABLES[table_name]
+    media_type = "text/csv" if export_format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        stream_table(table_name, key, columns, export_format),
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename={table_name}.{export_format}"}
+    )
+
+# ADMIN METRICS
+ADMIN_METRICS_ROLLUP = float(os.getenv("ADMIN_METRICS_ROLLUP", "300"))  # seconds between rollups from MySQL
+REVENUE_DAYS = 30
+CANCELLATION_HOURS = 48
+RIDE_STATUSES = ("Pending", "Ongoing", "Completed", "Cancelled")
+
+class RingSeries:
+    """
+    Fixed window of equal time buckets stored in one NumPy array.
+
+    The array is used as a ring: the bucket for time t lives at index
+    (t // width) % size. Moving into a new bucket zeroes the slots that
+    dropped out of the window, so adding a value is O(1) and the memory
+    never grows. Times are naive local datetimes, so daily buckets start
+    at local midnight like DATE() in MySQL.
+    """
+
+    EPOCH = datetime.datetime(1970, 1, 1)
+
+    def __init__(self, size, width):
+        self.size = size
+        self.width = width
+        self._values = np.zeros(size)
+        self._head = self._bucket(None)  # absolute number of the newest bucket
+
+    def _bucket(self, at):
+        return int(((at or datetime.datetime.now()) - self.EPOCH).total_seconds() // self.width)
+
+    def _advance(self, bucket):
+        if bucket <= self._head:
+            return
+        steps = min(bucket - self._head, self.size)
+        for offset in range(1, steps + 1):
+            self._values[(self._head + offset) % self.size] = 0
+        self._head = bucket
+
+    def add(self, value, at=None):
+        bucket = self._bucket(at)
+        self._advance(bucket)
+        if bucket > self._head - self.size:
+            self._values[bucket % self.size] += value
+
+    def replace(self, totals):
+        """
+        Overwrite the window with {bucket start: value}
+        """
+        self._advance(self._bucket(None))
+        self._values[:] = 0
+        for at, value in totals.items():
+            self.add(value, at)
+
+    def points(self):
+        self._advance(self._bucket(None))
+        return [
+            {"start": (self.EPOCH + datetime.timedelta(seconds=bucket * self.width)).isoformat(),
+             "value": round(float(self._values[bucket % self.size]), 2)}
+            for bucket in range(self._head - self.size + 1, self._head + 1)
+        ]
+
+RIDES_BY_STATUS_SQL = "SELECT status, COUNT(*) FROM rides GROUP BY status"
+RATING_TOTALS_SQL = "SELECT COALESCE(SUM(rating_count), 0), COALESCE(SUM(rating_sum), 0) FROM driver_ratings"
+DAILY_REVENUE_SQL = """
+    SELECT DATE(payment_time), SUM(amount)
+    FROM payments
+    WHERE status = 'Completed' AND payment_time >= CURDATE() - INTERVAL %s DAY
+    GROUP BY DATE(payment_time)
+"""
+
+class AdminMetrics:
+    """
+    Dashboard aggregates maintained as the API writes.
+
+    Ride endpoints report status changes, feedback and payments as they
+    commit. A periodic rollup recounts from MySQL what can be recounted,
+    which also picks up edits made through the generic admin endpoints.
+    Cancellations per hour have no timestamp in the schema and are only
+    counted live.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rides_by_status = dict.fromkeys(RIDE_STATUSES, 0)
+        self._rating_count = 0
+        self._rating_sum = 0
+        self._revenue = RingSeries(REVENUE_DAYS, 86400)
+        self._cancellations = RingSeries(CANCELLATION_HOURS, 3600)
+        self.rolled_up_at = None
+
+    @replicated
+    def ride_status(self, old_status, new_status):
+        with self._lock:
+            if old_status in self._rides_by_status:
+                self._rides_by_status[old_status] -= 1
+            if new_status in self._rides_by_status:
+                self._rides_by_status[new_status] += 1
+            if new_status == "Cancelled":
+                self._cancellations.add(1)
+
+    @replicated
+    def rating(self, rating):
+        with self._lock:
+            self._rating_count += 1
+            self._rating_sum += rating
+
+    @replicated
+    def payment(self, amount, status, at=None):
+        if status != "Completed":
+            return
+        try:
+            amount = float(amount)
+            if isinstance(at, str):
+                at = datetime.datetime.strptime(at, "%Y-%m-%d %H:%M:%S")
+        except (TypeError, ValueError):
+            # Left for the next rollup to count
+            return
+        with self._lock:
+            self._revenue.add(amount, at)
+
+    def rollup(self, conn):
+        cursor = conn.cursor()
+        try:
+            cursor.execute(RIDES_BY_STATUS_SQL)
+            rides_by_status = dict.fromkeys(RIDE_STATUSES, 0)
+            rides_by_status.update({status: count for status, count in cursor.fetchall() if status})
+
+            cursor.execute(RATING_TOTALS_SQL)
+            rating_count, rating_sum = cursor.fetchone()
+
+            cursor.execute(DAILY_REVENUE_SQL, (REVENUE_DAYS - 1,))
+            revenue = {
+                datetime.datetime.combine(day, datetime.time()): float(amount)
+                for day, amount in cursor.fetchall()
+            }
+        finally:
+            cursor.close()
+
+        with self._lock:
+            self._rides_by_status = rides_by_status
+            self._rating_count = int(rating_count)
+            self._rating_sum = int(rating_sum)
+            self._revenue.replace(revenue)
+            self.rolled_up_at = datetime.datetime.now()
+
+    def snapshot(self):
+        with self._lock:
+            revenue = self._revenue.points()
+            cancellations = self._cancellations.points()
+            return {
+                "rides_by_status": dict(self._rides_by_status),
+                "drivers": {
+                    "available": sum(driver_index.counts().values()),
+                    "on_ride": self._rides_by_status["Ongoing"],
+                },
+                "rating": {
+                    "count": self._rating_count,
+                    "average": round(self._rating_sum / self._rating_count, 2) if self._rating_count else None,
+                },
+                "revenue_per_day": revenue,
+                "revenue_today": revenue[-1]["value"],
+                "cancellations_per_hour": cancellations,
+                "cancellations_last_24h": int(sum(point["value"] for point in cancellations[-24:])),
+                "rolled_up_at": self.rolled_up_at,
+            }
+
+admin_metrics = message_bus.register(AdminMetrics())
+
+@app.get("/admin/metrics")
+def get_admin_metrics():
+    """
+    Dashboard aggregates, served from memory
+    """
+    return admin_metrics.snapshot()
+
+# BACKGROUND JOBS
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "1") == "1"
+SCHEDULER_LOCK = "smartride_scheduler"  # MySQL named lock held by the leader worker
+SCHEDULER_TICK = 1.0  # shortest sleep between scheduler passes
+PENDING_RIDE_TIMEOUT = int(os.getenv("PENDING_RIDE_TIMEOUT", "300"))  # seconds a ride may wait for a driver
+EXPIRE_INTERVAL = float(os.getenv("EXPIRE_INTERVAL", "30"))  # seconds between expiry sweeps
+EXPIRE_BATCH = 500
+GPS_MAINTENANCE_INTERVAL = float(os.getenv("GPS_MAINTENANCE_INTERVAL", "3600"))
+DRIVER_INDEX_CHECK_INTERVAL = float(os.getenv("DRIVER_INDEX_CHECK_INTERVAL", "300"))
+
+class Job:
+    def __init__(self, name, interval, func, leader_only):
+        self.name = name
+        self.interval = interval
+        self.func = func
+        self.leader_only = leader_only
+        self.due = time.monotonic()  # first run on the first tick
+        self.running = False
+        self.stats = {"runs": 0, "failures": 0, "skipped": 0, "last_started": None, "last_duration": None,
+                      "last_lag": None, "max_lag": 0.0, "last_result": None, "last_error": None}
+
+class JobScheduler:
+    """
+    Periodic maintenance jobs on the event loop of every worker.
+
+    Jobs that change shared rows run only on the leader, the worker whose
+    dedicated connection holds a MySQL named lock. MySQL frees the lock when
+    that connection dies, so another worker takes over on its next tick.
+    Jobs that refresh per-worker memory run on every worker.
+
+    Job bodies run on the database executor with a pooled connection. A job
+    that is still running when it falls due again is skipped, and lag is how
+    late a run started against its schedule.
+    """
+
+    def __init__(self, lock_name, tick):
+        self.lock_name = lock_name
+        self.tick = tick
+        self.jobs = {}
+        self.is_leader = False
+        self._lock_conn = None
+        self._task = None
+        self._job_tasks = set()  # runs in flight; the loop only keeps weak references
+
+    def add(self, name, interval, leader_only=False):
+        def register(func):
+            self.jobs[name] = Job(name, interval, func, leader_only)
+            return func
+        return register
+
+    def claim_leadership(self):
+        try:
+            if self._lock_conn is None:
+                self._lock_conn = get_db_connection()
+            cursor = self._lock_conn.cursor()
+            try:
+                if self.is_leader:
+                    cursor.execute("SELECT IS_USED_LOCK(%s) = CONNECTION_ID()", (self.lock_name,))
+                else:
+                    cursor.execute("SELECT GET_LOCK(%s, 0)", (self.lock_name,))
+                self.is_leader = cursor.fetchone()[0] == 1
+            finally:
+                cursor.close()
+        except Exception as e:
+            if self.is_leader:
+                logger.warning("Scheduler lost leadership: %s", e)
+            self.is_leader = False
+            self.release_leadership()
+        return self.is_leader
+
+    def release_leadership(self):
+        conn, self._lock_conn = self._lock_conn, None
+        self.is_leader = False
+        if conn is None:
+            return
+        try:
+            # Closing the session releases the lock
+            conn.close()
+        except Exception:
+            pass
+
+    def _call(self, job):
+        conn = db_pool.acquire()
+        try:
+            return job.func(conn)
+        finally:
+            db_pool.release(conn)
+
+    async def _run_job(self, job, lag):
+        job.running = True
+        job.stats["last_started"] = datetime.datetime.now()
+        job.stats["last_lag"] = round(lag, 3)
+        job.stats["max_lag"] = max(job.stats["max_lag"], job.stats["last_lag"])
+        started = time.monotonic()
+        try:
+            job.stats["last_result"] = await run_db(self._call, job)
+            job.stats["last_error"] = None
+        except Exception as e:
+            job.stats["failures"] += 1
+            job.stats["last_error"] = str(e)
+            logger.warning("Job %s failed: %s", job.name, e)
+        finally:
+            job.stats["runs"] += 1
+            job.stats["last_duration"] = round(time.monotonic() - started, 3)
+            job.running = False
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            now = time.monotonic()
+            due = [job for job in self.jobs.values() if job.due <= now]
+            if any(job.leader_only for job in due):
+                await run_db(self.claim_leadership)
+            for job in due:
+                lag = now - job.due
+                # A worker that fell far behind runs once, not once per missed interval
+                job.due = max(job.due + job.interval, now)
+                if job.running or (job.leader_only and not self.is_leader):
+                    job.stats["skipped"] += 1
+                    continue
+                task = loop.create_task(self._run_job(job, lag))
+                self._job_tasks.add(task)
+                task.add_done_callback(self._job_tasks.discard)
+            # Sleep until the next job falls due
+            next_due = min((job.due for job in self.jobs.values()), default=now + self.tick)
+            await asyncio.sleep(max(next_due - time.monotonic(), self.tick))
 
-# USERS ENDPOINT
-class UserCreate(BaseModel):
-    email: str
-    password: str
-    role: str
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self.run())
 
-@app.post("/users/", response_model=dict)
-async def create_user(user: UserCreate):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Check if email already exists
-    cursor.execute("SELECT email FROM users WHERE email = %s", (user.email,))
-    if cursor.fetchone():
-        raise HTTPException(status_code=400, detail="Email already registered")
-    
-    # Hash password before storing
-    hashed_password = hash_password(user.password)
-    
-    # Insert new user
-    cursor.execute(
-        "INSERT INTO users (email, password_hash, role) VALUES (%s, %s, %s)",
-        (user.email, hashed_password, user.role)
-    )
-    user_id = cursor.lastrowid
-    
-    # Create role-specific record
-    if user.role == "customer":
-        cursor.execute("INSERT INTO customers (customer_id) VALUES (%s)", (user_id,))
-    elif user.role == "driver":
-        cursor.execute("INSERT INTO drivers (driver_id) VALUES (%s)", (user_id,))
-    elif user.role == "admin":
-        cursor.execute("INSERT INTO administrators (admin_id) VALUES (%s)", (user_id,))
-    
-    conn.commit()
-    cursor.close()
-    conn.close()
-    
-    return {"message": "User created successfully", "user_id": user_id}
+    async def stop(self):
+        tasks = list(self._job_tasks)
+        if self._task is not None:
+            tasks.append(self._task)
+            self._task = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await run_db(self.release_leadership)
 
-@app.get("/users/")
-def get_users():
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute("SELECT user_id, email, password_hash, role, created_at FROM users")
-    users = cursor.fetchall()
-    cursor.close()
-    conn.close()
-    return users
+    def report(self):
+        now = time.monotonic()
+        return {
+            "leader": self.is_leader,
+            "pid": os.getpid(),
+            "jobs": [
+                dict(job.stats, name=job.name, interval=job.interval, leader_only=job.leader_only,
+                     running=job.running, next_run_in=round(max(job.due - now, 0), 3))
+                for job in self.jobs.values()
+            ],
+        }
 
-# Special endpoint to create admin user
-@app.post("/create-admin/", response_model=dict)
-async def create_admin_user(email: str, password: str):
-    conn = get_db_connection()
+scheduler = JobScheduler(SCHEDULER_LOCK, SCHEDULER_TICK)
+
+EXPIRED_PENDING_SQL = """
+    SELECT ride_id, customer_id, driver_id FROM rides
+    WHERE status = 'Pending' AND start_time < NOW() - INTERVAL %s SECOND
+    ORDER BY ride_id LIMIT %s FOR UPDATE
+"""
+EXPIRE_RIDES_SQL = "UPDATE rides SET status = 'Cancelled' WHERE ride_id IN ({placeholders})"
+
+def expire_pending_rides(conn, max_age, batch_size=EXPIRE_BATCH):
+    """
+    Cancel the rides that have waited more than `max_age` seconds for a driver
+    """
     cursor = conn.cursor()
-    
     try:
-        # Check if email already exists
-        cursor.execute("SELECT email FROM users WHERE email = %s", (email,))
-        if cursor.fetchone():
-            raise HTTPException(status_code=400, detail="Email already registered")
-        
-        # Hash password before storing
-        hashed_password = hash_password(password)
-        
-        # Insert new admin user
-        cursor.execute(
-            "INSERT INTO users (email, password_hash, role) VALUES (%s, %s, %s)",
-            (email, hashed_password, "admin")
-        )
-        admin_id = cursor.lastrowid
-        
-        # Create administrator record
-        cursor.execute("INSERT INTO administrators (admin_id) VALUES (%s)", (admin_id,))
-        
+        cursor.execute(EXPIRED_PENDING_SQL, (max_age, batch_size))
+        rides = cursor.fetchall()
+        if rides:
+            placeholders = ", ".join(["%s"] * len(rides))
+            cursor.execute(EXPIRE_RIDES_SQL.format(placeholders=placeholders), tuple(ride[0] for ride in rides))
         conn.commit()
-        
-        # Return the created admin user with password hash for verification
-        return {
-            "message": "Admin user created successfully", 
-            "user_id": admin_id,
-            "email": email,
-            "password_hash": hashed_password,
-            "role": "admin"
-        }
-        
-    except Exception as e:
+    except Exception:
         conn.rollback()
-        raise HTTPException(status_code=500, detail=f"Failed to create admin user: {str(e)}")
+        raise
     finally:
         cursor.close()
-        conn.close()
-
-# RIDES ENDPOINT
-class RideCreate(BaseModel):
-    customer_id: int
-    driver_id: int
-    pickup_location: str
-    dropoff_location: str
 
-@app.post("/rides/")
-def create_ride(ride: RideCreate):
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    for ride_id, customer_id, driver_id in rides:
+        stop_tracking(ride_id)
+        invalidate_ride(ride_id, customer_id, driver_id)
+        admin_metrics.ride_status("Pending", "Cancelled")
+        publish_ride_event(ride_id, driver_id, "expired", status="Cancelled")
+    return {"expired": len(rides)}
 
-    # Validate customer
-    cursor.execute("SELECT customer_id FROM customers WHERE customer_id = %s", (ride.customer_id,))
-    if not cursor.fetchone():
-        raise HTTPException(status_code=400, detail="Invalid customer ID.")
+@scheduler.add("expire_pending_rides", EXPIRE_INTERVAL, leader_only=True)
+def expire_pending_rides_job(conn):
+    return expire_pending_rides(conn, PENDING_RIDE_TIMEOUT)
 
-    # Validate driver
-    cursor.execute("SELECT driver_id FROM drivers WHERE driver_id = %s", (ride.driver_id,))
-    if not cursor.fetchone():
-        raise HTTPException(status_code=400, detail="Invalid driver ID.")
+@scheduler.add("gps_partitions", GPS_MAINTENANCE_INTERVAL, leader_only=True)
+def maintain_gps_partitions(conn):
+    return {"added": ensure_gps_partitions(conn), "dropped": prune_gps_partitions(conn)}
 
-    cursor.execute(
-        "INSERT INTO rides (customer_id, driver_id, pickup_location, dropoff_location) VALUES (%s, %s, %s, %s)",
-        (ride.customer_id, ride.driver_id, ride.pickup_location, ride.dropoff_location)
-    )
-    ride_id = cursor.lastrowid
-    conn.commit()
-    cursor.close()
-    conn.close()
-    return {"message": "Ride created successfully", "ride_id": ride_id}
+# Aggregates and the driver index live in each worker's memory, so every worker refreshes its own
+@scheduler.add("admin_metrics_rollup", ADMIN_METRICS_ROLLUP)
+def rollup_admin_metrics(conn):
+    admin_metrics.rollup(conn)
 
-@app.get("/rides/")
-def get_rides():
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM rides")
-    rides = cursor.fetchall()
-    cursor.close()
-    conn.close()
-    return rides
+@scheduler.add("driver_index_check", DRIVER_INDEX_CHECK_INTERVAL)
+def repair_driver_index(conn):
+    return driver_index.check(conn, repair=True)
 
-@app.get("/rides/user/{user_id}")
-async def get_user_rides(user_id: int, role: str):
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    
-    if role == "customer":
-        cursor.execute("SELECT * FROM rides WHERE customer_id = %s", (user_id,))
-    elif role == "driver":
-        cursor.execute("SELECT * FROM rides WHERE driver_id = %s", (user_id,))
-    else:
-        raise HTTPException(status_code=400, detail="Invalid role")
-    
-    rides = cursor.fetchall()
-    cursor.close()
-    conn.close()
-    
-    return rides
+if replicas.replicas:
+    @scheduler.add("replica_lag", DB_REPLICA_CHECK_INTERVAL)
+    def check_replica_lag(conn):
+        return replicas.check()
 
-@app.put("/rides/{ride_id}/status")
-async def update_ride_status(ride_id: int, status: str):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute("SELECT ride_id FROM rides WHERE ride_id = %s", (ride_id,))
-    if not cursor.fetchone():
-        raise HTTPException(status_code=404, detail="Ride not found")
-    
-    # If the ride is being completed, set the end_time to now
-    if status == "Completed":
-        cursor.execute(
-            "UPDATE rides SET status = %s, end_time = NOW() WHERE ride_id = %s",
-            (status, ride_id)
-        )
-    else:
-        cursor.execute(
-            "UPDATE rides SET status = %s WHERE ride_id = %s",
-            (status, ride_id)
-        )
-    
-    conn.commit()
-    cursor.close()
-    conn.close()
-    
-    return {"message": "Ride status updated successfully"}
+@app.on_event("startup")
+async def start_scheduler():
+    if SCHEDULER_ENABLED:
+        scheduler.start()
 
-# CUSTOMERS ENDPOINT
-@app.post("/customers/")
-def create_customer(customer_id: int):
-    conn = get_db_connection()
-    cursor = conn.cursor()
+@app.on_event("shutdown")
+async def stop_scheduler():
+    await scheduler.stop()
 
-    cursor.execute("SELECT role FROM users WHERE user_id = %s", (customer_id,))
-    user = cursor.fetchone()
-    
-    if not user or user[0] != "customer":
-        raise HTTPException(status_code=400, detail="User must be a customer.")
+@app.get("/admin/jobs")
+def get_jobs():
+    """
+    Last run, duration, lag and outcome of every background job in this worker
+    """
+    return scheduler.report()
 
-    cursor.execute("INSERT INTO customers (customer_id) VALUES (%s)", (customer_id,))
-    conn.commit()
-    cursor.close()
-    conn.close()
-    return {"message": "Customer added successfully"}
+# ADMINISTRATORS ENDPOINT
+ADMINISTRATORS_SQL = "SELECT * FROM administrators"
 
-@app.get("/customers/")
-def get_customers():
-    conn = get_db_connection()
+@app.get("/administrators/")
+@offload
+def get_administrators(conn=Depends(get_read_db)):
     cursor = conn.cursor(dictionary=True)
     
     try:
-        cursor.execute("SELECT * FROM customers")
-        customers = cursor.fetchall()
+        cursor.execute(ADMINISTRATORS_SQL)
+        administrators = cursor.fetchall()
         
-        return customers
+        return administrators
 
     except mysql.connector.Error as err:
         raise HTTPException(status_code=400, detail=str(err))
 
     finally:
         cursor.close()
-        conn.close()
 
-# DRIVERS ENDPOINT
-@app.post("/drivers/")
-def create_driver(driver_id: int):
-    conn = get_db_connection()
-    cursor = conn.cursor()
+# DATABASE SCHEMA INFO ENDPOINTS
+SCHEMA_TABLES_SQL = "SELECT table_name FROM information_schema.tables WHERE table_schema = DATABASE() ORDER BY table_name"
+SCHEMA_COLUMNS_SQL = """
+    SELECT table_name, column_name, column_type, is_nullable, column_key, column_default, extra
+    FROM information_schema.columns
+    WHERE table_schema = DATABASE()
+    ORDER BY table_name, ordinal_position
+"""
 
-    cursor.execute("SELECT role FROM users WHERE user_id = %s", (driver_id,))
-    user = cursor.fetchone()
-    
-    if not user or user[0] != "driver":
-        raise HTTPException(status_code=400, detail="User must be a driver.")
+def schema_text(value):
+    # information_schema columns come back as bytes on some server versions
+    return value.decode() if isinstance(value, (bytes, bytearray)) else value
 
-    cursor.execute("INSERT INTO drivers (driver_id) VALUES (%s)", (driver_id,))
-    conn.commit()
-    cursor.close()
-    conn.close()
-    return {"message": "Driver added successfully"}
+def schema_default(value):
+    """
+    Column default as SHOW COLUMNS reports it; MariaDB quotes literals in
+    information_schema and spells a NULL default as 'NULL'
+    """
+    value = schema_text(value)
+    if value == "NULL":
+        return None
+    if isinstance(value, str) and len(value) >= 2 and value[0] == value[-1] == "'":
+        return value[1:-1].replace("''", "'")
+    return value
 
-@app.get("/drivers/available")
-async def get_available_drivers():
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    
-    cursor.execute("""
-        SELECT d.driver_id, u.email, v.type, v.plate_number 
-        FROM drivers d 
-        JOIN users u ON d.driver_id = u.user_id 
-        JOIN vehicles v ON d.driver_id = v.driver_id 
-        WHERE d.availability = TRUE
-    """)
-    
-    drivers = cursor.fetchall()
-    cursor.close()
-    conn.close()
-    
-    return drivers
+class SchemaRegistry:
+    """
+    In-memory copy of the tables and columns of the database.
 
-@app.get("/drivers/")
-def get_drivers():
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    
-    try:
-        cursor.execute("SELECT * FROM drivers")
-        drivers = cursor.fetchall()
-        
-        return drivers
+    Loaded from information_schema at startup and again after migrations, so
+    admin pages never run metadata queries per request. It is also the
+    whitelist for table and column names that end up inside dynamic SQL.
+    """
 
-    except mysql.connector.Error as err:
-        raise HTTPException(status_code=400, detail=str(err))
+    def __init__(self):
+        self._tables = {}
+        self._lock = threading.Lock()
+        self.loaded = False
 
-    finally:
-        cursor.close()
-        conn.close()
+    def load(self, conn):
+        cursor = conn.cursor()
+        try:
+            cursor.execute(SCHEMA_TABLES_SQL)
+            tables = {schema_text(row[0]): [] for row in cursor.fetchall()}
+            cursor.execute(SCHEMA_COLUMNS_SQL)
+            for table, name, column_type, nullable, key, default, extra in cursor.fetchall():
+                tables.setdefault(schema_text(table), []).append({
+                    "name": schema_text(name),
+                    "type": schema_text(column_type),
+                    "null": schema_text(nullable),
+                    "key": schema_text(key),
+                    "default": schema_default(default),
+                    "extra": schema_text(extra),
+                })
+        finally:
+            cursor.close()
 
-# VEHICLES ENDPOINT
-@app.get("/vehicles/")
-def get_vehicles():
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM vehicles")
-    vehicles = cursor.fetchall()
-    cursor.close()
-    conn.close()
-    return vehicles
+        with self._lock:
+            self._tables = tables
+            self.loaded = True
 
-# FEEDBACK ENDPOINT
-class FeedbackCreate(BaseModel):
-    ride_id: int
-    rating: int
-    comment: str
+    def ensure_loaded(self, conn):
+        if not self.loaded:
+            self.load(conn)
 
-@app.post("/feedbacks/")
-def create_feedback(feedback: FeedbackCreate):
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    def tables(self):
+        return sorted(self._tables)
 
-    cursor.execute("SELECT ride_id FROM rides WHERE ride_id = %s", (feedback.ride_id,))
-    if not cursor.fetchone():
-        raise HTTPException(status_code=400, detail="Invalid ride ID.")
+    def columns(self, table):
+        columns = self._tables.get(table)
+        if columns is None:
+            raise HTTPException(status_code=400, detail=f"Unknown table: {table}")
+        return columns
 
-    cursor.execute(
-        "INSERT INTO feedbacks (ride_id, rating, comment) VALUES (%s, %s, %s)",
-        (feedback.ride_id, feedback.rating, feedback.comment)
-    )
-    conn.commit()
-    cursor.close()
-    conn.close()
-    return {"message": "Feedback submitted successfully"}
+    def check_columns(self, table, names):
+        """
+        Reject a table or any column name that is not in the schema
+        """
+        known = {column["name"] for column in self.columns(table)}
+        unknown = sorted(set(names) - known)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown columns for {table}: {', '.join(unknown)}")
 
-@app.get("/feedbacks/")
-def get_feedbacks():
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM feedbacks")
-    feedbacks = cursor.fetchall()
-    cursor.close()
-    conn.close()
-    return feedbacks
+schema_registry = SchemaRegistry()
 
-# PAYMENTS ENDPOINT
-@app.get("/payments/")
-def get_payments():
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM payments")
-    payments = cursor.fetchall()
-    cursor.close()
-    conn.close()
-    return payments
+# SQL text for validated identifiers, one entry per (table, column set)
+@functools.lru_cache(maxsize=1024)
+def insert_sql(table, columns):
+    return f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})"
 
-# NOTIFICATIONS ENDPOINT
-@app.get("/notifications/")
-def get_notifications():
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM notifications")
-    notifications = cursor.fetchall()
-    cursor.close()
-    conn.close()
-    return notifications
+@functools.lru_cache(maxsize=1024)
+def update_sql(table, columns, primary_key):
+    return f"UPDATE {table} SET {', '.join(f'{column} = %s' for column in columns)} WHERE {primary_key} = %s"
 
-# GPS TRACKING ENDPOINT
-class GPSTrackingCreate(BaseModel):
-    ride_id: int
-    eta: int
-    gps_image: str
+@functools.lru_cache(maxsize=1024)
+def delete_sql(table, primary_key):
+    return f"DELETE FROM {table} WHERE {primary_key} = %s"
 
-@app.post("/gps/")
-def update_gps_tracking(gps_data: GPSTrackingCreate):
-    conn = get_db_connection()
-    cursor = conn.cursor()
+@message_bus.register_function
+def load_schema_registry():
+    conn = db_pool.acquire()
+    try:
+        schema_registry.load(conn)
+    finally:
+        db_pool.release(conn)
 
-    cursor.execute("SELECT ride_id FROM rides WHERE ride_id = %s", (gps_data.ride_id,))
-    if not cursor.fetchone():
-        raise HTTPException(status_code=400, detail="Invalid ride ID.")
+async def ensure_schema_loaded():
+    if not schema_registry.loaded:
+        await run_db(load_schema_registry)
 
-    cursor.execute(
-        "INSERT INTO gps_tracking (ride_id, eta, gps_image) VALUES (%s, %s, %s)",
-        (gps_data.ride_id, gps_data.eta, gps_data.gps_image)
-    )
-    conn.commit()
-    cursor.close()
-    conn.close()
-    return {"message": "GPS tracking updated successfully"}
+@app.on_event("startup")
+async def load_schema():
+    if schema_registry.loaded:
+        # Already loaded by the startup migration
+        return
+    try:
+        await run_db(load_schema_registry)
+    except Exception as e:
+        # The registry is loaded lazily on first use instead
+        logger.warning("Could not load schema registry at startup: %s", e)
 
-@app.get("/gps/")
-def get_gps_tracking():
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM gps_tracking")
-    gps_data = cursor.fetchall()
-    cursor.close()
-    conn.close()
-    return gps_data
+@app.get("/tables")
+@offload
+def get_tables():
+    # Served from memory; a connection is only needed if startup could not load the registry
+    if not schema_registry.loaded:
+        load_schema_registry()
+    return {"tables": schema_registry.tables()}
 
-# ADMINISTRATORS ENDPOINT
-@app.get("/administrators/")
-def get_administrators():
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    
-    try:
-        cursor.execute("SELECT * FROM administrators")
-        administrators = cursor.fetchall()
-        
-        return administrators
+@app.post("/tables/refresh")
+@offload
+def refresh_tables(conn=Depends(get_db)):
+    """
+    Reload the schema registry, e.g. after running `python main.py migrate`
+    against a live server
+    """
+    schema_registry.load(conn)
+    message_bus.publish(None, "load_schema_registry", ())
+    return {"tables": schema_registry.tables()}
 
-    except mysql.connector.Error as err:
-        raise HTTPException(status_code=400, detail=str(err))
+@app.get("/table-columns/{table_name}")
+@offload
+def get_table_columns(table_name: str):
+    if not schema_registry.loaded:
+        load_schema_registry()
+    return {"columns": schema_registry.columns(table_name)}
 
-    finally:
-        cursor.close()
-        conn.close()
+# RECORD MANIPULATION ENDPOINTS
+# Columns of each table that name a cached ride read
+CACHE_KEY_COLUMNS = {
+    "rides": ("ride_id", "customer_id", "driver_id"),
+    "ride_statuses": ("ride_id",),
+    "gps_tracking": ("ride_id",),
+    "feedbacks": ("ride_id",),
+}
+# Tables joined into many cached reads; a write to them drops the whole group
+CACHE_PREFIXES = {
+    "vehicles": ("vehicles:", "ride_state:"),
+    "users": ("ride_state:",),
+}
+
+def cached_rows_touched_by(cursor, table, primary_key, primary_values):
+    """
+    Cache key columns of the rows a generic admin write on `table` is about to affect
+    """
+    columns = CACHE_KEY_COLUMNS.get(table)
+    if not columns or not primary_values:
+        return []
+    placeholders = ", ".join(["%s"] * len(primary_values))
+    cursor.execute(f"SELECT {', '.join(columns)} FROM {table} WHERE {primary_key} IN ({placeholders})",
+                   tuple(primary_values))
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
 
-# DATABASE SCHEMA INFO ENDPOINTS
-@app.get("/tables")
-def get_tables():
-    conn = get_db_connection()
-    cursor = conn.cursor()
+def invalidate_rows(table, rows):
+    """
+    Drop what a generic admin write made stale, and keep reads of the table
+    on the primary until replicas have the write
+    """
+    replicas.stick(f"table:{table}")
+    if table == "notifications":
+        notifier.reset_counts()
+    if table not in CACHE_KEY_COLUMNS:
+        rows = []
+    for row in rows:
+        if row.get("ride_id") is not None:
+            invalidate_ride(row["ride_id"], row.get("customer_id"), row.get("driver_id"))
+        else:
+            # A new ride with no id yet still changes its users' ride lists
+            keys = []
+            if row.get("customer_id") is not None:
+                keys.append(user_rides_key("customer", row["customer_id"]))
+            if row.get("driver_id") is not None:
+                keys.append(user_rides_key("driver", row["driver_id"]))
+            read_cache.delete(*keys)
+    for prefix in CACHE_PREFIXES.get(table, ()):
+        read_cache.delete_prefix(prefix)
 
-    try:
-        cursor.execute("SHOW TABLES")
-        tables = [row[0] for row in cursor.fetchall()]
-        return {"tables": tables}
+# List of timestamp fields to handle
+TIMESTAMP_FIELDS = ["created_at", "feedback_time", "start_time", "end_time", "payment_time", "updated_at"]
 
-    except mysql.connector.Error as err:
-        raise HTTPException(status_code=400, detail=str(err))
+def prepare_record(table, data):
+    """
+    Check and normalize timestamp formats, in place
+    """
+    for field in TIMESTAMP_FIELDS:
+        if field in data:
+            try:
+                # Expecting the client to send in "YYYY-MM-DD HH:MM:SS" format
+                dt = datetime.datetime.strptime(data[field], "%Y-%m-%d %H:%M:%S")
+                data[field] = dt.strftime("%Y-%m-%d %H:%M:%S")
+            except Exception as e:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Invalid datetime format for '{field}'. Use 'YYYY-MM-DD HH:MM:SS'."
+                )
+    return data
 
-    finally:
-        cursor.close()
-        conn.close()
+def stored_columns(table, records):
+    """
+    Columns the records will write; a users `password` is stored as password_hash
+    """
+    columns = {column for record in records for column in record}
+    if table == "users" and "password" in columns:
+        columns = (columns - {"password"}) | {"password_hash"}
+    return columns
 
-@app.get("/table-columns/{table_name}")
-def get_table_columns(table_name: str):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    try:
-        cursor.execute(f"SHOW COLUMNS FROM {table_name}")
-        # Each row returns: Field, Type, Null, Key, Default, Extra
-        columns = []
-        for row in cursor.fetchall():
-            col = {
-                "name": row[0],
-                "type": row[1],
-                "null": row[2],
-                "key": row[3],
-                "default": row[4],
-                "extra": row[5]
-            }
-            columns.append(col)
-        return {"columns": columns}
-    
-    except mysql.connector.Error as err:
-        raise HTTPException(status_code=400, detail=str(err))
-    
-    finally:
-        cursor.close()
-        conn.close()
+async def hash_passwords(table, records):
+    """
+    Replace a plain `password` in users records with its hash, in place.
+
+    Callers validate first and borrow a connection only afterwards, so a
+    bad request never waits on bcrypt and no connection is held during it.
+    """
+    if table != "users":
+        return
+    with_password = [record for record in records if "password" in record]
+    hashes = await password_hasher.hash_many_async([record.pop("password") for record in with_password])
+    for record, password_hash in zip(with_password, hashes):
+        record["password_hash"] = password_hash
 
-# RECORD MANIPULATION ENDPOINTS
 class UpdateRecord(BaseModel):
     table_name: str
     primary_key: str
@@ -525,8 +4183,22 @@ class UpdateRecord(BaseModel):
     update_data: dict  # Dictionary of updated fields
 
 @app.put("/update-record")
-def update_record(data: UpdateRecord):
-    conn = get_db_connection()
+async def update_record(data: UpdateRecord):
+    table = data.table_name
+    update_data = data.update_data
+
+    # Only known identifiers reach the generated statement
+    await ensure_schema_loaded()
+    schema_registry.check_columns(table, {data.primary_key} | stored_columns(table, [update_data]))
+    if not update_data:
+        raise HTTPException(status_code=400, detail="No columns to update")
+
+    # Handle timestamp formats and password hashing
+    prepare_record(table, update_data)
+    await hash_passwords(table, [update_data])
+    return await run_with_db(write_record_update, data)
+
+def write_record_update(data, conn):
     cursor = conn.cursor()
 
     try:
@@ -534,39 +4206,26 @@ def update_record(data: UpdateRecord):
         primary_key = data.primary_key
         primary_value = data.primary_value
         update_data = data.update_data
-
-        # Handle password hashing for the users table
-        if table == "users" and "password" in update_data:
-            # Hash the password and replace in the update data
-            password = update_data.pop("password")
-            update_data["password_hash"] = hash_password(password)
-
-        # List of timestamp fields to handle
-        timestamp_fields = ["created_at", "feedback_time", "start_time", "end_time", "payment_time", "updated_at"]
-
-        for field in timestamp_fields:
-            if field in update_data:
-                try:
-                    # Expecting the client to send in "YYYY-MM-DD HH:MM:SS" format
-                    dt = datetime.datetime.strptime(update_data[field], "%Y-%m-%d %H:%M:%S")
-                    update_data[field] = dt.strftime("%Y-%m-%d %H:%M:%S")
-                except Exception as e:
-                    raise HTTPException(
-                        status_code=400,
-                        detail=f"Invalid datetime format for '{field}'. Use 'YYYY-MM-DD HH:MM:SS'."
-                    )
-
-        # Generate SQL UPDATE statement dynamically
-        set_clause = ", ".join([f"{col} = %s" for col in update_data.keys()])
+        if table == "users":
+            login_guard.clear_unknown()
         values = list(update_data.values()) + [primary_value]
 
-        sql = f"UPDATE {table} SET {set_clause} WHERE {primary_key} = %s"
-        cursor.execute(sql, values)
+        touched = drivers_touched_by(cursor, table, primary_key, (primary_value,))
+        cached_rows = cached_rows_touched_by(cursor, table, primary_key, (primary_value,))
+        cursor.execute(update_sql(table, tuple(update_data), primary_key), values)
         conn.commit()
 
         if cursor.rowcount == 0:
             raise HTTPException(status_code=404, detail="Record not found")
 
+        column = DRIVER_KEY_COLUMNS.get(table)
+        if column and column in update_data:
+            touched.add(update_data[column])
+        sync_driver_index(conn, touched)
+        sync_ride_tracking(conn, table, cached_rows)
+        # Rows moved to another ride or user make that one stale as well
+        invalidate_rows(table, cached_rows + [{**row, **update_data} for row in cached_rows])
+
         return {"message": "Record updated successfully"}
 
     except mysql.connector.Error as err:
@@ -574,24 +4233,24 @@ def update_record(data: UpdateRecord):
         raise HTTPException(status_code=400, detail=str(err))
     finally:
         cursor.close()
-        conn.close()
 
 @app.post("/{table_name}/insert")
-def insert_record(table_name: str, data: dict):
-    conn = get_db_connection()
+async def insert_record(table_name: str, data: dict):
+    # Only known identifiers reach the generated statement
+    await ensure_schema_loaded()
+    schema_registry.check_columns(table_name, stored_columns(table_name, [data]))
+
+    # Check if this is a user insert and hash password if present
+    await hash_passwords(table_name, [data])
+    return await run_with_db(write_record, table_name, data)
+
+def write_record(table_name, data, conn):
     cursor = conn.cursor()
     try:
-        # Check if this is a user insert and hash password if present
-        if table_name == "users" and "password" in data:
-            # Convert password to password_hash
-            password = data.pop("password")
-            data["password_hash"] = hash_password(password)
+        if table_name == "users":
+            login_guard.clear_unknown()
         
-        # Dynamically build the insert query
-        columns = ", ".join(data.keys())
-        placeholders = ", ".join(["%s"] * len(data))
-        sql = f"INSERT INTO {table_name} ({columns}) VALUES ({placeholders})"
-        cursor.execute(sql, tuple(data.values()))
+        cursor.execute(insert_sql(table_name, tuple(data)), tuple(data.values()))
         
         # For user inserts, also create role-specific record
         new_id = cursor.lastrowid
@@ -605,62 +4264,331 @@ def insert_record(table_name: str, data: dict):
                 cursor.execute("INSERT INTO administrators (admin_id) VALUES (%s)", (new_id,))
                 
         conn.commit()
+        if table_name in ("drivers", "vehicles"):
+            sync_driver_index(conn, {data.get("driver_id")})
+        invalidate_rows(table_name, [data])
+        if table_name == "payments":
+            admin_metrics.payment(data.get("amount"), data.get("status"), data.get("payment_time"))
         return {"message": f"Record inserted into {table_name} successfully", "id": new_id}
     except mysql.connector.Error as err:
         conn.rollback()
         raise HTTPException(status_code=400, detail=str(err))
     finally:
         cursor.close()
-        conn.close()
 
 @app.delete("/delete-record/{table_name}/{primary_key}/{primary_value}")
-def delete_record(table_name: str, primary_key: str, primary_value: str):
-    conn = get_db_connection()
+@offload
+def delete_record(table_name: str, primary_key: str, primary_value: str, conn=Depends(get_db)):
+    schema_registry.ensure_loaded(conn)
+    schema_registry.check_columns(table_name, {primary_key})
     cursor = conn.cursor()
     try:
-        sql = f"DELETE FROM {table_name} WHERE {primary_key} = %s"
-        cursor.execute(sql, (primary_value,))
+        touched = drivers_touched_by(cursor, table_name, primary_key, (primary_value,))
+        cached_rows = cached_rows_touched_by(cursor, table_name, primary_key, (primary_value,))
+        cursor.execute(delete_sql(table_name, primary_key), (primary_value,))
         conn.commit()
 
         if cursor.rowcount == 0:
             raise HTTPException(status_code=404, detail="Record not found")
 
+        for driver_id in touched:
+            driver_index.remove(driver_id)
+        sync_ride_tracking(conn, table_name, cached_rows)
+        invalidate_rows(table_name, cached_rows)
+
         return {"message": f"Record deleted from {table_name} successfully"}
 
     except mysql.connector.Error as err:
         raise HTTPException(status_code=400, detail=str(err))
     finally:
         cursor.close()
-        conn.close()
+
+# BATCH RECORD MANIPULATION ENDPOINTS
+BATCH_MAX_ROWS = int(os.getenv("BATCH_MAX_ROWS", "5000"))
+
+def execute_batch(cursor, groups, bulk=True, after_row=None):
+    """
+    Run a batch of row writes inside the caller's transaction.
+
+    `groups` is a list of (sql, [(index, params), ...]). Each group is first
+    sent with executemany, which turns an INSERT into multi-row VALUES. If
+    that fails, or when `bulk` is off, rows are replayed one by one behind a
+    savepoint so every failing row is reported and the good ones are kept.
+    `after_row(cursor, index)` runs after each row in the one-by-one pass.
+
+    Returns the failures as [{"index": ..., "error": ...}].
+    """
+    if bulk:
+        cursor.execute("SAVEPOINT batch")
+        try:
+            for sql, items in groups:
+                cursor.executemany(sql, [params for _, params in items])
+            return []
+        except mysql.connector.Error:
+            cursor.execute("ROLLBACK TO SAVEPOINT batch")
+
+    failed = []
+    for sql, items in groups:
+        for index, params in items:
+            cursor.execute("SAVEPOINT batch_row")
+            try:
+                cursor.execute(sql, params)
+                if after_row:
+                    after_row(cursor, index)
+            except mysql.connector.Error as err:
+                cursor.execute("ROLLBACK TO SAVEPOINT batch_row")
+                failed.append({"index": index, "error": str(err)})
+    return sorted(failed, key=lambda failure: failure["index"])
+
+def finish_batch(conn, action, total, failed, atomic):
+    """
+    Commit what succeeded, or nothing at all when an atomic batch had a failure
+    """
+    if failed and atomic:
+        conn.rollback()
+        raise HTTPException(status_code=400, detail={"message": "Batch rolled back", "failed": failed})
+    conn.commit()
+    return {"message": f"{total - len(failed)} of {total} records {action}", "failed": failed}
+
+def missing_records(cursor, table, primary_key, primary_values):
+    placeholders = ", ".join(["%s"] * len(primary_values))
+    cursor.execute(f"SELECT {primary_key} FROM {table} WHERE {primary_key} IN ({placeholders})",
+                   tuple(primary_values))
+    found = {str(row[0]) for row in cursor.fetchall()}
+    return [index for index, value in enumerate(primary_values) if str(value) not in found]
+
+def check_batch_size(rows):
+    if not rows:
+        raise HTTPException(status_code=400, detail="Batch is empty")
+    if len(rows) > BATCH_MAX_ROWS:
+        raise HTTPException(status_code=400, detail=f"Batch is limited to {BATCH_MAX_ROWS} records")
+
+class InsertBatch(BaseModel):
+    rows: List[dict]
+    atomic: bool = True  # roll back every row when any row fails
+
+@app.post("/{table_name}/insert-batch")
+async def insert_records(table_name: str, batch: InsertBatch):
+    """
+    Insert many rows in one transaction
+    """
+    check_batch_size(batch.rows)
+    rows = [prepare_record(table_name, dict(row)) for row in batch.rows]
+    await ensure_schema_loaded()
+    schema_registry.check_columns(table_name, stored_columns(table_name, rows))
+    await hash_passwords(table_name, rows)
+    return await run_with_db(write_records, table_name, rows, batch.atomic)
+
+def write_records(table_name, rows, atomic, conn):
+    # Rows with the same columns share one multi-row INSERT
+    groups = {}
+    for index, row in enumerate(rows):
+        columns = tuple(row.keys())
+        groups.setdefault(columns, []).append((index, tuple(row.values())))
+    statements = [(insert_sql(table_name, columns), items) for columns, items in groups.items()]
+
+    def create_role_record(cursor, index):
+        # New users also get their role-specific record, as in insert_record
+        role = rows[index].get("role")
+        role_tables = {"customer": "customers", "driver": "drivers", "admin": "administrators"}
+        role_keys = {"customer": "customer_id", "driver": "driver_id", "admin": "admin_id"}
+        if role in role_tables:
+            cursor.execute(f"INSERT INTO {role_tables[role]} ({role_keys[role]}) VALUES (%s)", (cursor.lastrowid,))
+
+    cursor = conn.cursor()
+    try:
+        # User rows need their own generated id, so they always go one by one
+        if table_name == "users":
+            failed = execute_batch(cursor, statements, bulk=False, after_row=create_role_record)
+        else:
+            failed = execute_batch(cursor, statements)
+        result = finish_batch(conn, "inserted", len(rows), failed, atomic)
+    except mysql.connector.Error as err:
+        conn.rollback()
+        raise HTTPException(status_code=400, detail=str(err))
+    finally:
+        cursor.close()
+
+    failed_indexes = {failure["index"] for failure in failed}
+    inserted = [row for index, row in enumerate(rows) if index not in failed_indexes]
+    if table_name == "users":
+        login_guard.clear_unknown()
+    if table_name in ("drivers", "vehicles"):
+        sync_driver_index(conn, {row.get("driver_id") for row in inserted})
+    invalidate_rows(table_name, inserted)
+    if table_name == "payments":
+        for row in inserted:
+            admin_metrics.payment(row.get("amount"), row.get("status"), row.get("payment_time"))
+    return result
+
+class RecordUpdate(BaseModel):
+    primary_value: str
+    update_data: dict
+
+class UpdateBatch(BaseModel):
+    table_name: str
+    primary_key: str
+    updates: List[RecordUpdate]
+    atomic: bool = True  # roll back every row when any row fails
+
+@app.put("/update-records")
+async def update_records(batch: UpdateBatch):
+    """
+    Update many rows of one table in one transaction
+    """
+    table = batch.table_name
+    check_batch_size(batch.updates)
+    records = [prepare_record(table, dict(update.update_data)) for update in batch.updates]
+    await ensure_schema_loaded()
+    schema_registry.check_columns(table, {batch.primary_key} | stored_columns(table, records))
+    if any(not data for data in records):
+        raise HTTPException(status_code=400, detail="Every update needs at least one column")
+    await hash_passwords(table, records)
+    updates = list(zip([update.primary_value for update in batch.updates], records))
+    return await run_with_db(write_record_updates, batch, updates)
+
+def write_record_updates(batch, updates, conn):
+    table = batch.table_name
+    primary_values = [value for value, _ in updates]
+    groups = {}
+    for index, (value, data) in enumerate(updates):
+        columns = tuple(data.keys())
+        groups.setdefault(columns, []).append((index, tuple(data.values()) + (value,)))
+    statements = [(update_sql(table, columns, batch.primary_key), items) for columns, items in groups.items()]
+
+    cursor = conn.cursor()
+    try:
+        failed = [{"index": index, "error": "Record not found"}
+                  for index in missing_records(cursor, table, batch.primary_key, primary_values)]
+        touched = drivers_touched_by(cursor, table, batch.primary_key, primary_values)
+        cached_rows = cached_rows_touched_by(cursor, table, batch.primary_key, primary_values)
+        failed += execute_batch(cursor, statements)
+        failed.sort(key=lambda failure: failure["index"])
+        result = finish_batch(conn, "updated", len(updates), failed, batch.atomic)
+    except mysql.connector.Error as err:
+        conn.rollback()
+        raise HTTPException(status_code=400, detail=str(err))
+    finally:
+        cursor.close()
+
+    if table == "users":
+        login_guard.clear_unknown()
+    column = DRIVER_KEY_COLUMNS.get(table)
+    if column:
+        touched.update(data[column] for _, data in updates if column in data)
+    sync_driver_index(conn, touched)
+    sync_ride_tracking(conn, table, cached_rows)
+    # Old owners come from cached_rows, new ones from the updated columns
+    if table in CACHE_KEY_COLUMNS:
+        cached_rows += [data for _, data in updates]
+    invalidate_rows(table, cached_rows)
+    return result
+
+class DeleteBatch(BaseModel):
+    table_name: str
+    primary_key: str
+    primary_values: List[str]
+    atomic: bool = True  # roll back every row when any row fails
+
+@app.post("/delete-records")
+@offload
+def delete_records(batch: DeleteBatch, conn=Depends(get_db)):
+    """
+    Delete many rows of one table in one transaction
+    """
+    table = batch.table_name
+    check_batch_size(batch.primary_values)
+    schema_registry.ensure_loaded(conn)
+    schema_registry.check_columns(table, {batch.primary_key})
+
+    statements = [(delete_sql(table, batch.primary_key),
+                   [(index, (value,)) for index, value in enumerate(batch.primary_values)])]
+
+    cursor = conn.cursor()
+    try:
+        failed = [{"index": index, "error": "Record not found"}
+                  for index in missing_records(cursor, table, batch.primary_key, batch.primary_values)]
+        touched = drivers_touched_by(cursor, table, batch.primary_key, batch.primary_values)
+        cached_rows = cached_rows_touched_by(cursor, table, batch.primary_key, batch.primary_values)
+        failed += execute_batch(cursor, statements)
+        failed.sort(key=lambda failure: failure["index"])
+        result = finish_batch(conn, "deleted", len(batch.primary_values), failed, batch.atomic)
+    except mysql.connector.Error as err:
+        conn.rollback()
+        raise HTTPException(status_code=400, detail=str(err))
+    finally:
+        cursor.close()
+
+    for driver_id in touched:
+        driver_index.remove(driver_id)
+    sync_ride_tracking(conn, table, cached_rows)
+    invalidate_rows(table, cached_rows)
+    return result
+
+def is_nearby_request(driver_id, position, pickup_location):
+    point = geocode(pickup_location)
+    if not point:
+        # Pickups the gazetteer cannot place are offered to everyone
+        return True
+    if not driver_index.is_available(driver_id):
+        # Outside the dispatch pool (no vehicle yet, or busy): offer what is within reach
+        return haversine_km(position[0], position[1], point[0], point[1]) <= DISPATCH_RADIUS_KM
+    return any(candidate == driver_id for candidate, _ in nearest_available_drivers(point[0], point[1]))
+
+# MySQL error numbers that mean another transaction holds the row
+LOCK_WAIT_TIMEOUT = 1205
+LOCK_DEADLOCK = 1213
+# A foreign key names a row that does not exist
+NO_REFERENCED_ROW = 1452
+
+RELEASE_DRIVER_SQL = "UPDATE drivers SET availability = TRUE WHERE driver_id = %s"
+
+def release_driver(cursor, driver_id):
+    """
+    Make a driver available again once their ride has ended
+    """
+    if driver_id:
+        cursor.execute(RELEASE_DRIVER_SQL, (driver_id,))
+
+PENDING_RIDES_SQL = """
+    SELECT r.*, c.customer_id
+    FROM rides r
+    JOIN customers c ON r.customer_id = c.customer_id
+    WHERE r.status = 'Pending'
+"""
 
 @app.get("/rides/pending/{driver_id}")
-async def get_pending_ride_requests(driver_id: int):
+@offload
+def get_pending_ride_requests(driver_id: int, conn=Depends(get_read_db)):
     """
     Get pending ride requests for a driver to accept or reject
     """
-    conn = get_db_connection()
     cursor = conn.cursor(dictionary=True)
     
     try:
         # Get pending rides
-        cursor.execute(
-            """
-            SELECT r.*, c.customer_id
-            FROM rides r
-            JOIN customers c ON r.customer_id = c.customer_id
-            WHERE r.status = 'Pending'
-            """
-        )
+        cursor.execute(PENDING_RIDES_SQL)
         rides = cursor.fetchall()
+
+        # Once the driver has reported a position, only offer rides for which
+        # they are one of the nearest available drivers
+        position = driver_locator.position(driver_id)
+        if position:
+            rides = [ride for ride in rides if is_nearby_request(driver_id, position, ride["pickup_location"])]
+
         return {"rides": rides}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     finally:
         cursor.close()
-        conn.close()
+
+RIDE_PARTIES_SQL = "SELECT customer_id, driver_id FROM rides WHERE ride_id = %s"
+CLAIM_RIDE_SQL = "UPDATE rides SET driver_id = %s, status = 'Ongoing' WHERE ride_id = %s AND status = 'Pending'"
+CLAIM_DRIVER_SQL = "UPDATE drivers SET availability = FALSE WHERE driver_id = %s AND availability = TRUE"
 
 @app.put("/rides/{ride_id}/accept")
-async def accept_ride(ride_id: int, data: dict):
+@offload
+def accept_ride(ride_id: int, data: dict, conn=Depends(get_db)):
     """
     Driver accepts a ride request
     """
@@ -668,34 +4596,55 @@ async def accept_ride(ride_id: int, data: dict):
     if not driver_id:
         raise HTTPException(status_code=400, detail="Driver ID is required")
     
-    conn = get_db_connection()
     cursor = conn.cursor()
     
     try:
-        # Update the ride with the driver_id and change status to "Ongoing"
-        cursor.execute(
-            """
-            UPDATE rides
-            SET driver_id = %s, status = 'Ongoing'
-            WHERE ride_id = %s AND status = 'Pending'
-            """,
-            (driver_id, ride_id)
-        )
+        # Who the ride belongs to before the claim, for cache invalidation
+        cursor.execute(RIDE_PARTIES_SQL, (ride_id,))
+        ride = cursor.fetchone()
+        if not ride:
+            raise HTTPException(status_code=404, detail="Ride not found")
+
+        # Claim the ride and then the driver inside one transaction. Rows are
+        # always locked ride first, driver second (as in cancel and complete),
+        # so racing drivers queue on the ride row instead of deadlocking.
+        cursor.execute(CLAIM_RIDE_SQL, (driver_id, ride_id))
+        
+        if cursor.rowcount == 0:
+            conn.rollback()
+            raise HTTPException(status_code=409, detail="Ride already assigned")
+        
+        cursor.execute(CLAIM_DRIVER_SQL, (driver_id,))
         
         if cursor.rowcount == 0:
-            raise HTTPException(status_code=404, detail="Ride not found or already assigned")
+            conn.rollback()
+            cursor.execute(DRIVER_EXISTS_SQL, (driver_id,))
+            if not cursor.fetchone():
+                raise HTTPException(status_code=404, detail="Driver not found")
+            raise HTTPException(status_code=409, detail="Driver is already on a ride")
         
         conn.commit()
+        driver_index.remove(driver_id)
+        invalidate_ride(ride_id, ride[0], ride[1], driver_id)
+        admin_metrics.ride_status("Pending", "Ongoing")
+        publish_ride_event(ride_id, driver_id, "accepted", status="Ongoing")
         return {"message": "Ride accepted successfully"}
-    except Exception as e:
+    except HTTPException:
+        raise
+    except mysql.connector.Error as err:
         conn.rollback()
-        raise HTTPException(status_code=500, detail=str(e))
+        if err.errno in (LOCK_WAIT_TIMEOUT, LOCK_DEADLOCK):
+            raise HTTPException(status_code=409, detail="Ride is being accepted by another driver")
+        if err.errno == NO_REFERENCED_ROW:
+            # rides.driver_id references drivers
+            raise HTTPException(status_code=404, detail="Driver not found")
+        raise HTTPException(status_code=500, detail=str(err))
     finally:
         cursor.close()
-        conn.close()
 
 @app.put("/rides/{ride_id}/reject")
-async def reject_ride(ride_id: int, data: dict):
+@offload
+def reject_ride(ride_id: int, data: dict, conn=Depends(get_db)):
     """
     Driver rejects a ride request
     """
@@ -703,7 +4652,6 @@ async def reject_ride(ride_id: int, data: dict):
     if not driver_id:
         raise HTTPException(status_code=400, detail="Driver ID is required")
     
-    conn = get_db_connection()
     cursor = conn.cursor()
     
     try:
@@ -717,109 +4665,117 @@ async def reject_ride(ride_id: int, data: dict):
         raise HTTPException(status_code=500, detail=str(e))
     finally:
         cursor.close()
-        conn.close()
+
+CANCEL_LOCK_SQL = "SELECT status, driver_id, customer_id FROM rides WHERE ride_id = %s FOR UPDATE"
+CANCEL_RIDE_SQL = "UPDATE rides SET status = 'Cancelled' WHERE ride_id = %s"
 
 @app.put("/rides/{ride_id}/cancel")
-async def cancel_ride(ride_id: int):
+@offload
+def cancel_ride(ride_id: int, conn=Depends(get_db)):
     """
     Customer cancels a ride request
     """
-    conn = get_db_connection()
     cursor = conn.cursor()
     
     try:
-        # Update the ride status to "Cancelled"
-        cursor.execute(
-            """
-            UPDATE rides
-            SET status = 'Cancelled'
-            WHERE ride_id = %s AND (status = 'Pending' OR status = 'Ongoing')
-            """,
-            (ride_id,)
-        )
+        cursor.execute(CANCEL_LOCK_SQL, (ride_id,))
+        ride = cursor.fetchone()
         
-        if cursor.rowcount == 0:
+        if not ride or ride[0] not in ("Pending", "Ongoing"):
             raise HTTPException(status_code=404, detail="Ride not found or cannot be cancelled")
         
+        # Update the ride status to "Cancelled"
+        cursor.execute(CANCEL_RIDE_SQL, (ride_id,))
+        
+        # Only an accepted ride has taken its driver off the market
+        driver_id = ride[1]
+        if ride[0] == "Ongoing":
+            release_driver(cursor, driver_id)
         conn.commit()
+        if ride[0] == "Ongoing":
+            sync_driver_index(conn, {driver_id})
+        stop_tracking(ride_id)
+        invalidate_ride(ride_id, ride[2], driver_id)
+        admin_metrics.ride_status(ride[0], "Cancelled")
+        publish_ride_event(ride_id, driver_id, "cancelled", status="Cancelled")
         return {"message": "Ride cancelled successfully"}
+    except HTTPException:
+        conn.rollback()
+        raise
     except Exception as e:
         conn.rollback()
         raise HTTPException(status_code=500, detail=str(e))
     finally:
         cursor.close()
-        conn.close()
+
+# Everything the tracking screens need about a ride, joined on primary and
+# unique keys only so it stays a single indexed read
+RIDE_STATE_SQL = """
+    SELECT r.ride_id, r.customer_id, r.driver_id, r.pickup_location, r.dropoff_location,
+           r.status, r.fare, r.start_time, r.end_time,
+           u.email AS driver_email, v.type AS vehicle_type, v.plate_number,
+           COALESCE(rs.driver_arrived, FALSE) AS driver_arrived,
+           COALESCE(rs.passenger_picked_up, FALSE) AS passenger_picked_up,
+           g.eta, g.updated_at AS eta_updated_at,
+           f.rating, f.comment AS feedback
+    FROM rides r
+    LEFT JOIN users u ON u.user_id = r.driver_id
+    LEFT JOIN vehicles v ON v.driver_id = r.driver_id
+    LEFT JOIN ride_statuses rs ON rs.ride_id = r.ride_id
+    LEFT JOIN gps_tracking g ON g.ride_id = r.ride_id
+    LEFT JOIN feedbacks f ON f.ride_id = r.ride_id
+    WHERE r.ride_id = %s
+"""
+
+def ride_state(conn, ride_id):
+    """
+    Cached ride state plus the live ETA, which changes with every GPS sample
+    and so is never cached
+    """
+    state = read_cache.get_or_load(ride_state_key(ride_id), functools.partial(load_ride_state, conn, ride_id))
+    return dict(state, live_eta=eta_engine.get(ride_id))
+
+def load_ride_state(conn, ride_id):
+    """
+    Consolidated read model behind /status and /detailed-status
+    """
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute(RIDE_STATE_SQL, (ride_id,))
+        state = cursor.fetchone()
+    finally:
+        cursor.close()
+
+    if not state:
+        raise HTTPException(status_code=404, detail="Ride not found")
+
+    state["status"] = state["status"] or "Pending"
+    state["driver_arrived"] = bool(state["driver_arrived"])
+    state["passenger_picked_up"] = bool(state["passenger_picked_up"])
+    return state
 
 @app.get("/rides/{ride_id}/status")
-async def get_ride_status(ride_id: int):
+@offload
+def get_ride_status(ride_id: int, conn=Depends(get_db)):
     """
     Get the current status of a ride
     """
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    
     try:
-        cursor.execute(
-            """
-            SELECT r.*, d.driver_id, u.email as driver_email
-            FROM rides r
-            LEFT JOIN drivers d ON r.driver_id = d.driver_id
-            LEFT JOIN users u ON d.driver_id = u.user_id
-            WHERE r.ride_id = %s
-            """,
-            (ride_id,)
-        )
-        
-        ride = cursor.fetchone()
-        if not ride:
-            raise HTTPException(status_code=404, detail="Ride not found")
-        
-        # Ensure the status field is included in the response
-        if not ride.get("status"):
-            ride["status"] = "Pending"  # Default status
-            
-        # Format the response to match what the frontend expects
-        response = {
-            "ride_id": ride["ride_id"],
-            "status": ride["status"],
-            "driver_id": ride.get("driver_id"),
-            "driver_email": ride.get("driver_email"),
-            "pickup_location": ride.get("pickup_location"),
-            "dropoff_location": ride.get("dropoff_location"),
-            "customer_id": ride.get("customer_id"),
-            "start_time": ride.get("start_time"),
-            "end_time": ride.get("end_time")
-        }
-        
-        return response
+        return ride_state(conn, ride_id)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        cursor.close()
-        conn.close()
 
 @app.put("/rides/{ride_id}/driver-arrived")
-async def set_driver_arrived(ride_id: int):
+@offload
+def set_driver_arrived(ride_id: int, conn=Depends(get_db)):
     """
     Set the driver arrival status for a ride
     """
-    conn = get_db_connection()
     cursor = conn.cursor()
     
     try:
-        # Create a new table for ride_statuses if it doesn't exist
-        cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS ride_statuses (
-                ride_id INT PRIMARY KEY,
-                driver_arrived BOOLEAN DEFAULT FALSE,
-                passenger_picked_up BOOLEAN DEFAULT FALSE,
-                last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
-            )
-            """
-        )
-        conn.commit()
-        
         # Insert or update the ride status
         cursor.execute(
             """
@@ -833,36 +4789,24 @@ async def set_driver_arrived(ride_id: int):
         )
         
         conn.commit()
+        invalidate_ride(ride_id)
+        publish_ride_event(ride_id, None, "driver_arrived", driver_arrived=True)
         return {"message": "Driver arrival status updated successfully"}
     except Exception as e:
         conn.rollback()
         raise HTTPException(status_code=500, detail=str(e))
     finally:
         cursor.close()
-        conn.close()
 
 @app.put("/rides/{ride_id}/passenger-pickup")
-async def set_passenger_pickup(ride_id: int):
+@offload
+def set_passenger_pickup(ride_id: int, conn=Depends(get_db)):
     """
     Set the passenger pickup status for a ride
     """
-    conn = get_db_connection()
     cursor = conn.cursor()
     
     try:
-        # Create a new table for ride_statuses if it doesn't exist (in case previous endpoint wasn't called)
-        cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS ride_statuses (
-                ride_id INT PRIMARY KEY,
-                driver_arrived BOOLEAN DEFAULT FALSE,
-                passenger_picked_up BOOLEAN DEFAULT FALSE,
-                last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
-            )
-            """
-        )
-        conn.commit()
-        
         # Insert or update the ride status
         cursor.execute(
             """
@@ -876,42 +4820,123 @@ async def set_passenger_pickup(ride_id: int):
         )
         
         conn.commit()
+        invalidate_ride(ride_id)
+        eta_engine.picked_up(ride_id)
+        publish_ride_event(ride_id, None, "passenger_picked_up", passenger_picked_up=True)
         return {"message": "Passenger pickup status updated successfully"}
     except Exception as e:
         conn.rollback()
         raise HTTPException(status_code=500, detail=str(e))
     finally:
         cursor.close()
-        conn.close()
 
 @app.get("/rides/{ride_id}/detailed-status")
-async def get_detailed_ride_status(ride_id: int):
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    
-    # Get the ride
-    cursor.execute("SELECT * FROM rides WHERE ride_id = %s", (ride_id,))
-    ride = cursor.fetchone()
-    
-    if not ride:
-        cursor.close()
-        conn.close()
-        raise HTTPException(status_code=404, detail="Ride not found")
-    
-    # Create a detailed status object
-    detailed_status = {
-        "status": ride["status"],
-        "driver_id": ride["driver_id"],
-        "customer_id": ride["customer_id"],
-        "start_time": ride["start_time"],
-        "end_time": ride["end_time"],
-        "driver_arrived": ride.get("driver_arrived", False),
-        "passenger_picked_up": ride.get("passenger_picked_up", False),
-        "rating": ride.get("rating"),
-        "feedback": ride.get("feedback")
-    }
-    
-    cursor.close()
-    conn.close()
-    
-    return detailed_status
+@offload
+def get_detailed_ride_status(ride_id: int, conn=Depends(get_db)):
+    """
+    Ride status together with arrival, pickup and feedback details
+    """
+    return ride_state(conn, ride_id)
+
+# RIDE EVENT STREAMS
+async def event_stream(request, topic):
+    """
+    Server-Sent Events feed for one topic, with periodic keep-alives
+    """
+    subscriber = ride_events.subscribe(topic)
+    try:
+        yield "retry: 3000\n\n"
+        while not await request.is_disconnected():
+            try:
+                event = await asyncio.wait_for(subscriber.get(), timeout=SSE_KEEPALIVE)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            yield f"event: {event['event']}\ndata: {json.dumps(event, default=export_value)}\n\n"
+    finally:
+        ride_events.unsubscribe(topic, subscriber)
+
+@app.get("/rides/{ride_id}/events")
+async def stream_ride_events(ride_id: int, request: Request):
+    """
+    Push status changes of a ride to the customer as they happen
+    """
+    return StreamingResponse(
+        event_stream(request, f"ride:{ride_id}"),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/users/{user_id}/notifications/events")
+async def stream_user_notifications(user_id: int, request: Request):
+    """
+    Tell a user's open screens that a notification arrived
+    """
+    return StreamingResponse(
+        event_stream(request, f"user:{user_id}"),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/drivers/{driver_id}/events")
+async def stream_driver_events(driver_id: int, request: Request):
+    """
+    Push new requests and status changes of a driver's rides
+    """
+    return StreamingResponse(
+        event_stream(request, f"driver:{driver_id}"),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# DISPATCH ENDPOINT
+class DispatchQuery(BaseModel):
+    pickup_location: Optional[str] = None
+    lat: Optional[float] = None
+    lon: Optional[float] = None
+    vehicle_type: Optional[str] = None
+    k: int = DISPATCH_K
+
+class DispatchBatch(BaseModel):
+    requests: List[DispatchQuery]
+
+@app.post("/dispatch/nearest")
+@offload
+def dispatch_nearest(batch: DispatchBatch):
+    """
+    k-nearest available drivers for a batch of pickup points
+    """
+    results = []
+    for query in batch.requests:
+        point = (query.lat, query.lon) if query.lat is not None and query.lon is not None else None
+        if point is None and query.pickup_location:
+            point = geocode(query.pickup_location)
+        if point is None:
+            results.append({"location": None, "drivers": []})
+            continue
+
+        nearest = nearest_available_drivers(point[0], point[1], query.k, query.vehicle_type)
+        results.append({
+            "location": {"lat": point[0], "lon": point[1]},
+            "drivers": [{"driver_id": driver_id, "distance_km": round(distance, 3)}
+                        for driver_id, distance in nearest],
+        })
+    return {"results": results}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SmartRide backend maintenance commands")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    subcommands.add_parser("migrate", help="apply pending schema migrations")
+    subcommands.add_parser("backfill-ratings", help="rebuild driver_ratings from all feedback")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.command == "migrate":
+        print(f"Database schema at version {run_migrations()}")
+    elif args.command == "backfill-ratings":
+        conn = get_db_connection()
+        try:
+            drivers = backfill_driver_ratings(conn)
+        finally:
+            conn.close()
+        print(f"Rebuilt ratings for {drivers} drivers")
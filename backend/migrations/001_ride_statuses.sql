@@ -0,0 +1,7 @@
+-- Driver arrival and passenger pickup flags per ride
+CREATE TABLE IF NOT EXISTS ride_statuses (
+    ride_id INT PRIMARY KEY,
+    driver_arrived BOOLEAN DEFAULT FALSE,
+    passenger_picked_up BOOLEAN DEFAULT FALSE,
+    last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
@@ -0,0 +1,13 @@
+-- Secondary indexes for the ride and notification hot paths
+
+-- get_pending_ride_requests, /rides/?status=
+CREATE INDEX idx_rides_status ON rides (status);
+
+-- get_user_rides (customer), /rides/?customer_id=&since=
+CREATE INDEX idx_rides_customer_start ON rides (customer_id, start_time);
+
+-- get_user_rides (driver), /rides/?driver_id=&status=
+CREATE INDEX idx_rides_driver_status ON rides (driver_id, status);
+
+-- /notifications/?user_id=&is_read=
+CREATE INDEX idx_notifications_user_read ON notifications (user_id, is_read);
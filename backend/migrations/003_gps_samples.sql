@@ -0,0 +1,15 @@
+-- Append-only GPS telemetry, one row per sample. Partitioned by day so old
+-- samples can be dropped a partition at a time; daily partitions are split
+-- off pmax ahead of time by ensure_gps_partitions() in main.py.
+CREATE TABLE IF NOT EXISTS gps_samples (
+    sample_id BIGINT NOT NULL AUTO_INCREMENT,
+    ride_id INT NOT NULL,
+    lat DOUBLE NOT NULL,
+    lon DOUBLE NOT NULL,
+    recorded_at DATETIME(3) NOT NULL,
+    PRIMARY KEY (sample_id, recorded_at),
+    KEY idx_gps_samples_ride_time (ride_id, recorded_at)
+)
+PARTITION BY RANGE COLUMNS (recorded_at) (
+    PARTITION pmax VALUES LESS THAN (MAXVALUE)
+);
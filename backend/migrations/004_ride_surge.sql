@@ -0,0 +1,3 @@
+-- Surge multiplier in effect when the ride was requested, applied to the
+-- fare computed when the ride completes
+ALTER TABLE rides ADD COLUMN surge FLOAT DEFAULT NULL;
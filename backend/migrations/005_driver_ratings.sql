@@ -0,0 +1,15 @@
+-- Running rating totals per driver, kept up to date by create_feedback and
+-- rebuilt from feedbacks with `python main.py backfill-ratings`
+CREATE TABLE IF NOT EXISTS driver_ratings (
+    driver_id INT PRIMARY KEY,
+    rating_count INT NOT NULL DEFAULT 0,
+    rating_sum INT NOT NULL DEFAULT 0,
+    stars_1 INT NOT NULL DEFAULT 0,
+    stars_2 INT NOT NULL DEFAULT 0,
+    stars_3 INT NOT NULL DEFAULT 0,
+    stars_4 INT NOT NULL DEFAULT 0,
+    stars_5 INT NOT NULL DEFAULT 0,
+    recent_comments TEXT COMMENT 'JSON list of the latest written feedback, newest first',
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    FOREIGN KEY (driver_id) REFERENCES drivers(driver_id) ON DELETE CASCADE
+);
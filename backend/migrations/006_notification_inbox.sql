@@ -0,0 +1,5 @@
+-- Per-user inbox: unread filter and newest-first order from one index.
+-- It starts with (user_id, is_read), so it replaces the index from 002.
+CREATE INDEX idx_notifications_user_read_created ON notifications (user_id, is_read, created_at);
+
+DROP INDEX idx_notifications_user_read ON notifications;
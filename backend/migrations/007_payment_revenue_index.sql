@@ -0,0 +1,2 @@
+-- Admin metrics rollup: completed payments of the last REVENUE_DAYS days
+CREATE INDEX idx_payments_status_time ON payments (status, payment_time);
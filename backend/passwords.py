@@ -0,0 +1,13 @@
+"""
+bcrypt work for the password process pool in main.py.
+
+Kept apart from main.py so pool processes import only bcrypt, not the
+whole API with its pools and threads.
+"""
+import bcrypt
+
+def hash_password(password, rounds):
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds)).decode()
+
+def check_password(password, password_hash):
+    return bcrypt.checkpw(password.encode(), password_hash.encode())
@@ -0,0 +1,163 @@
+"""
+EXPLAIN every SQL statement the API runs and fail on full table scans.
+
+Needs the MySQL server from db_config; the database is created from
+SmartRide.sql and migrated first. Skipped when the server is unreachable.
+
+    cd backend && python -m pytest tests
+"""
+import os
+import sys
+
+import mysql.connector
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import main  # noqa: E402
+
+# Sample parameters for each *_SQL statement, taken from the SmartRide.sql seed rows.
+# {placeholders} templates are rendered with two ids.
+SAMPLES = {
+    "VERIFY_ADMIN_SQL": ("admin1@example.com",),
+    "EMAIL_EXISTS_SQL": ("customer1@example.com",),
+    "LOGIN_SQL": ("customer1@example.com",),
+    "REHASH_SQL": ("new-hash", 1, "hashed_password_1"),
+    "CUSTOMER_EXISTS_SQL": (1,),
+    "RIDE_DRIVER_SQL": (4,),
+    "CUSTOMER_RIDES_SQL": (1,),
+    "DRIVER_RIDES_SQL": (4,),
+    "RIDE_LOCK_SQL": (2,),
+    "RIDE_COMPLETE_SQL": ("Completed", 12.5, 2),
+    "RIDE_STATUS_UPDATE_SQL": ("Cancelled", 2),
+    "AVAILABLE_DRIVER_SQL": (4,),
+    "DRIVER_RATING_SQL": (4,),
+    "DRIVER_EXISTS_SQL": (4,),
+    "RECENT_COMMENTS_SQL": (4,),
+    "RECENT_COMMENTS_UPDATE_SQL": ("[]", 4),
+    "RIDE_DRIVER_ID_SQL": (1,),
+    "INBOX_SQL": (1, False, 101),
+    "UNREAD_COUNT_SQL": (1,),
+    "NOTIFICATIONS_AFTER_SQL": (1, 0, 100),
+    "MARK_READ_SQL": (1,),
+    "RIDE_OWNERS_SQL": (1, 2),
+    "RIDE_ROUTES_SQL": (2, 3),
+    "PENDING_BY_TYPE_SQL": (),
+    "COMPLETED_FARE_SQL": (2,),
+    "EXPIRED_PENDING_SQL": (300, 500),
+    "EXPIRE_RIDES_SQL": (3, 2),
+    "RELEASE_DRIVER_SQL": (4,),
+    "PENDING_RIDES_SQL": (),
+    "RIDE_PARTIES_SQL": (3,),
+    "CLAIM_RIDE_SQL": (4, 3),
+    "CLAIM_DRIVER_SQL": (4,),
+    "CANCEL_LOCK_SQL": (3,),
+    "CANCEL_RIDE_SQL": (3,),
+    "RIDE_STATE_SQL": (1,),
+    "USER_ROLE_SQL": (1,),
+    "RIDES_BY_STATUS_SQL": (),
+    "DAILY_REVENUE_SQL": (29,),
+}
+
+# Statements that read whole tables on purpose
+FULL_READS = {
+    "AVAILABLE_DRIVERS_SQL": "loads every available driver into the in-memory index",
+    "BACKFILL_RATINGS_SQL": "rebuilds driver_ratings from all feedback, run by hand",
+    "BACKFILL_COMMENTS_SQL": "rebuilds driver_ratings from all feedback, run by hand",
+    "SCHEMA_TABLES_SQL": "information_schema has no indexes",
+    "SCHEMA_COLUMNS_SQL": "information_schema has no indexes",
+    "GPS_PARTITIONS_SQL": "information_schema has no indexes",
+    "CUSTOMERS_SQL": "unpaged admin list of every customer",
+    "DRIVERS_SQL": "unpaged admin list of every driver",
+    "ADMINISTRATORS_SQL": "unpaged admin list of every administrator",
+    "CLEAR_RATINGS_SQL": "empties driver_ratings before the hand-run backfill",
+    "RATING_TOTALS_SQL": "sums the one row per driver in driver_ratings at each metrics rollup",
+}
+
+# List endpoints: (table, key, columns, filters, cursor, time column, since)
+LIST_PAGES = {
+    "rides": ("rides", "ride_id", main.RIDE_COLUMNS, {}, None, None, None),
+    "rides after cursor": ("rides", "ride_id", main.RIDE_COLUMNS, {}, 1, None, None),
+    "rides by status": ("rides", "ride_id", main.RIDE_COLUMNS, {"status": "Pending"}, None, None, None),
+    "rides by customer": ("rides", "ride_id", main.RIDE_COLUMNS, {"customer_id": 1}, None, None, None),
+    "rides by customer since": ("rides", "ride_id", main.RIDE_COLUMNS, {"customer_id": 1}, None,
+                                "start_time", "2020-01-01"),
+    "rides by driver": ("rides", "ride_id", main.RIDE_COLUMNS, {"driver_id": 4}, None, None, None),
+    "rides by driver and status": ("rides", "ride_id", main.RIDE_COLUMNS,
+                                   {"driver_id": 4, "status": "Ongoing"}, None, None, None),
+    "users": ("users", "user_id", main.USER_COLUMNS, {}, None, None, None),
+    "vehicles by driver": ("vehicles", "vehicle_id", main.VEHICLE_COLUMNS, {"driver_id": 4}, None, None, None),
+    "feedbacks by ride": ("feedbacks", "feedback_id", main.FEEDBACK_COLUMNS, {"ride_id": 1}, None, None, None),
+    "payments by ride": ("payments", "payment_id", main.PAYMENT_COLUMNS, {"ride_id": 1}, None, None, None),
+    "notifications by user": ("notifications", "notification_id", main.NOTIFICATION_COLUMNS,
+                              {"user_id": 1}, None, None, None),
+    "unread notifications": ("notifications", "notification_id", main.NOTIFICATION_COLUMNS,
+                             {"user_id": 1, "is_read": False}, None, None, None),
+    "gps by ride": ("gps_tracking", "tracking_id", main.GPS_COLUMNS, {"ride_id": 1}, None, None, None),
+}
+
+def statement_names():
+    return sorted(name for name in dir(main) if name.endswith("_SQL") and isinstance(getattr(main, name), str))
+
+def is_insert(sql):
+    return sql.lstrip().upper().startswith("INSERT")
+
+def statement_cases():
+    cases = []
+    for name in statement_names():
+        sql = getattr(main, name)
+        if is_insert(sql) or name in FULL_READS or name not in SAMPLES:
+            continue
+        params = SAMPLES[name]
+        cases.append(pytest.param(sql.format(placeholders="%s, %s", before=""), params, id=name))
+    # The inbox pages after the first add a keyset condition
+    cases.append(pytest.param(main.INBOX_SQL.format(before=main.INBOX_BEFORE),
+                              (1, False, "2030-01-01", "2030-01-01", 100, 101), id="INBOX_SQL after cursor"))
+    return cases
+
+def page_cases():
+    cases = []
+    for label, (table, key, columns, filters, cursor, time_column, since) in LIST_PAGES.items():
+        sql, params = main.page_query(table, key, columns, filters, cursor, 100, None, time_column, since)
+        cases.append(pytest.param(sql, params, id=label))
+    return cases
+
+@pytest.fixture(scope="module")
+def conn():
+    try:
+        main.run_migrations()
+        conn = main.get_db_connection()
+    except mysql.connector.Error as err:
+        pytest.skip(f"MySQL is not reachable: {err}")
+    cursor = conn.cursor()
+    # The seed tables are a few rows long, small enough that a scan looks
+    # cheaper than any index; make index lookups cost what they would on real data
+    cursor.execute("SET SESSION max_seeks_for_key = 1")
+    cursor.close()
+    yield conn
+    conn.rollback()
+    conn.close()
+
+def explain(conn, sql, params):
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute("EXPLAIN " + sql, params)
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+def assert_no_full_scan(plan):
+    scans = [f"{row['table']} (possible keys: {row['possible_keys']})" for row in plan if row["type"] == "ALL"]
+    assert not scans, "full table scan of " + ", ".join(scans)
+
+def test_every_statement_is_checked():
+    unchecked = [name for name in statement_names()
+                 if name not in SAMPLES and name not in FULL_READS and not is_insert(getattr(main, name))]
+    assert not unchecked, f"add sample parameters for {', '.join(unchecked)}"
+
+@pytest.mark.parametrize("sql, params", statement_cases())
+def test_statement_uses_an_index(conn, sql, params):
+    assert_no_full_scan(explain(conn, sql, params))
+
+@pytest.mark.parametrize("sql, params", page_cases())
+def test_list_page_uses_an_index(conn, sql, params):
+    assert_no_full_scan(explain(conn, sql, params))
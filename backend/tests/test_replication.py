@@ -0,0 +1,47 @@
+"""
+Replay @replicated calls the way another worker receives them from Redis.
+
+The arguments go through dump_shared/load_shared, so whatever JSON cannot
+keep (int dict keys, tuples) shows up here as a state mismatch. No Redis or
+MySQL is needed:
+
+    cd backend && python -m pytest tests
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import main  # noqa: E402
+
+@pytest.fixture
+def published(monkeypatch):
+    messages = []
+    monkeypatch.setattr(main.message_bus, "publish", lambda target, name, args: messages.append((target, name, args)))
+    return messages
+
+def replay(messages):
+    for target, name, args in messages:
+        main.message_bus.dispatch(target, name, main.load_shared(main.dump_shared(args)))
+
+@pytest.fixture
+def unread(monkeypatch):
+    monkeypatch.setattr(main.notifier, "_unread", {7: 5, 8: 1})
+    return main.notifier._unread
+
+def test_count_added_survives_the_bus(published, unread):
+    main.notifier.count_added([(7, 2), (9, 1)])
+    assert unread == {7: 7, 8: 1}
+
+    unread.update({7: 5})
+    replay(published)
+    assert unread == {7: 7, 8: 1}
+
+def test_marked_read_survives_the_bus(published, unread):
+    main.notifier.marked_read(8, 1)
+    assert unread == {7: 5, 8: 0}
+
+    unread.update({8: 1})
+    replay(published)
+    assert unread == {7: 5, 8: 0}
@@ -4,6 +4,7 @@ import "animate.css";
 import Topbar from "../components/Topbar";
 import Navbar from "../components/AdminNavbar";
 import Footer from "../components/Footer";
+import { fetchAllPages, adminService } from "../services/api";
 import { useNavigate, useLocation } from "react-router-dom";
 
 const API_BASE_URL = "http://localhost:8000";
@@ -104,6 +105,7 @@ const AdminDashboard = () => {
   const [currentPages, setCurrentPages] = useState({});
   const rowsPerPage = 2; // Adjust number of rows per page
   const [activeTable, setActiveTable] = useState(null);
+  const [metrics, setMetrics] = useState(null);
 
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState("");
@@ -148,8 +150,7 @@ const AdminDashboard = () => {
       try {
         const responses = await Promise.all(
           tableNames.map((table) =>
-            fetch(`${API_BASE_URL}/${table}/`)
-              .then((res) => res.ok ? res.json() : Promise.reject(`Error fetching ${table}`))
+            fetchAllPages(`/${table}/`)
               .catch(err => {
                 console.error(`Error fetching ${table}:`, err);
                 return []; // Return empty array for failed tables
@@ -173,6 +174,10 @@ const AdminDashboard = () => {
     };
 
     fetchData();
+
+    adminService.getMetrics()
+      .then(setMetrics)
+      .catch(err => console.error("Error fetching metrics:", err));
   }, [navigate, location]);
 
   const handleSearchChange = (table, query) => {
@@ -223,6 +228,32 @@ const AdminDashboard = () => {
         </div>
       </div>
 
+      {/* Metrics Summary */}
+      {metrics && (
+        <div className="container mt-5">
+          <div className="row text-center">
+            {[
+              { label: "Pending Rides", value: metrics.rides_by_status.Pending },
+              { label: "Ongoing Rides", value: metrics.rides_by_status.Ongoing },
+              { label: "Completed Rides", value: metrics.rides_by_status.Completed },
+              { label: "Available Drivers", value: metrics.drivers.available },
+              { label: "Revenue Today", value: `$${metrics.revenue_today.toFixed(2)}` },
+              { label: "Average Rating", value: metrics.rating.average ?? "N/A" },
+              { label: "Cancellations (24h)", value: metrics.cancellations_last_24h },
+            ].map((item) => (
+              <div key={item.label} className="col-md mb-3">
+                <div className="card border-0 shadow-sm h-100">
+                  <div className="card-body">
+                    <div className="h3 fw-bold text-primary mb-1">{item.value}</div>
+                    <div className="text-muted">{item.label}</div>
+                  </div>
+                </div>
+              </div>
+            ))}
+          </div>
+        </div>
+      )}
+
       {/* Tables Section */}
       <div className="container my-5">
         <h3 className="text-center mb-4">Database Overview</h3>
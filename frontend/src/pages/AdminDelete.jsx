@@ -2,6 +2,7 @@ import React, { useEffect, useState } from "react";
 import Swal from "sweetalert2";
 import AdminNavbar from "../components/AdminNavbar";
 import Footer from "../components/Footer";
+import { fetchAllPages } from "../services/api";
 
 const API_BASE_URL = "http://localhost:8000";
 
@@ -45,9 +46,7 @@ const AdminDelete = () => {
         setColumns(colData.columns);
 
         // Fetch table records
-        const recResponse = await fetch(`${API_BASE_URL}/${selectedTable}`);
-        if (!recResponse.ok) throw new Error("Failed to fetch records");
-        const recData = await recResponse.json();
+        const recData = await fetchAllPages(`/${selectedTable}/`);
         setRecords(recData);
       } catch (error) {
         console.error("Error fetching data:", error);
@@ -18,23 +18,10 @@ const AdminLogin = () => {
     setIsLoading(true);
 
     try {
-      // Skip the verify-admin endpoint since it's giving 404 errors
-      // Directly use the manual verification approach
-      const users = await userService.getUsers();
-      
       console.log("Attempting admin login with:", email);
-      
-      // For development, just match the email and role without checking password
-      const user = users.find(u => 
-        u.email === email && 
-        u.role === "admin"
-      );
 
-      if (!user) {
-        setError("Invalid administrator credentials");
-        setIsLoading(false);
-        return;
-      }
+      // Credentials and the admin role are verified by the server
+      const user = await userService.login(email, password, "admin");
 
       // Store user data in both localStorage and sessionStorage for persistence
       const userData = JSON.stringify(user);
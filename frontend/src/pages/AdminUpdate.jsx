@@ -2,6 +2,7 @@ import React, { useEffect, useState } from "react";
 import Swal from "sweetalert2";
 import AdminNavbar from "../components/AdminNavbar";
 import Footer from "../components/Footer";
+import { fetchAllPages } from "../services/api";
 
 const API_BASE_URL = "http://localhost:8000";
 
@@ -133,9 +134,7 @@ const AdminUpdate = () => {
         const colData = await colResponse.json();
         setColumns(colData.columns);
 
-        const recResponse = await fetch(`${API_BASE_URL}/${selectedTable}`);
-        if (!recResponse.ok) throw new Error("Failed to fetch records");
-        const recData = await recResponse.json();
+        const recData = await fetchAllPages(`/${selectedTable}/`);
         setRecords(recData);
       } catch (error) {
         console.error("Error fetching data:", error);
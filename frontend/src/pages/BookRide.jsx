@@ -5,7 +5,7 @@ import { useNavigate } from "react-router-dom";
 import Topbar from "../components/Topbar";
 import Navbar from "../components/Navbar";
 import Footer from "../components/Footer";
-import { rideService, gpsService, driverService } from "../services/api";
+import { rideService, gpsService, driverService, fareService } from "../services/api";
 
 const BookRide = () => {
   const [user, setUser] = useState(null);
@@ -30,9 +30,9 @@ const BookRide = () => {
   const navigate = useNavigate();
 
   const pricing = {
-    bike: { fare: 5, eta: "5-10 mins" },
-    car4: { fare: 10, eta: "8-15 mins" },
-    car7: { fare: 15, eta: "10-20 mins" },
+    bike: { fare: 5, eta: "5-10 mins", vehicleType: "Bike" },
+    car4: { fare: 10, eta: "8-15 mins", vehicleType: "Car" },
+    car7: { fare: 15, eta: "10-20 mins", vehicleType: "SUV" },
   };
 
   // Function to fetch location suggestions
@@ -166,10 +166,10 @@ const BookRide = () => {
     // Start a new interval
     statusCheckInterval.current = setInterval(async () => {
       try {
-        const rides = await rideService.getRides();
-        const ride = rides.find(r => r.ride_id === rideId);
+        const ride = await rideService.getRideStatus(rideId);
         
-        // If ride status changes to "Ongoing" (driver accepted) or "Cancelled" (driver rejected)
+        // If ride status changes to "Ongoing" (driver accepted) or "Cancelled" (driver rejected,
+        // or the server expired it after waiting too long for a driver)
         if (ride) {
           if (ride.status === "Ongoing") {
             // A driver accepted the ride
@@ -208,7 +208,7 @@ const BookRide = () => {
               navigate("/track");
             });
           } else if (ride.status === "Cancelled") {
-            // Ride was rejected by all drivers
+            // Ride was rejected, or expired on the server before any driver accepted it
             clearInterval(statusCheckInterval.current);
             setSearchingDriver(false);
             setPendingRide(null);
@@ -226,7 +226,7 @@ const BookRide = () => {
     }, 3000); // Check every 3 seconds
   };
 
-  const handleRideTypeChange = (value) => {
+  const handleRideTypeChange = async (value) => {
     setRideType(value);
     if (pricing[value]) {
       setFareEstimate(`$${pricing[value].fare.toFixed(2)}`);
@@ -234,6 +234,21 @@ const BookRide = () => {
     } else {
       setFareEstimate("");
       setEtaEstimate("");
+      return;
+    }
+
+    // Replace the flat price with a server quote when the route is known
+    if (pickup && dropoff) {
+      try {
+        const [quote] = await fareService.quoteFares([
+          { pickup_location: pickup, dropoff_location: dropoff, vehicle_type: pricing[value].vehicleType },
+        ]);
+        if (quote && quote.fare !== undefined) {
+          setFareEstimate(`$${quote.fare.toFixed(2)}`);
+        }
+      } catch (error) {
+        console.error("Error quoting fare:", error);
+      }
     }
   };
 
@@ -5,7 +5,10 @@ import Topbar from "../components/Topbar";
 import Navbar from "../components/Navbar";
 import Footer from "../components/Footer";
 import Swal from "sweetalert2";
-import { rideService, notificationService } from "../services/api";
+import { rideService, notificationService, driverService } from "../services/api";
+
+// Minimum time between two location reports while the driver moves
+const LOCATION_REPORT_INTERVAL = 15000;
 
 const DriverDashboard = () => {
   const [user, setUser] = useState(null);
@@ -20,15 +23,11 @@ const DriverDashboard = () => {
     if (!user || !user.user_id) return;
     
     try {
-      // For demo purposes, we'll get all rides with "Pending" status
-      // In a real app, you would filter by driver_id via the API
-      const rides = await rideService.getRides();
-      
-      // Filter for pending rides, regardless of the driver_id
-      // This allows drivers to see all pending rides in the system
-      const pendingRides = rides.filter(ride => ride.status === "Pending");
+      // The server only returns rides this driver is among the nearest to,
+      // once it has reported a location
+      const { rides } = await notificationService.getPendingRideRequests(user.user_id);
       
-      setPendingRequests(pendingRides);
+      setPendingRequests(rides);
     } catch (error) {
       console.error("Error fetching pending requests:", error);
       Swal.fire({
@@ -86,10 +85,48 @@ const DriverDashboard = () => {
         fetchActiveRides();
       }, 10000);
       
-      return () => clearInterval(interval);
+      // Refresh immediately when one of this driver's rides changes
+      const unsubscribe = rideService.subscribeToDriver(user.user_id, () => {
+        fetchPendingRequests();
+        fetchActiveRides();
+      });
+      
+      return () => {
+        clearInterval(interval);
+        unsubscribe();
+      };
     }
   }, [user, fetchPendingRequests, fetchActiveRides]);
 
+  // Report the driver's position so dispatch can offer them nearby requests
+  useEffect(() => {
+    if (!user || !navigator.geolocation) return;
+
+    let lastReport = 0;
+    const watchId = navigator.geolocation.watchPosition(
+      async (position) => {
+        const now = Date.now();
+        if (now - lastReport < LOCATION_REPORT_INTERVAL) return;
+        lastReport = now;
+        try {
+          await driverService.updateLocation(
+            user.user_id, position.coords.latitude, position.coords.longitude
+          );
+          fetchPendingRequests();
+        } catch (error) {
+          console.error("Error reporting driver location:", error);
+        }
+      },
+      (error) => {
+        // Without a location the driver keeps seeing every pending ride
+        console.warn("Driver location unavailable:", error.message);
+      },
+      { enableHighAccuracy: true, maximumAge: 10000 }
+    );
+
+    return () => navigator.geolocation.clearWatch(watchId);
+  }, [user, fetchPendingRequests]);
+
   useEffect(() => {
     // Get user from navigation state or local storage
     const userData = location.state?.user || JSON.parse(localStorage.getItem("user") || "null");
@@ -111,17 +148,8 @@ const DriverDashboard = () => {
         throw new Error(`Invalid ride ID: ${ride.ride_id}`);
       }
 
-      // First try the dedicated endpoint
-      try {
-        await notificationService.acceptRideRequest(rideId, user.user_id);
-        console.log("Ride accepted successfully via dedicated endpoint");
-      } catch (error) {
-        console.error("Error with accept endpoint, falling back to status update:", error);
-        
-        // Fallback to simple status update
-        await rideService.updateRideStatus(rideId, "Ongoing");
-        console.log("Ride accepted successfully via status update");
-      }
+      // The accept endpoint claims the ride and the driver in one transaction
+      await notificationService.acceptRideRequest(rideId, user.user_id);
       
       // Refresh the lists
       await fetchPendingRequests();
@@ -134,10 +162,12 @@ const DriverDashboard = () => {
       });
     } catch (error) {
       console.error("Error accepting ride:", error);
+      // Another driver may have taken the ride meanwhile
+      fetchPendingRequests();
       Swal.fire({
         icon: "error",
         title: "Error",
-        text: "Failed to accept ride request",
+        text: typeof error?.detail === "string" ? error.detail : "Failed to accept ride request",
       });
     } finally {
       setIsLoading(false);
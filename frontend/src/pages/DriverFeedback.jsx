@@ -4,63 +4,28 @@ import Swal from "sweetalert2";
 import Topbar from "../components/Topbar";
 import Navbar from "../components/Navbar";
 import Footer from "../components/Footer";
-import { rideService } from "../services/api";
+import { driverService } from "../services/api";
 
 const DriverFeedback = () => {
   const [user, setUser] = useState(null);
   const [feedbackRides, setFeedbackRides] = useState([]);
   const [isLoading, setIsLoading] = useState(true);
   const [averageRating, setAverageRating] = useState(0);
+  const [ratingCount, setRatingCount] = useState(0);
   const navigate = useNavigate();
   const location = useLocation();
 
-  // Fetch driver's rides with feedback
+  // Fetch the driver's precomputed rating summary
   const fetchFeedbackRides = useCallback(async (driverId) => {
     try {
       setIsLoading(true);
       console.log("Fetching feedback for driver:", driverId);
       
-      // Get all rides for this driver
-      let rides = [];
-      try {
-        rides = await rideService.getUserRides(driverId, "driver");
-        console.log("Rides received from getUserRides:", rides);
-      } catch (error) {
-        console.error("Error using getUserRides:", error);
-        
-        // Fallback: get all rides and filter
-        try {
-          const allRides = await rideService.getRides();
-          rides = allRides.filter(ride => ride.driver_id === driverId);
-          console.log("Rides received from fallback method:", rides);
-        } catch (fallbackError) {
-          console.error("Error with fallback method:", fallbackError);
-          Swal.fire({
-            icon: "error",
-            title: "Error",
-            text: "Failed to load your feedback",
-          });
-          setIsLoading(false);
-          return;
-        }
-      }
-      
-      // Filter for completed rides with feedback/rating
-      const feedbackRides = rides.filter(ride => 
-        ride.status === "Completed" && 
-        (ride.feedback || ride.rating)
-      );
-      
-      console.log("Rides with feedback:", feedbackRides);
-      setFeedbackRides(feedbackRides);
-      
-      // Calculate average rating
-      if (feedbackRides.length > 0) {
-        const ratedRides = feedbackRides.filter(ride => ride.rating);
-        if (ratedRides.length > 0) {
-          const sum = ratedRides.reduce((total, ride) => total + ride.rating, 0);
-          setAverageRating((sum / ratedRides.length).toFixed(1));
-        }
+      const rating = await driverService.getDriverRating(driverId);
+      setFeedbackRides(rating.recent_comments);
+      setRatingCount(rating.count);
+      if (rating.average !== null) {
+        setAverageRating(rating.average.toFixed(1));
       }
       
       setIsLoading(false);
@@ -134,13 +99,13 @@ const DriverFeedback = () => {
               <div className="card-body text-center p-4">
                 <i className="fas fa-star fa-3x text-warning mb-3"></i>
                 <h3 className="mb-3">Your Average Rating</h3>
-                {feedbackRides.length > 0 ? (
+                {ratingCount > 0 ? (
                   <>
                     <div className="display-4 fw-bold text-primary mb-2">{averageRating}</div>
                     <div className="mb-3">
                       {generateStars(Math.round(averageRating))}
                     </div>
-                    <p className="text-muted">Based on {feedbackRides.length} ride{feedbackRides.length !== 1 ? 's' : ''}</p>
+                    <p className="text-muted">Based on {ratingCount} ride{ratingCount !== 1 ? 's' : ''}</p>
                   </>
                 ) : (
                   <p className="text-muted">No ratings yet. Complete more rides to get rated.</p>
@@ -167,22 +132,19 @@ const DriverFeedback = () => {
                   <div className="card-body">
                     <div className="d-flex justify-content-between align-items-center mb-3">
                       <h5 className="card-title mb-0">Ride #{ride.ride_id}</h5>
-                      <span className="badge bg-primary">{formatDate(ride.end_time)}</span>
+                      <span className="badge bg-primary">{formatDate(ride.feedback_time)}</span>
                     </div>
-                    <p className="mb-1"><strong>From:</strong> {ride.pickup_location}</p>
-                    <p className="mb-1"><strong>To:</strong> {ride.dropoff_location}</p>
-                    <p className="mb-1"><strong>Customer:</strong> Customer #{ride.customer_id}</p>
                     
                     <div className="mt-3 mb-2">
                       <strong>Rating:</strong> <span className="ms-2">{generateStars(ride.rating)}</span>
                     </div>
                     
-                    {ride.feedback ? (
+                    {ride.comment ? (
                       <div className="mt-3">
                         <strong>Feedback:</strong>
                         <div className="p-3 bg-light rounded mt-2">
                           <i className="fas fa-quote-left text-muted me-2"></i>
-                          {ride.feedback}
+                          {ride.comment}
                           <i className="fas fa-quote-right text-muted ms-2"></i>
                         </div>
                       </div>
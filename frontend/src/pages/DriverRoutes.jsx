@@ -132,10 +132,14 @@ const DriverRoutes = () => {
     // Fetch initially
     fetchActiveRides();
     
-    // Set up polling
-    const interval = setInterval(fetchActiveRides, 10000);
+    // Refresh when the server pushes a change, with a slow poll as a fallback
+    const unsubscribe = rideService.subscribeToDriver(userData.user_id, fetchActiveRides);
+    const interval = setInterval(fetchActiveRides, 30000);
     
-    return () => clearInterval(interval);
+    return () => {
+      clearInterval(interval);
+      unsubscribe();
+    };
   }, [navigate, location]);
 
   const logout = () => {
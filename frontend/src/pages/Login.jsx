@@ -15,34 +15,14 @@ const Login = () => {
   const [isLoading, setIsLoading] = useState(false);
   const navigate = useNavigate();
 
-  const hashPassword = async (password) => {
-    const encoder = new TextEncoder();
-    const data = encoder.encode(password);
-    const hashBuffer = await crypto.subtle.digest('SHA-256', data);
-    const hashArray = Array.from(new Uint8Array(hashBuffer));
-    return hashArray.map(b => b.toString(16).padStart(2, '0')).join('');
-  };
-
   const handleSubmit = async (e) => {
     e.preventDefault();
     setError("");
     setIsLoading(true);
 
     try {
-      // Get all users to find matching credentials
-      const users = await userService.getUsers();
-      const hashedPassword = await hashPassword(password);
-      const user = users.find(u => 
-        u.email === email && 
-        u.password_hash === hashedPassword && 
-        u.role === role
-      );
-
-      if (!user) {
-        setError("Invalid credentials or role mismatch");
-        setIsLoading(false);
-        return;
-      }
+      // Credentials are verified by the server
+      const user = await userService.login(email, password, role);
 
       // Store user data in both localStorage and sessionStorage for persistence
       const userData = JSON.stringify(user);
@@ -40,6 +40,7 @@ const TrackRide = () => {
   const routeLineRef = useRef(null);
   const statusCheckInterval = useRef(null);
   const pickupCheckInterval = useRef(null);
+  const rideEventsRef = useRef(null);
   const navigate = useNavigate();
 
   // Add last timestamp check ref to detect changes between polling intervals
@@ -358,8 +359,14 @@ const TrackRide = () => {
     // Check immediately on start
     checkServerStatus();
     
-    // Start a new interval
-    pickupCheckInterval.current = setInterval(checkServerStatus, 2000); // Check every 2 seconds
+    // Re-check whenever the server pushes a change for this ride
+    if (rideEventsRef.current) {
+      rideEventsRef.current();
+    }
+    rideEventsRef.current = rideService.subscribeToRide(rideId, () => checkServerStatus());
+
+    // Slow safety-net poll in case the event stream is unavailable
+    pickupCheckInterval.current = setInterval(checkServerStatus, 30000);
     
     // New function to check status directly from the server (works across browsers)
     async function checkServerStatus() {
@@ -657,6 +664,10 @@ const TrackRide = () => {
       if (pickupCheckInterval.current) {
         clearInterval(pickupCheckInterval.current);
       }
+      if (rideEventsRef.current) {
+        rideEventsRef.current();
+        rideEventsRef.current = null;
+      }
     };
   }, [navigate, initialized]);
 
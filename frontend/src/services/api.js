@@ -10,6 +10,33 @@ const api = axios.create({
   },
 });
 
+// List endpoints return one page at a time and put the cursor of the
+// next page in the X-Next-Cursor header
+const PAGE_SIZE = 500;
+
+export const fetchAllPages = async (path, params = {}) => {
+  const items = [];
+  let cursor = null;
+  do {
+    const response = await api.get(path, {
+      params: { ...params, limit: PAGE_SIZE, ...(cursor ? { cursor } : {}) },
+    });
+    items.push(...response.data);
+    cursor = response.headers['x-next-cursor'];
+  } while (cursor);
+  return items;
+};
+
+// Server-Sent Events: the callback runs for every pushed event and the
+// returned function closes the stream. EventSource reconnects on its own.
+const subscribe = (path, onEvent) => {
+  const source = new EventSource(`${API_URL}${path}`);
+  const handler = (message) => onEvent(JSON.parse(message.data));
+  ['requested', 'status', 'accepted', 'cancelled', 'expired', 'driver_arrived', 'passenger_picked_up']
+    .forEach((type) => source.addEventListener(type, handler));
+  return () => source.close();
+};
+
 // User services
 export const userService = {
   // Register user
@@ -22,11 +49,20 @@ export const userService = {
     }
   },
   
+  // Log in with server-side credential check
+  login: async (email, password, role) => {
+    try {
+      const response = await api.post('/login', { email, password, role });
+      return response.data.user;
+    } catch (error) {
+      throw error?.response?.data || { detail: 'Login failed' };
+    }
+  },
+
   // Get all users
-  getUsers: async () => {
+  getUsers: async (params = {}) => {
     try {
-      const response = await api.get('/users/');
-      return response.data;
+      return await fetchAllPages('/users/', params);
     } catch (error) {
       throw error?.response?.data || { detail: 'Failed to fetch users' };
     }
@@ -56,10 +92,9 @@ export const rideService = {
   },
   
   // Get all rides
-  getRides: async () => {
+  getRides: async (params = {}) => {
     try {
-      const response = await api.get('/rides/');
-      return response.data;
+      return await fetchAllPages('/rides/', params);
     } catch (error) {
       throw error?.response?.data || { detail: 'Failed to fetch rides' };
     }
@@ -113,6 +148,12 @@ export const rideService = {
     }
   },
   
+  // Subscribe to status pushes for one ride
+  subscribeToRide: (rideId, onEvent) => subscribe(`/rides/${rideId}/events`, onEvent),
+
+  // Subscribe to pushes for rides assigned to a driver
+  subscribeToDriver: (driverId, onEvent) => subscribe(`/drivers/${driverId}/events`, onEvent),
+
   // Get all drivers (added for BookRide)
   getDrivers: async () => {
     try {
@@ -222,16 +263,35 @@ export const driverService = {
     } catch (error) {
       throw error?.response?.data || { detail: 'Failed to fetch available drivers' };
     }
+  },
+
+  // Get a driver's rating summary and latest written feedback
+  getDriverRating: async (driverId) => {
+    try {
+      const response = await api.get(`/drivers/${driverId}/rating`);
+      return response.data;
+    } catch (error) {
+      throw error?.response?.data || { detail: 'Failed to fetch driver rating' };
+    }
+  },
+
+  // Report where a driver is so nearby ride requests are routed to them
+  updateLocation: async (driverId, lat, lon) => {
+    try {
+      const response = await api.put(`/drivers/${driverId}/location`, { lat, lon });
+      return response.data;
+    } catch (error) {
+      throw error?.response?.data || { detail: 'Failed to update driver location' };
+    }
   }
 };
 
 // Vehicle services
 export const vehicleService = {
   // Get all vehicles
-  getVehicles: async () => {
+  getVehicles: async (params = {}) => {
     try {
-      const response = await api.get('/vehicles/');
-      return response.data;
+      return await fetchAllPages('/vehicles/', params);
     } catch (error) {
       throw error?.response?.data || { detail: 'Failed to fetch vehicles' };
     }
@@ -251,10 +311,9 @@ export const feedbackService = {
   },
   
   // Get all feedbacks
-  getFeedbacks: async () => {
+  getFeedbacks: async (params = {}) => {
     try {
-      const response = await api.get('/feedbacks/');
-      return response.data;
+      return await fetchAllPages('/feedbacks/', params);
     } catch (error) {
       throw error?.response?.data || { detail: 'Failed to fetch feedbacks' };
     }
@@ -274,16 +333,41 @@ export const gpsService = {
   },
   
   // Get GPS tracking data
-  getGPSTracking: async () => {
+  getGPSTracking: async (params = {}) => {
     try {
-      const response = await api.get('/gps/');
-      return response.data;
+      return await fetchAllPages('/gps/', params);
     } catch (error) {
       throw error?.response?.data || { detail: 'Failed to fetch GPS tracking data' };
     }
   }
 };
 
+// Admin services
+export const adminService = {
+  // Get the precomputed dashboard aggregates
+  getMetrics: async () => {
+    try {
+      const response = await api.get('/admin/metrics');
+      return response.data;
+    } catch (error) {
+      throw error?.response?.data || { detail: 'Failed to fetch admin metrics' };
+    }
+  }
+};
+
+// Fare services
+export const fareService = {
+  // Quote fares for a batch of rides; unrecognised routes come back with an error entry
+  quoteFares: async (rides) => {
+    try {
+      const response = await api.post('/fares/quote', { rides });
+      return response.data.quotes;
+    } catch (error) {
+      throw error?.response?.data || { detail: 'Failed to quote fares' };
+    }
+  }
+};
+
 // Notification services for driver-customer interactions
 export const notificationService = {
   // Get pending ride requests for a driver
@@ -312,6 +396,12 @@ export const notificationService = {
     } catch (error) {
       console.error('Error with accept endpoint:', error?.response?.data || error.message || error);
       
+      // The server answered (another driver won, this driver is busy or
+      // unknown); a plain status update would bypass the atomic claim
+      if (error?.response) {
+        throw error.response.data;
+      }
+      
       // Fallback to updating the ride status directly
       try {
         console.log(`Accepting ride ${rideId} with driver ${driverId} - using status update fallback`);
@@ -372,5 +462,54 @@ export const notificationService = {
     } catch (error) {
       throw error?.response?.data || { detail: 'Failed to fetch ride status' };
     }
+  },
+
+  // One page of a user's inbox, newest first
+  getInbox: async (userId, { unreadOnly = false, cursor = null, limit = 20 } = {}) => {
+    try {
+      const params = { unread_only: unreadOnly, limit };
+      if (cursor) params.cursor = cursor;
+      const response = await api.get(`/users/${userId}/notifications`, { params });
+      return {
+        notifications: response.data,
+        nextCursor: response.headers['x-next-cursor'] || null,
+        unread: parseInt(response.headers['x-unread-count'] || '0', 10)
+      };
+    } catch (error) {
+      throw error?.response?.data || { detail: 'Failed to fetch notifications' };
+    }
+  },
+
+  // Unread notification count for a badge
+  getUnreadCount: async (userId) => {
+    try {
+      const response = await api.get(`/users/${userId}/notifications/unread`);
+      return response.data.unread;
+    } catch (error) {
+      throw error?.response?.data || { detail: 'Failed to fetch unread count' };
+    }
+  },
+
+  // Mark the given notifications as read, or all of them when no ids are passed
+  markRead: async (userId, notificationIds = null) => {
+    try {
+      const response = await api.put(`/users/${userId}/notifications/read`, { notification_ids: notificationIds });
+      return response.data;
+    } catch (error) {
+      throw error?.response?.data || { detail: 'Failed to mark notifications as read' };
+    }
+  },
+
+  // Wait for notifications newer than `after`; resolves empty when the server times out
+  pollNotifications: async (userId, after = 0, timeout = 25) => {
+    try {
+      const response = await api.get(`/users/${userId}/notifications/poll`, {
+        params: { after, timeout },
+        timeout: (timeout + 10) * 1000
+      });
+      return response.data;
+    } catch (error) {
+      throw error?.response?.data || { detail: 'Failed to poll notifications' };
+    }
   }
 }; 
\ No newline at end of file